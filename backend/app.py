@@ -1,25 +1,103 @@
-from flask import Flask
+import importlib
+import threading
+import time
+from flask import Flask, jsonify
 from flask_cors import CORS
-from auth_routes import auth_blueprint
-from leaderboard_routes import leaderboard_blueprint
-from chat_routes import chat_blueprint
-from game_routes import game_blueprint
-from singleplayer_routes import singleplayer_blueprint
-from multiplayer_routes import multiplayer_blueprint
-from flask_jwt_extended import JWTManager
-
-app = Flask(__name__)
-
-# Enable CORS for all routes
-CORS(app)
-
-# Register blueprints
-app.register_blueprint(auth_blueprint, url_prefix="/auth")
-app.register_blueprint(leaderboard_blueprint, url_prefix="/leaderboard")
-app.register_blueprint(chat_blueprint, url_prefix="/chat")
-app.register_blueprint(game_blueprint, url_prefix="/game")
-app.register_blueprint(singleplayer_blueprint, url_prefix="/singleplayer")
-app.register_blueprint(multiplayer_blueprint, url_prefix="/multiplayer")
+from config import ENABLED_BLUEPRINTS, ROOM_REAPER, TURN_TIMERS, WARM_UP
+import metrics
+from query_tracer import query_tracer
+
+WARM_UP_RETRY_SECONDS = 5
+
+# 🔹 Blueprint name → (module, blueprint attribute, URL prefix); only enabled ones are imported
+BLUEPRINTS = {
+    "auth": ("auth_routes", "auth_blueprint", "/auth"),
+    "leaderboard": ("leaderboard_routes", "leaderboard_blueprint", "/leaderboard"),
+    "chat": ("chat_routes", "chat_blueprint", "/chat"),
+    "game": ("game_routes", "game_blueprint", "/game"),
+    "singleplayer": ("singleplayer_routes", "singleplayer_blueprint", "/singleplayer"),
+    "multiplayer": ("multiplayer_routes", "multiplayer_blueprint", "/multiplayer"),
+    "export": ("export_routes", "export_blueprint", "/admin/export")
+}
+
+
+class Readiness:
+    """Startup state behind /ready: warming up (with the last failed attempt, if any) or ready."""
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.error = None
+        self.started = time.perf_counter()
+        self.seconds = None
+
+    def warm_up(self):
+        from puzzle_catalog import puzzle_catalog
+
+        # The catalog backs the genre, level and puzzle routes; load it before taking traffic
+        while True:
+            try:
+                puzzle_catalog.genres()
+                break
+            except Exception as e:
+                self.error = str(e)
+                print("Warm-up failed, retrying:", str(e))
+                time.sleep(WARM_UP_RETRY_SECONDS)
+        self.error = None
+        self.mark_ready()
+
+    def mark_ready(self):
+        self.seconds = time.perf_counter() - self.started
+        self.ready.set()
+
+
+def create_app(blueprints=None, warm_up=WARM_UP):
+    app = Flask(__name__)
+
+    # Enable CORS for all routes
+    CORS(app)
+
+    # Request latency, status codes and database round trips, exported at /metrics
+    metrics.init_app(app)
+
+    # Per-request query traces, N+1 warnings and round-trip budgets, active when QUERY_TRACE=log or strict
+    query_tracer.init_app(app)
+
+    # Register blueprints
+    names = blueprints or ENABLED_BLUEPRINTS or BLUEPRINTS
+    for name in names:
+        module_name, attribute, url_prefix = BLUEPRINTS[name]
+        app.register_blueprint(getattr(importlib.import_module(module_name), attribute), url_prefix=url_prefix)
+
+    # Expired turns are passed on in the background, starting with the deadlines already set
+    if TURN_TIMERS and "game" in names:
+        from turn_scheduler import turn_scheduler
+        turn_scheduler.start()
+
+    # Abandoned rooms are deleted in small paced batches by the workers serving the room routes; concurrent workers split the work
+    if ROOM_REAPER and ("multiplayer" in names or "game" in names):
+        from room_reaper import room_reaper
+        room_reaper.start()
+
+    readiness = app.extensions["readiness"] = Readiness()
+    if warm_up:
+        threading.Thread(target=readiness.warm_up, daemon=True).start()
+    else:
+        readiness.mark_ready()
+
+    # 🔹 Liveness: the process is up and serving
+    @app.route("/health")
+    def health():
+        return jsonify({"status": "ok"})
+
+    # 🔹 Readiness: warm-up finished, the worker can take traffic
+    @app.route("/ready")
+    def ready():
+        if readiness.ready.is_set():
+            return jsonify({"status": "ready", "warm_up_seconds": readiness.seconds})
+        return jsonify({"status": "warming_up", "last_error": readiness.error}), 503
+
+    return app
+
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
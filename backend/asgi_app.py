@@ -0,0 +1,503 @@
+import asyncio
+from fastapi import APIRouter, Depends, FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import metrics
+import auth_service
+import chat_service
+import game_service
+import leaderboard_service
+import multiplayer_service
+import singleplayer_service
+from config import ROOM_REAPER, TURN_TIMERS
+from query_tracer import query_tracer, query_budget, QueryBudgetExceeded
+from http_cache import cache_headers, etag_matches, make_etag, HTTP_CACHE_MAX_AGE
+from middleware import check_admin_token, check_user_token, get_request_token
+from puzzle_catalog import puzzle_catalog
+from chat_buffer import CHAT_PAGE_SIZE
+from leaderboard_engine import leaderboard_engine
+from room_events import room_events, format_event, STREAM_HEARTBEAT_SECONDS
+from room_hub import room_hub
+from turn_scheduler import turn_scheduler
+from room_reaper import room_reaper
+from exporter import export, filename, DATASETS, FORMATS
+
+# 🔹 Async serving mode: the same routes as app.py, served by uvicorn with async handlers
+#    uvicorn asgi_app:app --workers 1
+#    One worker: the room hub and the room streams keep each room's live state in this process
+#    The handlers run the shared *_service functions (repository calls included) on the thread pool
+
+run_sync = asyncio.to_thread
+
+
+class ApiError(Exception):
+    def __init__(self, error, status):
+        super().__init__(error)
+        self.error = error
+        self.status = status
+
+
+def error(message, status):
+    return JSONResponse({"error": message}, status_code=status)
+
+
+# 🔹 A service result (body, status) as a response; cache headers only go on a 200
+def reply(result, headers=None):
+    body, status = result
+    return JSONResponse(body, status_code=status, headers=headers if status == 200 else None)
+
+
+async def current_user(request: Request):
+    user_id, message, status = check_user_token(get_request_token(request.headers))
+    if message:
+        raise ApiError(message, status)
+    return user_id
+
+
+async def current_admin(request: Request):
+    user_id, message, status = check_admin_token(get_request_token(request.headers))
+    if message:
+        raise ApiError(message, status)
+    return user_id
+
+
+# 🔹 Conditional GET, as http_cache.respond does for Flask: (304 response or None, headers for the 200)
+def conditional(request, *version, max_age=0, private=False):
+    headers = cache_headers(make_etag(f"{request.url.path}?{request.url.query}", *version), max_age, private)
+    if etag_matches(request.headers.get("if-none-match"), headers["ETag"]):
+        return Response(status_code=304, headers=headers), headers
+    return None, headers
+
+
+auth_router = APIRouter()
+leaderboard_router = APIRouter()
+chat_router = APIRouter()
+game_router = APIRouter()
+singleplayer_router = APIRouter()
+multiplayer_router = APIRouter()
+export_router = APIRouter()
+
+
+# ─── Auth ───────────────────────────────────────────────────────────────
+
+@auth_router.post("/signup")
+async def signup(request: Request):
+    return reply(await run_sync(auth_service.signup, await request.json()))
+
+
+@auth_router.post("/login")
+async def login(request: Request):
+    return reply(await run_sync(auth_service.login, await request.json()))
+
+
+@auth_router.post("/logout")
+async def logout():
+    return reply(await run_sync(auth_service.logout))
+
+
+# ─── Leaderboard ────────────────────────────────────────────────────────
+
+@leaderboard_router.post("/submit_score")
+async def submit_score(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(leaderboard_service.submit_score, user_id, await request.json()))
+
+
+@leaderboard_router.get("/leaderboard")
+@query_budget(0)
+async def get_leaderboard(request: Request, page: int = 1, per_page: int = 10):
+    not_modified, headers = conditional(request, await run_sync(leaderboard_engine.data_version))
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(leaderboard_service.leaderboard, page, per_page), headers)
+
+
+@leaderboard_router.get("/window/{window}")
+@query_budget(0)
+async def get_window_leaderboard(request: Request, window: str, page: int = 1, per_page: int = 10):
+    not_modified, headers = conditional(request, await run_sync(leaderboard_service.window_version, window))
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(leaderboard_service.window_leaderboard, window, page, per_page), headers)
+
+
+@leaderboard_router.get("/rank/{user_id}")
+@query_budget(0)
+async def get_rank(user_id: str):
+    return reply(await run_sync(leaderboard_service.rank, user_id))
+
+
+@leaderboard_router.get("/around/{user_id}")
+@query_budget(0)
+async def get_players_around(user_id: str, radius: int = 5):
+    return reply(await run_sync(leaderboard_service.around, user_id, radius))
+
+
+@leaderboard_router.post("/reset_score")
+async def reset_score(user_id: str = Depends(current_user)):
+    return reply(await run_sync(leaderboard_service.reset_score, user_id))
+
+
+@leaderboard_router.post("/update_score")
+async def update_score(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(leaderboard_service.update_score, user_id, await request.json()))
+
+
+@leaderboard_router.post("/admin/reset_leaderboard")
+async def reset_leaderboard(admin_user_id: str = Depends(current_admin)):
+    return reply(await run_sync(leaderboard_service.reset_leaderboard))
+
+
+@leaderboard_router.get("/{genre}")
+@query_budget(1)
+async def fetch_leaderboard(request: Request, genre: str):
+    not_modified, headers = conditional(request, await run_sync(leaderboard_engine.data_version))
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(leaderboard_service.genre_leaderboard, genre), headers)
+
+
+@leaderboard_router.get("/{genre}/rank/{user_id}")
+@query_budget(1)
+async def get_genre_rank(genre: str, user_id: str):
+    return reply(await run_sync(leaderboard_service.genre_rank, genre, user_id))
+
+
+# ─── Chat ───────────────────────────────────────────────────────────────
+
+@chat_router.post("/send_message")
+@query_budget(2)
+async def send_message(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(chat_service.send_message, user_id, await request.json()))
+
+
+@chat_router.get("/get_messages/{room_id}")
+@query_budget(1)
+async def get_messages(room_id: str, after: str = None, limit: int = CHAT_PAGE_SIZE, user_id: str = Depends(current_user)):
+    return reply(await run_sync(chat_service.get_messages, room_id, after, limit))
+
+
+# ─── Game ───────────────────────────────────────────────────────────────
+
+@game_router.post("/join_room")
+async def game_join_room(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.join_room, await request.json()))
+
+
+@game_router.post("/update_game_state")
+async def update_game_state(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.update_game_state, user_id, await request.json()))
+
+
+@game_router.get("/get_game_state/{room_id}")
+async def get_game_state(room_id: str, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.game_state, room_id))
+
+
+@game_router.post("/take_turn")
+async def take_turn(request: Request, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.take_turn, user_id, await request.json()))
+
+
+@game_router.get("/get_turn_info/{room_id}")
+async def get_turn_info(room_id: str, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.turn_info, room_id))
+
+
+@game_router.get("/get_emoji_puzzle/{room_id}/{genre}")
+async def get_emoji_puzzle(room_id: str, genre: str, user_id: str = Depends(current_user)):
+    return reply(await run_sync(game_service.emoji_puzzle, room_id, genre))
+
+
+@game_router.get("/get_genres")
+@query_budget(0)
+async def game_get_genres(request: Request):
+    not_modified, headers = conditional(request, await run_sync(puzzle_catalog.data_version), max_age=HTTP_CACHE_MAX_AGE)
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(singleplayer_service.genres), headers)
+
+
+# ─── Singleplayer ───────────────────────────────────────────────────────
+
+@singleplayer_router.get("/get_genres")
+@query_budget(0)
+async def singleplayer_get_genres(request: Request):
+    not_modified, headers = conditional(request, await run_sync(puzzle_catalog.data_version), max_age=HTTP_CACHE_MAX_AGE)
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(singleplayer_service.genres), headers)
+
+
+@singleplayer_router.get("/get_score/{user_id}/{genre}")
+@query_budget(1)
+async def get_score(user_id: str, genre: str):
+    return reply(await run_sync(singleplayer_service.score, user_id, genre))
+
+
+@singleplayer_router.get("/get_levels/{user_id}/{genre}")
+@query_budget(1)
+async def get_levels(request: Request, user_id: str, genre: str):
+    completed_levels = await run_sync(singleplayer_service.completed_levels, user_id, genre)
+
+    # Same catalog and same progress give the same body, so the client can revalidate it
+    not_modified, headers = conditional(request, await run_sync(puzzle_catalog.data_version), completed_levels, private=True)
+    if not_modified:
+        return not_modified
+
+    return reply(await run_sync(singleplayer_service.levels, genre, completed_levels), headers)
+
+
+@singleplayer_router.post("/submit_answer")
+@query_budget(1)
+async def singleplayer_submit_answer(request: Request):
+    return reply(await run_sync(singleplayer_service.submit_answer, await request.json()))
+
+
+# ─── Multiplayer ────────────────────────────────────────────────────────
+
+@multiplayer_router.post("/create_room")
+async def create_room(request: Request):
+    return reply(await run_sync(multiplayer_service.create_room, await request.json()))
+
+
+@multiplayer_router.post("/join_room")
+@query_budget(5)
+async def join_room(request: Request):
+    return reply(await run_sync(multiplayer_service.join_room, await request.json()))
+
+
+@multiplayer_router.post("/set_emoji")
+async def set_emoji(request: Request):
+    return reply(await run_sync(multiplayer_service.set_emoji, await request.json()))
+
+
+@multiplayer_router.post("/submit_emoji_answer")
+@query_budget(3)
+async def submit_emoji_answer(request: Request):
+    return reply(await run_sync(multiplayer_service.submit_emoji_answer, await request.json()))
+
+
+@multiplayer_router.get("/get_players/{room_id}")
+async def get_players(room_id: str):
+    return await run_sync(multiplayer_service.fetch_players, room_id)
+
+
+@multiplayer_router.post("/start_game")
+async def start_game(request: Request):
+    return reply(await run_sync(multiplayer_service.start_game, await request.json()))
+
+
+@multiplayer_router.post("/submit_answer")
+async def submit_answer(request: Request):
+    return reply(await run_sync(multiplayer_service.submit_answer, await request.json()))
+
+
+@multiplayer_router.get("/get_scores/{room_id}")
+async def get_scores(room_id: str):
+    return await run_sync(multiplayer_service.fetch_scores, room_id)
+
+
+# 🔹 Server-Sent Events on the event loop: an idle stream costs a coroutine, not a thread
+async def stream_room_events(request, room_id, event_type):
+    try:
+        last_event_id = int(request.headers.get("Last-Event-ID") or request.query_params.get("last_event_id") or 0)
+    except ValueError:
+        last_event_id = 0
+
+    if not room_events.has_snapshot(room_id, event_type):
+        # Only this worker lacks it, the others already have the state it reads
+        await run_sync(multiplayer_service.publish_room_state, room_id, event_type, forward=False)
+
+    loop = asyncio.get_running_loop()
+    wakeup = asyncio.Event()
+    closed = []
+
+    def listener(event):
+        if event is None:
+            closed.append(True)
+        loop.call_soon_threadsafe(wakeup.set)
+
+    async def generate(last_id):
+        room_events.subscribe(room_id, listener)
+        try:
+            yield "retry: 3000\n\n"
+            while True:
+                wakeup.clear()
+                event = room_events.event_since(room_id, event_type, last_id)
+                if event is not None:
+                    last_id = event["id"]
+                    yield format_event(event)
+                    continue
+                if closed:
+                    yield "event: closed\ndata: {}\n\n"
+                    return
+                try:
+                    await asyncio.wait_for(wakeup.wait(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            room_events.unsubscribe(room_id, listener)
+
+    return StreamingResponse(generate(last_event_id), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+@multiplayer_router.get("/stream_players/{room_id}")
+async def stream_players(request: Request, room_id: str):
+    return await stream_room_events(request, room_id, "players")
+
+
+@multiplayer_router.get("/stream_scores/{room_id}")
+async def stream_scores(request: Request, room_id: str):
+    return await stream_room_events(request, room_id, "scores")
+
+
+@multiplayer_router.post("/end_game/{room_id}")
+async def end_game(room_id: str):
+    return reply(await run_sync(multiplayer_service.end_game, room_id))
+
+
+@multiplayer_router.post("/get_random_question")
+async def get_random_question(request: Request):
+    try:
+        data = await request.json()
+    except ValueError:
+        data = {}
+    return reply(await run_sync(multiplayer_service.random_question, data or {}))
+
+
+class WebSocketConnection:
+    def __init__(self, websocket):
+        self.websocket = websocket
+
+    async def send(self, text):
+        await self.websocket.send_text(text)
+
+
+# 🔹 The in-memory room hub from game_server.py, mounted next to the HTTP routes
+@multiplayer_router.websocket("/ws")
+async def room_socket(websocket: WebSocket):
+    await websocket.accept()
+    connection = WebSocketConnection(websocket)
+    try:
+        while True:
+            await room_hub.handle(connection, await websocket.receive_text())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        await room_hub.disconnect(connection)
+
+
+app = FastAPI()
+
+# Enable CORS for all routes
+app.add_middleware(CORSMiddleware, allow_origins=["*"], allow_methods=["*"], allow_headers=["*"])
+
+
+# 🔹 Same series as the Flask hooks in metrics.init_app; router prefixes stand in for blueprints
+ROUTER_PREFIXES = {"auth", "leaderboard", "chat", "game", "singleplayer", "multiplayer"}
+
+
+@app.middleware("http")
+async def record_request_metrics(request, call_next):
+    prefix = request.url.path.strip("/").split("/")[0]
+    timer = metrics.RequestTimer(prefix if prefix in ROUTER_PREFIXES else "app")
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        timer.finish(route.path if route else "unmatched", request.method, status)
+
+
+# 🔹 Same checks as query_tracer.init_app; the budget comes from the matched route's endpoint
+@app.middleware("http")
+async def trace_queries(request, call_next):
+    if not query_tracer.enabled:
+        return await call_next(request)
+
+    trace, token = query_tracer.start(f"{request.method} {request.url.path}")
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None:
+        trace.route = f"{request.method} {route.path}"
+        trace.budget = getattr(route.endpoint, "query_budget", trace.budget)
+    response.headers["X-Query-Count"] = str(len(trace.queries))
+    try:
+        query_tracer.finish(trace, token)
+    except QueryBudgetExceeded as e:
+        return error(str(e), 500)
+    return response
+
+
+@app.get("/debug/queries")
+async def query_trace_report(admin_user_id: str = Depends(current_admin)):
+    if not query_tracer.enabled:
+        return error("Query tracing is off", 404)
+    return query_tracer.report()
+
+
+@app.get("/metrics")
+async def export_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+# 🔹 Expired turns are passed on in the background, starting with the deadlines already set;
+#    abandoned rooms are deleted in small paced batches
+@app.on_event("startup")
+async def start_background_work():
+    if TURN_TIMERS:
+        turn_scheduler.start()
+    if ROOM_REAPER:
+        room_reaper.start()
+
+
+# ─── Exports ────────────────────────────────────────────────────────────
+
+@export_router.get("/{dataset}")
+@query_budget(0)
+async def export_dataset(request: Request, dataset: str, format: str = "ndjson", admin_user_id: str = Depends(current_admin)):
+    if dataset not in DATASETS:
+        return error("Dataset must be one of: " + ", ".join(DATASETS), 404)
+    if format not in FORMATS:
+        return error("Format must be one of: " + ", ".join(FORMATS), 400)
+
+    # The page reads are blocking, StreamingResponse runs a plain generator in the thread pool
+    compress = "gzip" in request.headers.get("accept-encoding", "")
+    headers = {
+        "Content-Disposition": f'attachment; filename="{filename(dataset, format)}"',
+        "Cache-Control": "no-store",
+        "Vary": "Accept-Encoding",
+        "X-Accel-Buffering": "no"
+    }
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(export(dataset, format, compress), media_type=FORMATS[format], headers=headers)
+
+
+@app.exception_handler(ApiError)
+async def api_error_handler(request, exc):
+    return error(exc.error, exc.status)
+
+
+@app.exception_handler(Exception)
+async def unexpected_error_handler(request, exc):
+    return error(str(exc), 500)
+
+
+app.include_router(auth_router, prefix="/auth")
+app.include_router(leaderboard_router, prefix="/leaderboard")
+app.include_router(chat_router, prefix="/chat")
+app.include_router(game_router, prefix="/game")
+app.include_router(singleplayer_router, prefix="/singleplayer")
+app.include_router(multiplayer_router, prefix="/multiplayer")
+app.include_router(export_router, prefix="/admin/export")
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, jsonify
-from config import supabase_client
+import auth_service
 
 auth_blueprint = Blueprint("auth", __name__)
 
@@ -7,23 +7,8 @@ auth_blueprint = Blueprint("auth", __name__)
 @auth_blueprint.route("/signup", methods=["POST"])
 def signup():
     try:
-        data = request.json
-        email = data.get("email")
-        password = data.get("password")
-
-        if not email or not password:
-            return jsonify({"error": "Email and password are required"}), 400
-
-        # 🔹 Sign up the user in Supabase
-        response = supabase_client.auth.sign_up({
-            "email": email,
-            "password": password
-        })
-
-        if response.user is None:
-            return jsonify({"error": "Signup failed. User may already exist."}), 400
-
-        return jsonify({"message": "User created successfully!"})
+        body, status = auth_service.signup(request.json)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -33,23 +18,8 @@ def signup():
 @auth_blueprint.route("/login", methods=["POST"])
 def login():
     try:
-        data = request.json
-        email = data.get("email")
-        password = data.get("password")
-
-        if not email or not password:
-            return jsonify({"error": "Email and password are required"}), 400
-
-        # Authenticate the user with Supabase
-        response = supabase_client.auth.sign_in_with_password({"email": email, "password": password})
-
-        if response.user is None or response.session is None:
-            return jsonify({"error": "Invalid email or password"}), 401
-
-        # 🔹 Return Only JWT Token
-        return jsonify({
-            "token": response.session.access_token
-        })
+        body, status = auth_service.login(request.json)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -59,11 +29,8 @@ def login():
 @auth_blueprint.route("/logout", methods=["POST"])
 def logout():
     try:
-        # 🔹 Supabase sign out request (no access token required)
-        supabase_client.auth.sign_out()
-
-        return jsonify({"message": "User logged out successfully!"})
+        body, status = auth_service.logout()
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
@@ -0,0 +1,46 @@
+from config import supabase_client
+
+# 🔹 Handler logic shared by auth_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+def signup(data):
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return {"error": "Email and password are required"}, 400
+
+    # 🔹 Sign up the user in Supabase
+    response = supabase_client.auth.sign_up({
+        "email": email,
+        "password": password
+    })
+
+    if response.user is None:
+        return {"error": "Signup failed. User may already exist."}, 400
+
+    return {"message": "User created successfully!"}, 200
+
+
+def login(data):
+    email = data.get("email")
+    password = data.get("password")
+
+    if not email or not password:
+        return {"error": "Email and password are required"}, 400
+
+    # Authenticate the user with Supabase
+    response = supabase_client.auth.sign_in_with_password({"email": email, "password": password})
+
+    if response.user is None or response.session is None:
+        return {"error": "Invalid email or password"}, 401
+
+    # 🔹 Return Only JWT Token
+    return {"token": response.session.access_token}, 200
+
+
+def logout():
+    # 🔹 Supabase sign out request (no access token required)
+    supabase_client.auth.sign_out()
+
+    return {"message": "User logged out successfully!"}, 200
@@ -0,0 +1,543 @@
+"""In-memory stand-in for the Supabase client, with injected round-trip latency.
+
+It implements the parts of the PostgREST query builder, the rpc functions in schema.sql
+and the auth calls that the backend uses, so the Flask app can be driven offline.
+"""
+import copy
+import random
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+import jwt
+
+# 🔹 Column defaults and identity columns, following schema.sql
+TABLE_DEFAULTS = {
+    "emoji_puzzles": {"content_hash": None},
+    "game_questions": {},
+    "game_rooms": {"total_rounds": 5, "deck_seed": None, "deck_genres": None, "deck_positions": {}, "room_code": None},
+    "players_in_room": {"score": 0, "username": None},
+    "game_state": {"current_turn": None, "question_id": None, "game_data": {}, "answered_users": [], "is_active": True,
+                   "total_rounds": 5, "current_round": 1, "turn_end_time": None, "version": 0},
+    "chat_messages": {},
+    "leaderboard": {"genre": None, "total_score": 0, "timestamp": None},
+    "leaderboard_buckets": {"score": 0},
+    "player_progress": {"completed_levels": 0}
+}
+# 🔹 Columns that default to now(); game_state.updated_at is also set on every update, as its trigger does
+TIMESTAMP_DEFAULTS = {"game_rooms": "created_at", "players_in_room": "joined_at", "game_state": "updated_at", "chat_messages": "timestamp"}
+IDENTITY_TABLES = {"emoji_puzzles", "game_questions", "chat_messages", "leaderboard"}
+UUID_TABLES = {"game_rooms", "players_in_room", "game_state"}
+UNIQUE_KEYS = {
+    "emoji_puzzles": [("content_hash",)],
+    "game_rooms": [("room_code",)],
+    "game_state": [("room_id",)],
+    "player_progress": [("user_id", "genre")]
+}
+PRIMARY_KEYS = {"player_progress": ("user_id", "genre"), "leaderboard_buckets": ("user_id", "bucket_start")}
+
+
+class FakeAPIError(Exception):
+    pass
+
+
+class FakeResponse:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+
+class LatencyModel:
+    """Round-trip delay: a fixed mean with gaussian jitter, drawn from a seeded generator."""
+
+    def __init__(self, mean_ms=20.0, jitter_ms=5.0, seed=1):
+        self.mean_ms = mean_ms
+        self.jitter_ms = jitter_ms
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sleep(self):
+        if self.mean_ms <= 0:
+            return
+        with self._lock:
+            delay = self._random.gauss(self.mean_ms, self.jitter_ms) if self.jitter_ms else self.mean_ms
+        time.sleep(max(delay, 0) / 1000)
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.tables = {name: [] for name in TABLE_DEFAULTS}
+        self._next_ids = {name: 1 for name in IDENTITY_TABLES}
+        self.round_trips = threading.local()
+
+    def _primary_key(self, table):
+        return PRIMARY_KEYS.get(table, ("id",))
+
+    def _check_unique(self, table, row, ignore=None):
+        for columns in UNIQUE_KEYS.get(table, []) + [self._primary_key(table)]:
+            key = tuple(row.get(column) for column in columns)
+            if None in key:
+                continue
+            for existing in self.tables[table]:
+                if existing is not ignore and tuple(existing.get(column) for column in columns) == key:
+                    raise FakeAPIError(f"{{'code': '23505', 'message': 'duplicate key value violates unique constraint on {table} {columns}'}}")
+
+    def _fill(self, table, row):
+        full = dict(copy.deepcopy(TABLE_DEFAULTS[table]))
+        full.update(copy.deepcopy(row))
+        if table in IDENTITY_TABLES and full.get("id") is None:
+            full["id"] = self._next_ids[table]
+            self._next_ids[table] += 1
+        elif table in UUID_TABLES and full.get("id") is None:
+            full["id"] = str(uuid.uuid4())
+        if table in TIMESTAMP_DEFAULTS and full.get(TIMESTAMP_DEFAULTS[table]) is None:
+            full[TIMESTAMP_DEFAULTS[table]] = datetime.utcnow().isoformat()
+        return full
+
+    def insert(self, table, row):
+        full = self._fill(table, row)
+        self._check_unique(table, full)
+        self.tables[table].append(full)
+        if table == "leaderboard":
+            self.score_changed(full["user_id"], full["total_score"])
+        return full
+
+    # 🔹 What the leaderboard_bucket_scores trigger does: a rise of total_score goes into the hour's bucket
+    def score_changed(self, user_id, delta):
+        if delta > 0:
+            hour = int(time.time()) // 3600 * 3600
+            bucket = next((r for r in self.tables["leaderboard_buckets"] if r["user_id"] == user_id and r["bucket_start"] == hour), None)
+            if bucket is None:
+                self.tables["leaderboard_buckets"].append({"user_id": user_id, "bucket_start": hour, "score": delta})
+            else:
+                bucket["score"] += delta
+
+    # 🔹 Seeding large tables: defaults and ids as insert() fills them, without the unique checks
+    def load(self, table, rows):
+        loaded = [self._fill(table, row) for row in rows]
+        self.tables[table].extend(loaded)
+        return loaded
+
+    def upsert(self, table, row, on_conflict=None, ignore_duplicates=False):
+        columns = tuple(column.strip() for column in on_conflict.split(",")) if on_conflict else self._primary_key(table)
+        key = tuple(row.get(column) for column in columns)
+        if None not in key:
+            for existing in self.tables[table]:
+                if tuple(existing.get(column) for column in columns) == key:
+                    if ignore_duplicates:
+                        return None
+                    updated = dict(existing, **copy.deepcopy(row))
+                    self._check_unique(table, updated, ignore=existing)
+                    existing.update(updated)
+                    return existing
+        return self.insert(table, row)
+
+    def count_round_trip(self):
+        self.round_trips.count = getattr(self.round_trips, "count", 0) + 1
+
+    def take_round_trips(self):
+        count = getattr(self.round_trips, "count", 0)
+        self.round_trips.count = 0
+        return count
+
+
+def _timestamp(value):
+    moment = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def _matches(value, operator, expected):
+    if operator == "eq":
+        return value is not None and str(value) == str(expected)
+    if operator == "neq":
+        return str(value) != str(expected)
+    if operator == "is":
+        return value is None if expected in (None, "null") else value == expected
+    if operator == "in":
+        return value is not None and str(value) in {str(item) for item in expected}
+    if value is None:
+        return False
+    if operator == "gt":
+        return value > type(value)(expected)
+    if operator == "gte":
+        return value >= type(value)(expected)
+    if operator == "lt":
+        return value < type(value)(expected)
+    if operator == "lte":
+        return value <= type(value)(expected)
+    raise NotImplementedError(operator)
+
+
+class FakeQuery:
+    def __init__(self, client, table):
+        self._client = client
+        self._table = table
+        self._operation = "select"
+        self._columns = "*"
+        self._payload = None
+        self._on_conflict = None
+        self._filters = []
+        self._order = []
+        self._limit = None
+        self._offset = 0
+        self._count = None
+        self._negate = False
+
+    # 🔹 Operations
+    def select(self, *columns, count=None):
+        self._columns = ",".join(columns) if columns else "*"
+        self._count = count
+        return self
+
+    def insert(self, payload, **kwargs):
+        self._operation, self._payload = "insert", payload
+        return self
+
+    def upsert(self, payload, on_conflict=None, ignore_duplicates=False, **kwargs):
+        self._operation, self._payload, self._on_conflict = "upsert", payload, on_conflict
+        self._ignore_duplicates = ignore_duplicates
+        return self
+
+    def update(self, payload, **kwargs):
+        self._operation, self._payload = "update", payload
+        return self
+
+    def delete(self, **kwargs):
+        self._operation = "delete"
+        return self
+
+    # 🔹 Filters and modifiers
+    @property
+    def not_(self):
+        self._negate = True
+        return self
+
+    def _filter(self, operator, column, value):
+        self._filters.append((column, operator, value, self._negate))
+        self._negate = False
+        return self
+
+    def eq(self, column, value):
+        return self._filter("eq", column, value)
+
+    def neq(self, column, value):
+        return self._filter("neq", column, value)
+
+    def gt(self, column, value):
+        return self._filter("gt", column, value)
+
+    def gte(self, column, value):
+        return self._filter("gte", column, value)
+
+    def lt(self, column, value):
+        return self._filter("lt", column, value)
+
+    def lte(self, column, value):
+        return self._filter("lte", column, value)
+
+    def is_(self, column, value):
+        return self._filter("is", column, value)
+
+    def in_(self, column, values):
+        return self._filter("in", column, values)
+
+    def order(self, column, desc=False, **kwargs):
+        self._order.append((column, desc))
+        return self
+
+    def limit(self, size, **kwargs):
+        self._limit = size
+        return self
+
+    def range(self, start, end, **kwargs):
+        self._offset, self._limit = start, end - start + 1
+        return self
+
+    def _selected(self, rows):
+        rows = [row for row in rows if all(_matches(row.get(column), operator, value) != negate for column, operator, value, negate in self._filters)]
+        for column, desc in reversed(self._order):
+            rows.sort(key=lambda row: (row.get(column) is None, row.get(column)), reverse=desc)
+        return rows
+
+    def _project(self, row):
+        if self._columns.strip() == "*":
+            return copy.deepcopy(row)
+        return {column.strip(): copy.deepcopy(row.get(column.strip())) for column in self._columns.split(",")}
+
+    def execute(self):
+        self._client.round_trip()
+        database = self._client.database
+        with database.lock:
+            table = database.tables[self._table]
+            if self._operation == "insert":
+                rows = self._payload if isinstance(self._payload, list) else [self._payload]
+                return FakeResponse([copy.deepcopy(database.insert(self._table, row)) for row in rows])
+            if self._operation == "upsert":
+                rows = self._payload if isinstance(self._payload, list) else [self._payload]
+                upserted = [database.upsert(self._table, row, self._on_conflict, self._ignore_duplicates) for row in rows]
+                return FakeResponse([copy.deepcopy(row) for row in upserted if row is not None])
+
+            matched = self._selected(table)
+            if self._operation == "update":
+                for row in matched:
+                    previous = row.get("total_score")
+                    row.update(copy.deepcopy(self._payload))
+                    if self._table == "game_state":
+                        row["updated_at"] = datetime.utcnow().isoformat()
+                    if self._table == "leaderboard":
+                        database.score_changed(row["user_id"], row["total_score"] - previous)
+                return FakeResponse([copy.deepcopy(row) for row in matched])
+            if self._operation == "delete":
+                doomed = {id(row) for row in matched}
+                database.tables[self._table] = [row for row in table if id(row) not in doomed]
+                return FakeResponse([copy.deepcopy(row) for row in matched])
+
+            count = len(matched) if self._count else None
+            end = None if self._limit is None else self._offset + self._limit
+            return FakeResponse([self._project(row) for row in matched[self._offset:end]], count)
+
+
+class FakeRpc:
+    def __init__(self, client, function, params):
+        self._client = client
+        self._function = function
+        self._params = params
+
+    def execute(self):
+        self._client.round_trip()
+        with self._client.database.lock:
+            return FakeResponse(getattr(self, "_" + self._function)(self._client.database, **self._params))
+
+    # 🔹 Python versions of the functions in schema.sql
+    @staticmethod
+    def _submit_singleplayer_answer(database, p_user_id, p_level_number, p_answer):
+        puzzles = sorted((p for p in database.tables["emoji_puzzles"] if p["level_number"] == p_level_number), key=lambda p: p["id"])
+        if not puzzles:
+            return None
+        puzzle = puzzles[0]
+        genre = puzzle["genre"]
+        correct = p_answer.strip().lower() == puzzle["correct_answer"].strip().lower()
+
+        progress = next((r for r in database.tables["player_progress"] if r["user_id"] == p_user_id and r["genre"] == genre), None)
+        scores = sorted((r for r in database.tables["leaderboard"] if r["user_id"] == p_user_id and r["genre"] == genre), key=lambda r: r["id"])
+        completed = progress["completed_levels"] if progress else 0
+        score = scores[0]["total_score"] if scores else 0
+        advanced = correct and completed < p_level_number
+        if advanced:
+            score += 10
+            if progress:
+                progress["completed_levels"] += 1
+                completed = progress["completed_levels"]
+            else:
+                completed = database.insert("player_progress", {"user_id": p_user_id, "genre": genre, "completed_levels": 1})["completed_levels"]
+            if scores:
+                for row in scores:
+                    database.score_changed(p_user_id, score - row["total_score"])
+                    row["total_score"] = score
+            else:
+                database.insert("leaderboard", {"user_id": p_user_id, "genre": genre, "total_score": score})
+        return {"genre": genre, "correct": correct, "advanced": advanced, "completed_levels": completed,
+                "new_score": score, "new_score_row": advanced and not scores}
+
+    @staticmethod
+    def _increment_leaderboard_scores(database, p_rows):
+        merged = {}
+        for row in p_rows:
+            key = (row["user_id"], row["genre"])
+            entry = merged.setdefault(key, {"delta": 0, "timestamp": None})
+            entry["delta"] += row["delta"]
+            if row.get("timestamp") is not None:
+                entry["timestamp"] = max(entry["timestamp"] or 0, row["timestamp"])
+
+        results = []
+        for (user_id, genre), entry in sorted(merged.items()):
+            rows = sorted((r for r in database.tables["leaderboard"] if r["user_id"] == user_id and r["genre"] == genre), key=lambda r: r["id"])
+            if rows:
+                rows[0]["total_score"] += entry["delta"]
+                database.score_changed(user_id, entry["delta"])
+                if entry["timestamp"] is not None:
+                    rows[0]["timestamp"] = entry["timestamp"]
+                total, inserted = rows[0]["total_score"], False
+            else:
+                total = database.insert("leaderboard", {"user_id": user_id, "genre": genre, "total_score": entry["delta"], "timestamp": entry["timestamp"]})["total_score"]
+                inserted = True
+            results.append({"user_id": user_id, "genre": genre, "total_score": total, "inserted": inserted})
+        return results
+
+    @staticmethod
+    def _genre_rank(database, p_genre, p_user_id):
+        first = {}
+        for row in sorted((r for r in database.tables["leaderboard"] if r["genre"] == p_genre), key=lambda r: r["id"]):
+            first.setdefault(row["user_id"], row["total_score"])
+        if p_user_id not in first:
+            return []
+        mine = first[p_user_id]
+        ahead = {r["user_id"] for r in database.tables["leaderboard"] if r["genre"] == p_genre
+                 and (r["total_score"] > mine or (r["total_score"] == mine and r["user_id"] < p_user_id))}
+        return [{"total_score": mine, "rank": 1 + len(ahead)}]
+
+    @staticmethod
+    def _reap_idle_rooms(database, p_idle_seconds, p_limit):
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=p_idle_seconds)
+        last_active = {room["id"]: _timestamp(room["created_at"]) for room in database.tables["game_rooms"]}
+        for table, column in (("game_state", "updated_at"), ("players_in_room", "joined_at"), ("chat_messages", "timestamp")):
+            for row in database.tables[table]:
+                if row["room_id"] in last_active:
+                    last_active[row["room_id"]] = max(last_active[row["room_id"]], _timestamp(row[column]))
+        idle = set(sorted((room_id for room_id, moment in last_active.items() if moment < cutoff), key=last_active.get)[:p_limit])
+
+        reaped = {room["id"]: {"room_id": room["id"], "room_code": room.get("room_code"), "players": 0, "game_states": 0, "messages": 0}
+                  for room in database.tables["game_rooms"] if room["id"] in idle}
+        for table, counter in (("players_in_room", "players"), ("game_state", "game_states"), ("chat_messages", "messages")):
+            kept = []
+            for row in database.tables[table]:
+                if row["room_id"] in idle:
+                    reaped[row["room_id"]][counter] += 1
+                else:
+                    kept.append(row)
+            database.tables[table] = kept
+        database.tables["game_rooms"] = [room for room in database.tables["game_rooms"] if room["id"] not in idle]
+        return list(reaped.values())
+
+    @staticmethod
+    def _draw_deck_position(database, p_room_id, p_deck):
+        room = next((r for r in database.tables["game_rooms"] if r["id"] == p_room_id), None)
+        if room is None:
+            return []
+        positions = room.setdefault("deck_positions", {})
+        position = positions.get(p_deck, 0)
+        positions[p_deck] = position + 1
+        return [{"deck_seed": room.get("deck_seed"), "deck_genres": room.get("deck_genres"), "deck_position": position}]
+
+    @staticmethod
+    def _advance_expired_turns(database, p_room_ids):
+        now = datetime.now(timezone.utc)
+        wanted = set(p_room_ids)
+        seats_by_room = {}
+        for player in sorted((p for p in database.tables["players_in_room"] if p["room_id"] in wanted), key=lambda p: p.get("joined_at") or ""):
+            seats_by_room.setdefault(player["room_id"], []).append(player["user_id"])
+        advanced = []
+        for state in database.tables["game_state"]:
+            deadline = state.get("turn_end_time")
+            if state["room_id"] not in wanted or not state["is_active"] or deadline is None:
+                continue
+            if _timestamp(deadline) > now:
+                continue
+            seats = seats_by_room.get(state["room_id"], [])
+            if state["current_turn"] in seats:
+                state["current_turn"] = seats[(seats.index(state["current_turn"]) + 1) % len(seats)]
+            elif seats:
+                state["current_turn"] = seats[0]
+            state["current_round"] += 1
+            state["is_active"] = state["current_round"] <= state["total_rounds"]
+            state["turn_end_time"] = None
+            state["version"] = state.get("version", 0) + 1
+            advanced.append(dict({key: state[key] for key in ("room_id", "current_turn", "current_round", "is_active")},
+                                 scores=(state.get("game_data") or {}).get("scores")))
+        return advanced
+
+
+    @staticmethod
+    def _take_game_turn(database, p_room_id, p_user_id, p_next_turn, p_points):
+        state = next((s for s in database.tables["game_state"] if s["room_id"] == p_room_id), None)
+        if state is None:
+            return {"status": "missing"}
+        if not state["is_active"]:
+            return {"status": "ended"}
+        if state["current_turn"] != p_user_id:
+            return {"status": "not_your_turn", "current_turn": state["current_turn"]}
+        scores = dict((state.get("game_data") or {}).get("scores") or {})
+        if p_points:
+            scores[p_user_id] = scores.get(p_user_id, 0) + p_points
+        state.update(current_turn=p_next_turn, game_data={"scores": scores}, current_round=state["current_round"] + 1,
+                     is_active=state["current_round"] + 1 <= state["total_rounds"], turn_end_time=None,
+                     version=state.get("version", 0) + 1, updated_at=datetime.now(timezone.utc).isoformat())
+        return {"status": "taken", "scores": copy.deepcopy(scores), "is_active": state["is_active"]}
+
+    @staticmethod
+    def _answer_room_puzzle(database, p_room_id, p_user_id, p_answer):
+        state = next((s for s in database.tables["game_state"] if s["room_id"] == p_room_id), None)
+        if state is None:
+            return {"status": "missing"}
+        if not state["is_active"]:
+            return {"status": "ended"}
+        game_data = state.get("game_data") or {}
+        if "emoji_clue" not in game_data or "correct_answer" not in game_data:
+            return {"status": "no_puzzle"}
+        players = [p["user_id"] for p in sorted((p for p in database.tables["players_in_room"] if p["room_id"] == p_room_id),
+                                                key=lambda p: p.get("joined_at") or "")]
+        if len(players) < 2:
+            return {"status": "no_players"}
+        if p_answer.strip().lower() != game_data["correct_answer"].strip().lower():
+            return {"status": "wrong", "current_turn": state["current_turn"]}
+        now = datetime.now(timezone.utc).isoformat()
+        if state["current_round"] >= state["total_rounds"]:
+            state.update(is_active=False, version=state.get("version", 0) + 1, updated_at=now)
+            return {"status": "game_over"}
+        if p_user_id not in players:
+            return {"status": "not_in_room"}
+        next_turn = players[(players.index(p_user_id) + 1) % len(players)]
+        state.update(current_turn=next_turn, current_round=state["current_round"] + 1, version=state.get("version", 0) + 1, updated_at=now)
+        return {"status": "advanced", "next_turn": next_turn}
+
+class _Record:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class FakeAuth:
+    """Email/password accounts that hand out JWTs the backend's middleware accepts."""
+
+    def __init__(self, client, jwt_secret):
+        self._client = client
+        self._jwt_secret = jwt_secret
+        self._users = {}
+        self._lock = threading.Lock()
+
+    def _session(self, user_id, email):
+        token = jwt.encode({"sub": user_id, "email": email, "role": "authenticated", "exp": int(time.time()) + 3600},
+                           self._jwt_secret, algorithm="HS256")
+        return _Record(access_token=token)
+
+    def sign_up(self, credentials):
+        self._client.round_trip()
+        with self._lock:
+            if credentials["email"] in self._users:
+                return _Record(user=None, session=None)
+            user_id = str(uuid.uuid4())
+            self._users[credentials["email"]] = (user_id, credentials["password"])
+        return _Record(user=_Record(id=user_id, email=credentials["email"]), session=None)
+
+    def sign_in_with_password(self, credentials):
+        self._client.round_trip()
+        account = self._users.get(credentials["email"])
+        if account is None or account[1] != credentials["password"]:
+            return _Record(user=None, session=None)
+        return _Record(user=_Record(id=account[0], email=credentials["email"]), session=self._session(account[0], credentials["email"]))
+
+    def sign_out(self):
+        self._client.round_trip()
+
+    def user_id(self, email):
+        return self._users[email][0]
+
+
+class FakeSupabaseClient:
+    def __init__(self, latency=None, jwt_secret="benchmark-secret"):
+        self.latency = latency or LatencyModel(0, 0)
+        self.database = FakeDatabase()
+        self.auth = FakeAuth(self, jwt_secret)
+
+    def round_trip(self):
+        self.database.count_round_trip()
+        self.latency.sleep()
+
+    def table(self, name):
+        return FakeQuery(self, name)
+
+    def from_(self, name):
+        return self.table(name)
+
+    def rpc(self, function, params=None):
+        return FakeRpc(self, function, params or {})
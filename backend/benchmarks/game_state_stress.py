@@ -0,0 +1,152 @@
+"""Concurrent answers against one room's game_state: no lost scores, bounded game_state writes.
+
+Run from backend/, no network or database needed:
+
+    python -m benchmarks.game_state_stress --answers 300 --latency-ms 2
+
+Every answer is its own thread with its own test client, all released at once on one room.
+take_turn: one player answers --answers times, passing the turn to themselves; each accepted
+answer must add exactly 10 points and one round. submit_emoji_answer: the room's players send
+correct answers at once; each accepted answer must move the round on by one and queue 10 points.
+Both routes apply the answer in one SQL call (take_game_turn, answer_room_puzzle), so every
+request should make exactly one write. Rejected answers (409) are reported, never silently
+dropped; the run fails if more than --max-conflict-rate of the answers got one, or if requests
+needed more than --max-mean-attempts game_state writes on average.
+"""
+import argparse
+import sys
+import threading
+import time
+
+from benchmarks.offline import configure, install
+
+# 🔹 Point the app at nothing real before importing it
+configure()
+
+# 🔹 Database functions that check and write game_state in one call
+ANSWER_FUNCTIONS = ("take_game_turn", "answer_room_puzzle")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--answers", type=int, default=300, help="concurrent answers per room")
+    parser.add_argument("--players", type=int, default=8, help="players in the multiplayer room")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="mean database round-trip latency")
+    parser.add_argument("--jitter-ms", type=float, default=1.0, help="latency spread")
+    parser.add_argument("--max-conflict-rate", type=float, default=0.05, help="highest share of 409 answers that passes")
+    parser.add_argument("--max-mean-attempts", type=float, default=3.0, help="highest mean game_state writes per answer that passes")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    from app import create_app
+    import metrics
+    from benchmarks.fake_supabase import FakeSupabaseClient, LatencyModel
+    from benchmarks.offline import BENCHMARK_JWT_SECRET
+    from score_writer import score_writer
+
+    fake = FakeSupabaseClient(jwt_secret=BENCHMARK_JWT_SECRET)
+    install(fake)
+    app = create_app(["game", "multiplayer"], warm_up=False)
+
+    # 🔹 game_state writes made by each request thread: compare-and-swap updates and the answer functions
+    local = threading.local()
+
+    def count_writes(table, operation, seconds, rows, error, filters):
+        cas = table == "game_state" and operation == "update" and any(column == "version" for _, column, _ in filters)
+        if cas or (operation == "rpc" and table in ANSWER_FUNCTIONS):
+            local.writes = getattr(local, "writes", 0) + 1
+
+    metrics.query_observers.append(count_writes)
+
+    def fire(requests):
+        """Runs every (method, path, json, headers) at once; returns (status, body, writes) per request."""
+        results = [None] * len(requests)
+        barrier = threading.Barrier(len(requests))
+
+        def send(index, path, body, headers):
+            client = app.test_client()
+            barrier.wait()
+            local.writes = 0
+            response = client.post(path, json=body, headers=headers)
+            results[index] = (response.status_code, response.get_json(silent=True) or {}, local.writes)
+
+        threads = [threading.Thread(target=send, args=(index,) + request) for index, request in enumerate(requests)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def report(name, results, elapsed, checks):
+        statuses = {}
+        for status, _, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        writes = sorted(w for _, _, w in results)
+        mean_attempts = sum(writes) / len(writes)
+        conflict_rate = statuses.get(409, 0) / len(results)
+        print(f"\n{name}: {len(results)} concurrent answers in {elapsed:.2f}s")
+        print(f"  statuses        {dict(sorted(statuses.items()))}")
+        print(f"  writes          mean {mean_attempts:.2f}  p50 {writes[len(writes) // 2]}  "
+              f"max {writes[-1]}")
+        ok = True
+        for label, expected, actual in checks:
+            passed = expected == actual
+            ok = ok and passed
+            print(f"  {label:<16}expected {expected}, got {actual}  {'ok' if passed else 'LOST UPDATE'}")
+        # 🔹 Correct but too contended: most answers should get through in a few writes
+        for label, limit, actual in (("409 rate", args.max_conflict_rate, conflict_rate),
+                                     ("mean writes", args.max_mean_attempts, mean_attempts)):
+            passed = actual <= limit
+            ok = ok and passed
+            print(f"  {label:<16}at most {limit:.2f}, got {actual:.2f}  {'ok' if passed else 'TOO MANY RETRIES'}")
+        return ok
+
+    database = fake.database
+    fake.auth.sign_up({"email": "stress@benchmark.local", "password": "stress-password"})
+    signed_in = fake.auth.sign_in_with_password({"email": "stress@benchmark.local", "password": "stress-password"})
+    user_id, token = signed_in.user.id, signed_in.session.access_token
+    fake.latency = LatencyModel(args.latency_ms, args.jitter_ms, args.seed)
+
+    # 🔹 take_turn: one player, the turn always comes back to them, enough rounds for every answer
+    room = database.insert("game_rooms", {"host_id": user_id, "status": "active", "total_rounds": args.answers + 1})
+    database.insert("game_state", {"room_id": room["id"], "current_turn": user_id, "game_data": {"scores": {}},
+                                   "total_rounds": args.answers + 1})
+    started = time.perf_counter()
+    results = fire([("/game/take_turn", {"room_id": room["id"], "guess": "correct", "next_turn": user_id},
+                     {"Authorization": f"Bearer {token}"})] * args.answers)
+    elapsed = time.perf_counter() - started
+    state = next(row for row in database.tables["game_state"] if row["room_id"] == room["id"])
+    accepted = sum(1 for status, _, _ in results if status == 200)
+    ok = report("POST /game/take_turn", results, elapsed, [
+        ("score", 10 * accepted, state["game_data"]["scores"].get(user_id, 0)),
+        ("rounds played", accepted, state["current_round"] - 1),
+        ("version", accepted, state["version"])
+    ])
+
+    # 🔹 submit_emoji_answer: every player in the room answers the open puzzle correctly at once
+    players = [f"00000000-0000-4000-8000-{index + 100:012d}" for index in range(args.players)]
+    room = database.insert("game_rooms", {"host_id": players[0], "status": "active", "total_rounds": args.answers + 1})
+    for player in players:
+        database.insert("players_in_room", {"room_id": room["id"], "user_id": player})
+    database.insert("game_state", {"room_id": room["id"], "current_turn": players[0], "total_rounds": args.answers + 1,
+                                   "game_data": {"emoji_clue": "🦁👑", "correct_answer": "The Lion King"}})
+    started = time.perf_counter()
+    results = fire([("/multiplayer/submit_emoji_answer",
+                     {"room_id": room["id"], "user_id": players[index % len(players)], "answer": "the lion king"}, None)
+                    for index in range(args.answers)])
+    elapsed = time.perf_counter() - started
+    score_writer.flush()
+    state = next(row for row in database.tables["game_state"] if row["room_id"] == room["id"])
+    accepted = sum(1 for status, body, _ in results if status == 200 and body.get("correct"))
+    written = sum(row["total_score"] for row in database.tables["leaderboard"] if row["user_id"] in players)
+    ok = report("POST /multiplayer/submit_emoji_answer", results, elapsed, [
+        ("score", 10 * accepted, written),
+        ("rounds played", accepted, state["current_round"] - 1),
+        ("version", accepted, state["version"])
+    ]) and ok
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+"""Settings shared by the offline benchmarks: nothing real configured, an in-memory Supabase stand-in installed."""
+import os
+import sys
+
+BENCHMARK_JWT_SECRET = "benchmark-jwt-secret"
+
+
+# 🔹 The app reads its settings when config is first imported; call this before importing any app module
+def configure():
+    os.environ["SUPABASE_URL"] = "http://localhost:54321"
+    os.environ["SUPABASE_KEY"] = "benchmark.offline.key"
+    os.environ["SUPABASE_JWT_SECRET"] = BENCHMARK_JWT_SECRET
+    os.environ["DATA_BACKEND"] = "postgrest"
+    os.environ["WARM_UP"] = "0"
+
+
+# 🔹 Every module that holds the Supabase client gets the fake, wrapped like the real one; modules imported later read it from config
+def install(fake):
+    import metrics
+    import repository
+
+    client = metrics.instrument_client(fake)
+    for name in ("config", "repository", "auth_service"):
+        module = sys.modules.get(name)
+        if module is not None:
+            module.supabase_client = client
+    repository.repository._backend = repository.PostgrestRepository(client)
+    return client
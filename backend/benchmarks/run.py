@@ -0,0 +1,125 @@
+"""Offline load test of every blueprint against an in-memory, latency-injecting Supabase stand-in.
+
+Run from backend/, no network or database needed:
+
+    python -m benchmarks.run --users 16 --iterations 5 --latency-ms 20
+
+Each virtual user drives the Flask app through its own test client on its own thread;
+every database call sleeps for the injected round-trip latency, so the report shows
+what the handlers' query patterns cost: throughput, p50/p95/p99 and round trips per request.
+Runs with the same --seed produce the same data, player choices and latency draws.
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.offline import BENCHMARK_JWT_SECRET, configure, install
+
+# 🔹 Point the app at nothing real before importing it
+configure()
+
+from app import create_app
+from query_tracer import query_tracer
+from benchmarks.fake_supabase import FakeSupabaseClient, LatencyModel
+from benchmarks.scenarios import SCENARIOS, Recorder, Session, seed
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize(recorder, elapsed):
+    rows = []
+    for label, samples in sorted(recorder.samples.items()):
+        latencies = [seconds * 1000 for seconds, _, _ in samples]
+        rows.append({
+            "endpoint": label,
+            "requests": len(samples),
+            "errors": sum(1 for _, _, status in samples if status >= 500),
+            "rps": len(samples) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 0.50),
+            "p95_ms": percentile(latencies, 0.95),
+            "p99_ms": percentile(latencies, 0.99),
+            "round_trips": sum(round_trips for _, round_trips, _ in samples) / len(samples)
+        })
+    return rows
+
+
+def print_report(name, rows, elapsed):
+    total = sum(row["requests"] for row in rows)
+    print(f"\n{name}: {total} requests in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.1f} req/s)")
+    print(f"{'endpoint':<42}{'reqs':>7}{'5xx':>6}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'trips':>7}")
+    for row in rows:
+        print(f"{row['endpoint']:<42}{row['requests']:>7}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['round_trips']:>7.2f}")
+
+
+def run_scenario(app, name, fake, users, args):
+    recorder = Recorder()
+
+    def virtual_user(index):
+        session = Session(app, fake, recorder, random.Random(f"{args.seed}:{name}:{index}"))
+        players = users[index * args.room_size:(index + 1) * args.room_size]
+        for _ in range(args.iterations):
+            SCENARIOS[name](session, players, args)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for future in [pool.submit(virtual_user, index) for index in range(args.users)]:
+            future.result()
+    return recorder, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=["all"] + list(SCENARIOS), default="all")
+    parser.add_argument("--users", type=int, default=8, help="concurrent virtual users")
+    parser.add_argument("--iterations", type=int, default=3, help="scenario runs per virtual user")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="mean database round-trip latency")
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--room-size", type=int, default=4, help="players per multiplayer room")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds per multiplayer game")
+    parser.add_argument("--levels", type=int, default=10, help="levels per singleplayer run")
+    parser.add_argument("--messages", type=int, default=20, help="messages per chat burst")
+    parser.add_argument("--pages", type=int, default=5, help="leaderboard pages read per run")
+    parser.add_argument("--leaderboard-rows", type=int, default=5000)
+    parser.add_argument("--query-trace", choices=["off", "log", "strict"], default="off",
+                        help="check round-trip budgets and N+1 loops; strict fails the offending requests and the run")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+    query_tracer.mode = args.query_trace
+
+    fake = FakeSupabaseClient(jwt_secret=BENCHMARK_JWT_SECRET)
+    install(fake)
+    app = create_app(warm_up=False)
+    users = seed(fake, args.levels, args.users * args.room_size, args.leaderboard_rows, args.seed)
+    # Latency only from here on, seeding is not part of the measurement
+    fake.latency = LatencyModel(args.latency_ms, args.jitter_ms, args.seed)
+
+    report = {}
+    for name in (SCENARIOS if args.scenario == "all" else [args.scenario]):
+        recorder, elapsed = run_scenario(app, name, fake, users, args)
+        report[name] = {"seconds": elapsed, "endpoints": summarize(recorder, elapsed)}
+        if not args.json:
+            print_report(name, report[name]["endpoints"], elapsed)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+    if query_tracer.enabled:
+        violations = {summary["route"]: summary["problems"] for summary in query_tracer.violations}
+        print(f"\nquery trace: {len(violations)} routes with problems", file=sys.stderr)
+        for route, problems in sorted(violations.items()):
+            print(f"  {route}: " + " | ".join(problems), file=sys.stderr)
+        if violations and args.query_trace == "strict":
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""Seed data and scripted player sessions for the offline load test (see benchmarks.run)."""
+import random
+import threading
+import time
+from puzzle_catalog import puzzle_catalog
+
+GENRES = ("Movies", "Phrases", "Songs", "Food")
+PASSWORD = "benchmark-password"
+
+
+# 🔹 Puzzles, registered players and an existing leaderboard, written straight into the fake database
+def seed(fake, levels, players, leaderboard_rows, seed_value):
+    rng = random.Random(seed_value)
+    database = fake.database
+    with database.lock:
+        for genre in GENRES:
+            for level_number in range(1, levels + 1):
+                answer = f"{genre.lower()} answer {level_number}"
+                database.insert("emoji_puzzles", {"genre": genre, "level_number": level_number,
+                                                  "emoji_clue": "🎬" * (level_number % 5 + 1), "correct_answer": answer})
+
+    users = []
+    for index in range(players):
+        email = f"player{index}@benchmark.local"
+        fake.auth.sign_up({"email": email, "password": PASSWORD})
+        users.append({"email": email, "user_id": fake.auth.user_id(email), "name": f"player{index}"})
+
+    with database.lock:
+        for index in range(leaderboard_rows):
+            user_id = users[index % len(users)]["user_id"] if index < len(users) else f"00000000-0000-4000-8000-{index:012d}"
+            database.insert("leaderboard", {"user_id": user_id, "genre": rng.choice(GENRES),
+                                            "total_score": rng.randrange(0, 5000, 10), "timestamp": int(time.time()) - rng.randrange(86400)})
+    database.take_round_trips()
+    return users
+
+
+class Recorder:
+    """Latency, status and database round trips of every request, by endpoint label."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+
+    def add(self, label, seconds, round_trips, status):
+        with self._lock:
+            self.samples.setdefault(label, []).append((seconds, round_trips, status))
+
+
+class Session:
+    """One virtual player: a Flask test client on its own thread, timing every call it makes."""
+
+    def __init__(self, app, fake, recorder, rng):
+        self.client = app.test_client()
+        self.fake = fake
+        self.recorder = recorder
+        self.rng = rng
+
+    def call(self, method, label, path, json=None, token=None):
+        headers = {"Authorization": f"Bearer {token}"} if token else None
+        # Round trips are counted per thread, so only this request's queries are attributed to it
+        self.fake.database.take_round_trips()
+        started = time.perf_counter()
+        response = self.client.open(path, method=method, json=json, headers=headers)
+        elapsed = time.perf_counter() - started
+        self.recorder.add(label, elapsed, self.fake.database.take_round_trips(), response.status_code)
+        return response.get_json(silent=True) or {}
+
+    def sign_in(self, user):
+        return self.call("POST", "POST /auth/login", "/auth/login", {"email": user["email"], "password": PASSWORD}).get("token")
+
+
+# 🔹 Scenarios: each takes the session, the players it plays as and the run options
+
+def sign_in(session, users, options):
+    for user in users:
+        session.sign_in(user)
+
+
+def singleplayer(session, users, options):
+    user = users[0]
+    genres = session.call("GET", "GET /singleplayer/get_genres", "/singleplayer/get_genres").get("genres") or []
+    genre = session.rng.choice(genres) if genres else GENRES[0]
+    user_id = user["user_id"]
+
+    session.call("GET", "GET /singleplayer/get_levels", f"/singleplayer/get_levels/{user_id}/{genre}")
+    # The answer endpoint resolves a level number to one puzzle, play the levels it resolves
+    playable = [p for p in puzzle_catalog.levels(genre) if puzzle_catalog.puzzle_for_level(p["level_number"]) is p]
+    for puzzle in playable[:options.levels]:
+        # Roughly one wrong guess in four before the right one
+        if session.rng.random() < 0.25:
+            session.call("POST", "POST /singleplayer/submit_answer", "/singleplayer/submit_answer",
+                         {"user_id": user_id, "level_number": puzzle["level_number"], "answer": "wrong"})
+        session.call("POST", "POST /singleplayer/submit_answer", "/singleplayer/submit_answer",
+                     {"user_id": user_id, "level_number": puzzle["level_number"], "answer": puzzle["correct_answer"]})
+    session.call("GET", "GET /singleplayer/get_score", f"/singleplayer/get_score/{user_id}/{genre}")
+
+
+def create_room(session, host, options):
+    room = session.call("POST", "POST /multiplayer/create_room", "/multiplayer/create_room",
+                        {"host_id": host["user_id"], "username": host["name"], "total_rounds": options.rounds})
+    return room.get("room_id"), room.get("room_code")
+
+
+def multiplayer(session, users, options):
+    host, guests = users[0], users[1:options.room_size]
+    room_id, room_code = create_room(session, host, options)
+    if not room_id:
+        return
+
+    for guest in guests:
+        session.call("POST", "POST /multiplayer/join_room", "/multiplayer/join_room",
+                     {"room_code": room_code, "user_id": guest["user_id"], "player_name": guest["name"]})
+    session.call("POST", "POST /multiplayer/start_game", "/multiplayer/start_game", {"room_id": room_id})
+
+    guesser = guests[0]["user_id"] if guests else host["user_id"]
+    for _ in range(options.rounds):
+        question = session.call("POST", "POST /multiplayer/get_random_question", "/multiplayer/get_random_question", {"room_id": room_id})
+        if "correct_answer" not in question:
+            break
+        session.call("POST", "POST /multiplayer/set_emoji", "/multiplayer/set_emoji",
+                     {"room_id": room_id, "host_id": host["user_id"], "emoji_clue": question["emoji_clue"], "correct_answer": question["correct_answer"]})
+
+        if session.rng.random() < 0.25:
+            session.call("POST", "POST /multiplayer/submit_emoji_answer", "/multiplayer/submit_emoji_answer",
+                         {"room_id": room_id, "user_id": guesser, "answer": "wrong"})
+        result = session.call("POST", "POST /multiplayer/submit_emoji_answer", "/multiplayer/submit_emoji_answer",
+                              {"room_id": room_id, "user_id": guesser, "answer": question["correct_answer"]})
+
+        session.call("GET", "GET /multiplayer/get_scores", f"/multiplayer/get_scores/{room_id}")
+        session.call("GET", "GET /multiplayer/get_players", f"/multiplayer/get_players/{room_id}")
+        if "next_turn" not in result:
+            break
+        guesser = result["next_turn"]
+
+    session.call("POST", "POST /multiplayer/end_game", f"/multiplayer/end_game/{room_id}")
+
+
+def chat_burst(session, users, options):
+    token = session.sign_in(users[0])
+    room_id, _ = create_room(session, users[0], options)
+    if not room_id:
+        return
+
+    cursor = None
+    for index in range(options.messages):
+        session.call("POST", "POST /chat/send_message", "/chat/send_message",
+                     {"room_id": room_id, "message": f"message {index}"}, token)
+        # Other players poll for what is new since their last read
+        if index % 2:
+            path = f"/chat/get_messages/{room_id}" + (f"?after={cursor}" if cursor is not None else "")
+            cursor = session.call("GET", "GET /chat/get_messages", path, token=token).get("next_cursor", cursor)
+
+    session.call("POST", "POST /multiplayer/end_game", f"/multiplayer/end_game/{room_id}")
+
+
+def leaderboard(session, users, options):
+    for page in range(1, options.pages + 1):
+        session.call("GET", "GET /leaderboard/leaderboard", f"/leaderboard/leaderboard?page={page}&per_page=20")
+    for user in users[:options.room_size]:
+        session.call("GET", "GET /leaderboard/rank", f"/leaderboard/rank/{user['user_id']}")
+        session.call("GET", "GET /leaderboard/around", f"/leaderboard/around/{user['user_id']}?radius=5")
+
+
+SCENARIOS = {
+    "sign_in": sign_in,
+    "singleplayer": singleplayer,
+    "multiplayer": multiplayer,
+    "chat": chat_burst,
+    "leaderboard": leaderboard
+}
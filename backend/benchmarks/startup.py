@@ -0,0 +1,97 @@
+"""Cold-start time of the Flask app: imports, create_app(), warm-up until /ready, first request.
+
+Run from backend/, no network or database needed:
+
+    python -m benchmarks.startup --runs 10 --latency-ms 20
+
+Every run is a fresh interpreter, so module imports are measured as a new worker pays
+them. The database is the in-memory stand-in from benchmarks.run with injected latency,
+holding a catalog of --puzzles rows for the warm-up to load.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+# 🔹 Configurations compared: every blueprint, then each blueprint served on its own
+CONFIGURATIONS = ["all", "auth", "leaderboard", "chat", "game", "singleplayer", "multiplayer"]
+
+
+def child(blueprints, puzzles, latency_ms):
+    from benchmarks.offline import configure, install
+    configure()
+
+    started = time.perf_counter()
+    from app import create_app
+    imported = time.perf_counter()
+
+    from benchmarks.fake_supabase import FakeSupabaseClient, LatencyModel
+    fake = FakeSupabaseClient()
+    for index in range(puzzles):
+        fake.database.insert("emoji_puzzles", {"genre": f"genre {index % 8}", "level_number": index // 8 + 1,
+                                               "emoji_clue": "🎬", "correct_answer": f"answer {index}"})
+    fake.latency = LatencyModel(latency_ms, 0, 1)
+    install(fake)
+
+    setup = time.perf_counter()
+    app = create_app(None if blueprints == "all" else [blueprints], warm_up=True)
+    created = time.perf_counter()
+
+    client = app.test_client()
+    while client.get("/ready").status_code != 200:
+        time.sleep(0.001)
+    ready = time.perf_counter()
+
+    # First real request; the catalog is already in memory
+    client.get("/singleplayer/get_genres" if blueprints in ("all", "singleplayer") else "/health")
+    first_request = time.perf_counter()
+
+    json.dump({
+        "import_ms": (imported - started) * 1000,
+        "create_app_ms": (created - setup) * 1000,
+        "ready_ms": (ready - setup) * 1000,
+        "first_request_ms": (first_request - ready) * 1000,
+        "modules": len(sys.modules)
+    }, sys.stdout)
+
+
+def median(samples):
+    ordered = sorted(samples)
+    return ordered[len(ordered) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per configuration")
+    parser.add_argument("--blueprints", choices=CONFIGURATIONS, nargs="*", default=CONFIGURATIONS)
+    parser.add_argument("--puzzles", type=int, default=2000, help="catalog rows loaded by the warm-up")
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="database round-trip latency")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.puzzles, args.latency_ms)
+        return
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'blueprints':<14}{'process ms':>12}{'import ms':>11}{'create ms':>11}{'ready ms':>10}{'1st req ms':>12}{'modules':>9}")
+    for blueprints in args.blueprints:
+        runs = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "--child", blueprints,
+                                     "--puzzles", str(args.puzzles), "--latency-ms", str(args.latency_ms)],
+                                    cwd=backend, capture_output=True, text=True, check=True).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            result["process_ms"] = (time.perf_counter() - started) * 1000
+            runs.append(result)
+
+        print(f"{blueprints:<14}{median([r['process_ms'] for r in runs]):>12.1f}{median([r['import_ms'] for r in runs]):>11.1f}"
+              f"{median([r['create_app_ms'] for r in runs]):>11.1f}{median([r['ready_ms'] for r in runs]):>10.1f}"
+              f"{median([r['first_request_ms'] for r in runs]):>12.1f}{median([r['modules'] for r in runs]):>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Compare the old multi-request singleplayer submit with the single-call SQL function.
+
+Run from backend/ against a database that has schema.sql applied and some puzzles:
+
+    python -m benchmarks.submit_answer --players 20
+
+Every player answers each level once with both paths (on separate throwaway user ids),
+so both see the same mix of first inserts and updates. The rows are deleted at the end.
+"""
+import argparse
+import time
+import uuid
+from repository import repository
+from puzzle_catalog import puzzle_catalog
+
+
+# 🔹 The handler as it was before the SQL function: reads first, then up to two writes
+def legacy_submit(user_id, level_number, answer):
+    puzzle = puzzle_catalog.puzzle_for_level(level_number)
+    genre = puzzle["genre"]
+    is_correct = answer.strip().lower() == puzzle["correct_answer"].strip().lower()
+
+    progress = repository.get_progress(user_id, genre)
+    completed_levels = progress["completed_levels"] if progress else 0
+    scores = repository.get_scores(user_id, genre)
+    current_score = scores[0]["total_score"] if scores else 0
+    advances = is_correct and completed_levels < level_number
+
+    if not progress and is_correct:
+        repository.insert_progress({"user_id": user_id, "genre": genre, "completed_levels": 1})
+    elif advances:
+        repository.update_progress(user_id, genre, {"completed_levels": completed_levels + 1})
+
+    if not scores and is_correct:
+        repository.insert_scores([{"user_id": user_id, "genre": genre, "total_score": 10}])
+    elif advances:
+        repository.update_scores(user_id, {"total_score": current_score + 10}, genre)
+
+
+def atomic_submit(user_id, level_number, answer):
+    repository.submit_singleplayer_answer(user_id, level_number, answer)
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def run(submit, user_ids, levels):
+    samples = []
+    for user_id in user_ids:
+        for puzzle in levels:
+            started = time.perf_counter()
+            submit(user_id, int(puzzle["level_number"]), puzzle["correct_answer"])
+            samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--levels", type=int, default=10, help="levels answered per player")
+    args = parser.parse_args()
+
+    # Levels the handler resolves, in play order for one genre
+    genre = puzzle_catalog.genres()[0]
+    levels = [p for p in puzzle_catalog.levels(genre) if puzzle_catalog.puzzle_for_level(p["level_number"]) is p][:args.levels]
+    if not levels:
+        raise SystemExit("No puzzles to answer, load some into emoji_puzzles first")
+
+    paths = {"legacy": legacy_submit, "atomic": atomic_submit}
+    user_ids = {name: [str(uuid.uuid4()) for _ in range(args.players)] for name in paths}
+    try:
+        # One warm-up call each so connection setup is not measured
+        for name, submit in paths.items():
+            warm_up_user = str(uuid.uuid4())
+            user_ids[name].append(warm_up_user)
+            submit(warm_up_user, int(levels[0]["level_number"]), "-")
+
+        print(f"{len(levels)} levels x {args.players} players, genre {genre!r}")
+        for name, submit in paths.items():
+            samples = run(submit, user_ids[name][:args.players], levels)
+            print(f"{name:>7}: p50 {percentile(samples, 0.50):7.2f} ms   p99 {percentile(samples, 0.99):7.2f} ms   ({len(samples)} calls)")
+    finally:
+        for user_id in sum(user_ids.values(), []):
+            repository.delete_progress(user_id)
+            repository.delete_user_scores(user_id)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Turn timers for many rooms in one process: timer wheel cost and batched expiry against the offline stand-in.
+
+Run from backend/, no network or database needed:
+
+    python -m benchmarks.turn_timers --rooms 50000 --spread 5 --latency-ms 5
+
+First the wheel alone: schedule, cancel and reschedule --rooms timers. Then --rooms active
+games get a turn deadline within the next --spread seconds; --taken of them take their turn
+in time (timer cancelled), the rest expire and are passed on by the scheduler in batches.
+"""
+import argparse
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.offline import configure, install
+
+# 🔹 Point the app at nothing real before importing it
+configure()
+
+
+def rate(count, seconds):
+    return f"{count / seconds / 1000:,.0f}k/s" if seconds else "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rooms", type=int, default=50000)
+    parser.add_argument("--spread", type=float, default=5.0, help="deadlines fall within this many seconds")
+    parser.add_argument("--taken", type=float, default=0.5, help="share of turns taken before their deadline")
+    parser.add_argument("--tick", type=float, default=0.05, help="timer wheel resolution in seconds")
+    parser.add_argument("--batch", type=int, default=500, help="rooms per advance_expired_turns call")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="database round-trip latency")
+    parser.add_argument("--seed", type=int, default=3)
+    args = parser.parse_args()
+
+    import turn_scheduler
+    from benchmarks.fake_supabase import FakeSupabaseClient, LatencyModel
+    from timer_wheel import TimerWheel
+    from turn_scheduler import TurnScheduler
+
+    rng = random.Random(args.seed)
+    keys = [f"00000000-0000-4000-8000-{index:012d}" for index in range(args.rooms)]
+
+    # 🔹 The wheel on its own
+    wheel = TimerWheel(tick=args.tick)
+    started = time.perf_counter()
+    for key in keys:
+        wheel.schedule(key, rng.uniform(0, 3600))
+    scheduled = time.perf_counter()
+    for key in keys[::2]:
+        wheel.cancel(key)
+    cancelled = time.perf_counter()
+    for key in keys[1::4]:
+        wheel.schedule(key, rng.uniform(0, 3600))
+    rescheduled = time.perf_counter()
+    expired = wheel.advance(time.monotonic() + 3601)
+    advanced = time.perf_counter()
+    print(f"timer wheel, {args.rooms} rooms: schedule {rate(args.rooms, scheduled - started)}, "
+          f"cancel {rate(len(keys[::2]), cancelled - scheduled)}, reschedule {rate(len(keys[1::4]), rescheduled - cancelled)}, "
+          f"one hour of expiry {(advanced - rescheduled) * 1000:.0f} ms for {len(expired)} timers")
+
+    # 🔹 Active games with a running turn, as get_emoji_puzzle leaves them
+    fake = FakeSupabaseClient()
+    install(fake)
+    database = fake.database
+    with database.lock:
+        database.load("players_in_room", [{"room_id": key, "user_id": f"{key[:-4]}{seat:04d}"} for key in keys for seat in range(3)])
+        states = {row["room_id"]: row for row in database.load("game_state", [
+            {"room_id": key, "current_turn": f"{key[:-4]}0000", "total_rounds": 5} for key in keys])}
+        now = datetime.utcnow()
+        deadlines = {key: now + timedelta(seconds=rng.uniform(0.5, args.spread)) for key in keys}
+        for key in keys:
+            states[key]["turn_end_time"] = deadlines[key].isoformat()
+    fake.latency = LatencyModel(args.latency_ms, 0, args.seed)
+
+    turn_scheduler.TURN_GRACE_SECONDS = 0
+    # Only the advance itself is measured, nobody streams these rooms
+    scheduler = TurnScheduler(tick=args.tick, batch_size=args.batch, on_advanced=None)
+    started = time.perf_counter()
+    for key in keys:
+        scheduler.schedule(key, deadlines[key])
+    schedule_seconds = time.perf_counter() - started
+
+    # Turns taken in time: the route clears the deadline and cancels the timer
+    taken = rng.sample(keys, int(len(keys) * args.taken))
+    with database.lock:
+        for key in taken:
+            states[key]["turn_end_time"] = None
+    for key in taken:
+        scheduler.cancel(key)
+
+    database.take_round_trips()
+    lateness = []
+    while len(scheduler.wheel):
+        time.sleep(scheduler.wheel.until_next_tick())
+        for row in scheduler.run_due():
+            lateness.append((datetime.utcnow() - deadlines[row["room_id"]]).total_seconds() * 1000)
+    round_trips = database.take_round_trips()
+
+    expected = len(keys) - len(taken)
+    lateness.sort()
+    print(f"turn scheduler, {args.rooms} rooms ({len(taken)} taken in time): scheduled in {schedule_seconds * 1000:.0f} ms, "
+          f"{len(lateness)}/{expected} expired turns passed on in {round_trips} round trips")
+    if lateness:
+        print(f"  lateness past deadline: p50 {lateness[len(lateness) // 2]:.0f} ms, "
+              f"p99 {lateness[min(int(len(lateness) * 0.99), len(lateness) - 1)]:.0f} ms, max {lateness[-1]:.0f} ms")
+    sys.exit(0 if len(lateness) == expected else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from repository import repository
+
+# 🔹 Recent messages kept per room, and how many rooms are kept
+CHAT_BUFFER_SIZE = int(os.getenv("CHAT_BUFFER_SIZE", "200"))
+CHAT_BUFFER_ROOMS = int(os.getenv("CHAT_BUFFER_ROOMS", "1000"))
+
+# 🔹 Messages sent through other workers show up after at most this long
+CHAT_RESYNC_SECONDS = float(os.getenv("CHAT_RESYNC_SECONDS", "1"))
+
+# 🔹 Messages returned by get_messages when no limit is given
+CHAT_PAGE_SIZE = 50
+
+# 🔹 Ids are handed out when an insert starts, so a message can commit after one with a higher id, but it is
+#    committed at most this long after its timestamp; newer messages are read again until they are older than this
+CHAT_COMMIT_WINDOW_SECONDS = float(os.getenv("CHAT_COMMIT_WINDOW_SECONDS", "10"))
+
+MESSAGE_FIELDS = ("id", "sender_id", "message", "timestamp")
+
+
+def sent_at(message):
+    value = message.get("timestamp")
+    if not value:
+        return 0
+    stamp = value if isinstance(value, datetime) else datetime.fromisoformat(value)
+    # Timestamps are written as naive UTC
+    return (stamp if stamp.tzinfo else stamp.replace(tzinfo=timezone.utc)).timestamp()
+
+
+# 🔹 Highest id of the messages (sorted by id) sent before `before`: every message with a lower id had committed
+#    by then, or None when all of them are newer
+def settled_id(messages, before):
+    for message in reversed(messages):
+        if sent_at(message) <= before - CHAT_COMMIT_WINDOW_SECONDS:
+            return message["id"]
+    return None
+
+
+# 🔹 `after` as sent by clients: a message id, or the next_cursor of a previous read, "<id>:<id>,<id>...":
+#    everything up to the first id has been delivered, and so have the listed newer ids
+def parse_cursor(value):
+    if value is None or value == "":
+        return None
+    settled, _, seen = str(value).partition(":")
+    return int(settled), frozenset(int(message_id) for message_id in seen.split(",") if message_id)
+
+
+def format_cursor(settled, seen):
+    return f"{settled}:{','.join(str(message_id) for message_id in sorted(seen))}" if seen else str(settled)
+
+
+class RoomMessages:
+    def __init__(self):
+        self.messages = []
+        self.ids = set()
+        self.loaded = False
+        self.complete = False
+        self.synced_at = None
+        # Wall clock time the last sync started; the buffer holds every message committed by then
+        self.synced_wall = None
+
+
+class ChatBuffer:
+    """Ring buffer of each active room's newest chat messages, ordered by message id.
+
+    Reads are answered from the buffer when it covers the requested cursor; a read
+    more than CHAT_RESYNC_SECONDS after the last sync first pulls the delta from the table,
+    starting from the last message that was settled (older than CHAT_COMMIT_WINDOW_SECONDS)
+    at the previous sync, so messages that committed late are picked up too.
+    """
+
+    def __init__(self, size=CHAT_BUFFER_SIZE, max_rooms=CHAT_BUFFER_ROOMS):
+        self.size = size
+        self.max_rooms = max_rooms
+        self._lock = threading.Lock()
+        self._rooms = OrderedDict()
+
+    def _room(self, room_id):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is None:
+                room = self._rooms[room_id] = RoomMessages()
+                while len(self._rooms) > self.max_rooms:
+                    self._rooms.popitem(last=False)
+            else:
+                self._rooms.move_to_end(room_id)
+            return room
+
+    def _add(self, room, message):
+        message = {field: message.get(field) for field in MESSAGE_FIELDS}
+        if message["id"] in room.ids:
+            return
+        room.ids.add(message["id"])
+
+        messages = room.messages
+        if not messages or messages[-1]["id"] < message["id"]:
+            messages.append(message)
+        else:
+            # Out of order commit from another worker, keep the buffer sorted
+            index = len(messages)
+            while index and messages[index - 1]["id"] > message["id"]:
+                index -= 1
+            messages.insert(index, message)
+
+        if len(messages) > self.size:
+            for dropped in messages[:len(messages) - self.size]:
+                room.ids.discard(dropped["id"])
+            del messages[:len(messages) - self.size]
+            room.complete = False
+
+    def _reset(self, room, rows):
+        room.messages = []
+        room.ids = set()
+        for row in rows:
+            self._add(room, row)
+        room.complete = len(rows) < self.size
+        room.loaded = True
+
+    def _sync(self, room_id, room):
+        synced_at = room.synced_at
+        if synced_at is not None and time.monotonic() - synced_at < CHAT_RESYNC_SECONDS:
+            return
+
+        started, started_wall = time.monotonic(), time.time()
+        if not room.loaded:
+            rows = repository.list_recent_messages(room_id, self.size)
+            with self._lock:
+                self._reset(room, rows)
+        else:
+            # Messages already buffered are skipped by id
+            with self._lock:
+                last_id = settled_id(room.messages, room.synced_wall)
+                if last_id is None:
+                    last_id = room.messages[0]["id"] - 1 if room.messages and not room.complete else 0
+            rows = repository.list_messages_after(room_id, last_id, self.size)
+            if len(rows) >= self.size:
+                # More arrived than the buffer holds, start over from the newest page
+                rows = repository.list_recent_messages(room_id, self.size)
+                with self._lock:
+                    self._reset(room, rows)
+            else:
+                with self._lock:
+                    for row in rows:
+                        self._add(room, row)
+        room.synced_at, room.synced_wall = started, started_wall
+
+    # 🔹 A message written by this worker, visible to the next read without a resync
+    def add(self, room_id, message):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None and room.loaded:
+                self._add(room, message)
+
+    # 🔹 Every message with an id above `after` (or the newest ones), at most `count`, oldest first; with the
+    #    wall clock time all the messages committed by then are known to be in the result
+    def _read(self, room_id, after, count):
+        room = self._room(room_id)
+        self._sync(room_id, room)
+
+        with self._lock:
+            messages = room.messages
+            if after is None:
+                if room.complete or len(messages) >= count:
+                    return messages[-count:], room.synced_wall
+            elif room.complete or (messages and messages[0]["id"] <= after):
+                return self._after(messages, after, count), room.synced_wall
+
+        # The cursor is older than the buffer
+        read_at = time.time()
+        if after is None:
+            return repository.list_recent_messages(room_id, count), read_at
+        return repository.list_messages_after(room_id, after, count), read_at
+
+    @staticmethod
+    def _after(messages, after, count):
+        start = len(messages)
+        while start and messages[start - 1]["id"] > after:
+            start -= 1
+        return messages[start:start + count]
+
+    # 🔹 The newest messages, or the ones after a cursor (see parse_cursor) the client has not seen yet, at most
+    #    `limit`, oldest first; with the cursor of the next read
+    def page(self, room_id, cursor=None, limit=CHAT_PAGE_SIZE):
+        after, seen = cursor or (None, frozenset())
+        # The ids already seen come back from the read, they don't count against the limit
+        read, read_at = self._read(room_id, after, limit + len(seen))
+        messages = [message for message in read if message["id"] not in seen][:limit]
+
+        # Everything read up to the last message returned has now been delivered
+        if len(messages) >= limit:
+            read = [message for message in read if message["id"] <= messages[-1]["id"]]
+        settled = settled_id(read, read_at)
+        if settled is None:
+            settled = after if after is not None else (read[0]["id"] - 1 if read else 0)
+        delivered = seen.union(message["id"] for message in read)
+        return messages, format_cursor(settled, {message_id for message_id in delivered if message_id > settled})
+
+    def drop(self, room_id):
+        with self._lock:
+            self._rooms.pop(room_id, None)
+
+
+chat_buffer = ChatBuffer()
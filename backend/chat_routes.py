@@ -1,68 +1,34 @@
 from flask import Blueprint, request, jsonify
-from config import supabase_client
 from middleware import token_required
-import uuid
-from datetime import datetime
+from chat_buffer import CHAT_PAGE_SIZE
+from query_tracer import query_budget
+import chat_service
 
 chat_blueprint = Blueprint("chat", __name__)
-
 @chat_blueprint.route("/send_message", methods=["POST"])
+@query_budget(2)
 @token_required
 def send_message(user_id):
     try:
-        data = request.json
-        room_id = data.get("room_id")
-        message = data.get("message")
-
-        if not room_id or not message:
-            return jsonify({"error": "room_id and message are required"}), 400
-
-        # 🔹 Validate room_id as UUID
-        try:
-            room_id = str(uuid.UUID(room_id))
-        except ValueError:
-            return jsonify({"error": "Invalid room_id format. Must be a valid UUID."}), 400
-
-        # 🔹 Check if the room exists
-        room_check = supabase_client.table("game_rooms").select("id").eq("id", room_id).execute()
-
-        if not room_check.data:
-            return jsonify({"error": "Room does not exist. Please create or join a valid room."}), 400
-
-        # Insert message into chat table with correct timestamp format
-        response = supabase_client.table("chat_messages").insert({
-            "room_id": room_id,
-            "sender_id": user_id,
-            "message": message,
-            "timestamp": datetime.utcnow().isoformat()
-        }).execute()
-
-        return jsonify({"message": "Message sent successfully!"})
+        body, status = chat_service.send_message(user_id, request.json)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
-# 🔹 Get all chat messages in a room
+# 🔹 Get chat messages in a room: the newest ones, or only those after the `after` cursor (a message id or a next_cursor)
 @chat_blueprint.route("/get_messages/<room_id>", methods=["GET"])
+@query_budget(1)
 @token_required
 def get_messages(user_id, room_id):
     try:
-        # 🔹 Validate room_id as UUID
-        try:
-            room_id = str(uuid.UUID(room_id))
-        except ValueError:
-            return jsonify({"error": "Invalid room_id format. Must be a valid UUID."}), 400
+        after = request.args.get("after")
+        limit = request.args.get("limit", CHAT_PAGE_SIZE, type=int)
 
-        response = supabase_client.table("chat_messages")\
-            .select("sender_id, message, timestamp")\
-            .eq("room_id", room_id)\
-            .order("timestamp", desc=False)\
-            .execute()
-
-        return jsonify({"messages": response.data})
+        body, status = chat_service.get_messages(room_id, after, limit)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
-
@@ -0,0 +1,58 @@
+from datetime import datetime
+from repository import repository
+from room_registry import room_registry, valid_room_id
+from chat_buffer import chat_buffer, parse_cursor, CHAT_BUFFER_SIZE
+
+# 🔹 Handler logic shared by chat_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+def send_message(user_id, data):
+    room_id = data.get("room_id")
+    message = data.get("message")
+
+    if not room_id or not message:
+        return {"error": "room_id and message are required"}, 400
+
+    # 🔹 Validate room_id as UUID
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    # 🔹 Check if the room exists
+    if not room_registry.exists(room_id):
+        return {"error": "Room does not exist. Please create or join a valid room."}, 400
+
+    # Insert message into chat table with correct timestamp format
+    row = repository.insert_message({
+        "room_id": room_id,
+        "sender_id": user_id,
+        "message": message,
+        "timestamp": datetime.utcnow().isoformat()
+    })
+    if row:
+        chat_buffer.add(room_id, row)
+
+    return {"message": "Message sent successfully!", "id": row["id"] if row else None}, 200
+
+
+# 🔹 The newest messages, or only those after the `after` cursor: a message id, or the next_cursor of the previous
+#    read, which also returns the messages below it that committed late, each exactly once
+def get_messages(room_id, after, limit):
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    try:
+        cursor = parse_cursor(after)
+    except ValueError:
+        return {"error": "after must be a message id or a next_cursor"}, 400
+
+    messages, next_cursor = chat_buffer.page(room_id, cursor, min(max(limit, 1), CHAT_BUFFER_SIZE))
+
+    # `cursor` is the highest id returned so far, `next_cursor` is what to send back as `after`
+    last_id = max([message["id"] for message in messages] + ([cursor[0], *cursor[1]] if cursor else []), default=None)
+    return {
+        "messages": messages,
+        "cursor": last_id,
+        "next_cursor": next_cursor
+    }, 200
@@ -1,13 +1,63 @@
 import os
+import threading
 from dotenv import load_dotenv
-import supabase
+from metrics import instrument_client
 
-# Load environment variables from .env file
+# Load environment variables from .env file; every other module reads its settings from here
 load_dotenv()
 
 # Get API keys from environment variables
 SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_KEY = os.getenv("SUPABASE_KEY")
+SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
-# Initialize Supabase client
-supabase_client = supabase.create_client(SUPABASE_URL, SUPABASE_KEY)
+# 🔹 Data access backend: "postgrest" (Supabase REST API) or "postgres" (direct, pooled connections)
+DATA_BACKEND = os.getenv("DATA_BACKEND", "postgrest")
+DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "10"))
+
+# 🔹 Forward room stream events between worker processes through Postgres LISTEN/NOTIFY (needs DATABASE_URL)
+ROOM_EVENTS_FANOUT = os.getenv("ROOM_EVENTS_FANOUT", "1") == "1"
+
+# 🔹 Comma separated blueprint names to serve (see app.BLUEPRINTS); empty serves all of them
+ENABLED_BLUEPRINTS = [name.strip() for name in os.getenv("ENABLED_BLUEPRINTS", "").split(",") if name.strip()]
+
+# 🔹 Load the puzzle catalog in the background at startup; /ready answers 503 until it is in memory
+WARM_UP = os.getenv("WARM_UP", "1") == "1"
+
+# 🔹 Run the turn timer thread in workers serving the game routes (see turn_scheduler.py)
+TURN_TIMERS = os.getenv("TURN_TIMERS", "1") == "1"
+
+# 🔹 Periodically delete rooms nobody has touched for ROOM_IDLE_TTL_SECONDS (see room_reaper.py)
+ROOM_REAPER = os.getenv("ROOM_REAPER", "1") == "1"
+
+
+class LazyClient:
+    """Creates the client on first use, and again in a forked worker so processes never share connections."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    self._client = self._factory()
+                    self._pid = os.getpid()
+        return self._client
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+
+def create_supabase_client():
+    # supabase pulls in httpx, gotrue, postgrest and realtime; only pay for the import when a client is needed
+    import supabase
+    return instrument_client(supabase.create_client(SUPABASE_URL, SUPABASE_KEY))
+
+
+# Supabase client, created on first query; its table and rpc queries are timed for /metrics
+supabase_client = LazyClient(create_supabase_client)
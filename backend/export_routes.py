@@ -0,0 +1,35 @@
+from flask import Blueprint, Response, request, jsonify
+from middleware import admin_required
+from query_tracer import query_budget
+from exporter import export, filename, DATASETS, FORMATS
+
+export_blueprint = Blueprint("export", __name__)
+
+
+@export_blueprint.route("/<dataset>", methods=["GET"])
+@query_budget(0)
+@admin_required
+def export_dataset(admin_user_id, dataset):
+    try:
+        if dataset not in DATASETS:
+            return jsonify({"error": "Dataset must be one of: " + ", ".join(DATASETS)}), 404
+
+        export_format = request.args.get("format", "ndjson")
+        if export_format not in FORMATS:
+            return jsonify({"error": "Format must be one of: " + ", ".join(FORMATS)}), 400
+
+        # 🔹 Compressed on the fly for clients that accept it; rows are read page by page while the body is sent
+        compress = "gzip" in request.headers.get("Accept-Encoding", "")
+        headers = {
+            "Content-Disposition": f'attachment; filename="{filename(dataset, export_format)}"',
+            "Cache-Control": "no-store",
+            "Vary": "Accept-Encoding",
+            "X-Accel-Buffering": "no"
+        }
+        if compress:
+            headers["Content-Encoding"] = "gzip"
+
+        return Response(export(dataset, export_format, compress), mimetype=FORMATS[export_format], headers=headers)
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -0,0 +1,162 @@
+"""Export the leaderboard, player progress or finished games as NDJSON or CSV.
+
+Run from backend/ with the usual .env:
+
+    python exporter.py leaderboard --format csv --gzip --output leaderboard.csv.gz
+
+The same streams are served to admins at /admin/export/<dataset>?format=ndjson|csv.
+"games" only has the finished games still stored: end_game and the room reaper delete them,
+so it reaches back at most ROOM_IDLE_TTL_SECONDS.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+import zlib
+from repository import repository
+from query_tracer import query_tracer
+
+# 🔹 Rows per database page, which is also the size of each chunk sent to the client
+EXPORT_PAGE_SIZE = int(os.getenv("EXPORT_PAGE_SIZE", "1000"))
+
+# 🔹 Lower than every uuid, where keyset pages on uuid columns start
+NIL_UUID = "00000000-0000-0000-0000-000000000000"
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _page(fetch, *args):
+    # Paging through a table is the point of an export, the tracer does not count it as an N+1 loop
+    with query_tracer.paused():
+        return fetch(*args)
+
+
+def score_pages(page_size):
+    after_id = 0
+    while True:
+        page = _page(repository.export_scores, after_id, page_size)
+        if page:
+            yield page
+        if len(page) < page_size:
+            return
+        after_id = page[-1]["id"]
+
+
+def progress_pages(page_size):
+    initial_page_size = page_size
+    after_user_id = NIL_UUID
+    while True:
+        page = _page(repository.export_progress, after_user_id, page_size)
+        if len(page) < page_size:
+            if page:
+                yield page
+            return
+        # The keyset is the user, so a full page holds back its last user's rows
+        # (some of that user's genres may be on the next page) and starts the next page with them
+        last_user_id = page[-1]["user_id"]
+        complete = [row for row in page if row["user_id"] != last_user_id]
+        if not complete:
+            # One user with a whole page of genres: take a larger page instead, for this page only
+            page_size *= 2
+            continue
+        yield complete
+        after_user_id = complete[-1]["user_id"]
+        page_size = initial_page_size
+
+
+def _game_row(game, players):
+    scores = (game.pop("game_data", None) or {}).get("scores") or {}
+    game["players"] = [{"user_id": player["user_id"], "username": player["username"], "score": scores.get(str(player["user_id"]), 0)}
+                       for player in players]
+    return game
+
+
+def game_pages(page_size):
+    after_room_id = NIL_UUID
+    while True:
+        page = _page(repository.export_finished_games, after_room_id, page_size)
+        if page:
+            # Every page's players in one query; scores are kept in the game's game_data
+            players = {}
+            for player in _page(repository.export_room_players, [game["room_id"] for game in page]):
+                players.setdefault(str(player["room_id"]), []).append(player)
+            yield [_game_row(game, players.get(str(game["room_id"]), [])) for game in page]
+        if len(page) < page_size:
+            return
+        after_room_id = page[-1]["room_id"]
+
+
+# 🔹 Dataset → (columns, page generator)
+DATASETS = {
+    "leaderboard": (("id", "user_id", "genre", "total_score", "timestamp"), score_pages),
+    "player_progress": (("user_id", "genre", "completed_levels"), progress_pages),
+    "games": (("room_id", "total_rounds", "current_round", "updated_at", "players"), game_pages)
+}
+
+
+def _ndjson(columns, pages):
+    for page in pages:
+        yield "".join(json.dumps({column: row.get(column) for column in columns}, default=str, ensure_ascii=False) + "\n" for row in page)
+
+
+def _csv(columns, pages):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for page in pages:
+        for row in page:
+            # Nested values (a game's players) go in one cell as JSON
+            writer.writerow([json.dumps(value, default=str) if isinstance(value, (list, dict)) else value
+                             for value in (row.get(column) for column in columns)])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # An empty table still gets its header
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _gzip(chunks):
+    # wbits 31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+# 🔹 The export as a stream of byte chunks, one page of rows at a time
+def export(dataset, export_format="ndjson", compress=False, page_size=EXPORT_PAGE_SIZE):
+    columns, pages = DATASETS[dataset]
+    encode = _csv if export_format == "csv" else _ndjson
+    chunks = (text.encode() for text in encode(columns, pages(page_size)))
+    return _gzip(chunks) if compress else chunks
+
+
+def filename(dataset, export_format, compress=False):
+    return f"{dataset}.{export_format}" + (".gz" if compress else "")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("dataset", choices=sorted(DATASETS))
+    parser.add_argument("--format", choices=sorted(FORMATS), default="ndjson")
+    parser.add_argument("--gzip", action="store_true", help="compress the output")
+    parser.add_argument("--output", help="default: standard output")
+    parser.add_argument("--page-size", type=int, default=EXPORT_PAGE_SIZE)
+    args = parser.parse_args()
+
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for chunk in export(args.dataset, args.format, args.gzip, args.page_size):
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+import asyncio
+import os
+from websockets.asyncio.server import serve
+from room_hub import room_hub
+
+# 🔹 WebSocket game server: rooms are played in memory and persisted to game_state in the background
+GAME_SERVER_HOST = os.getenv("GAME_SERVER_HOST", "0.0.0.0")
+GAME_SERVER_PORT = int(os.getenv("GAME_SERVER_PORT", "8765"))
+
+
+async def handler(websocket):
+    try:
+        async for message in websocket:
+            await room_hub.handle(websocket, message)
+    finally:
+        await room_hub.disconnect(websocket)
+
+
+async def main():
+    async with serve(handler, GAME_SERVER_HOST, GAME_SERVER_PORT) as server:
+        print(f"Game server listening on ws://{GAME_SERVER_HOST}:{GAME_SERVER_PORT}")
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,175 @@
+from datetime import datetime, timedelta
+from repository import repository
+from puzzle_catalog import puzzle_catalog
+from puzzle_deck import puzzle_deck
+from room_codes import room_codes
+from room_registry import room_registry, valid_room_id
+from game_state_cas import modify_game_state, GameStateConflict
+from turn_scheduler import turn_scheduler, TURN_SECONDS
+
+# 🔹 Handler logic shared by game_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+def join_room(data):
+    room_code = data.get("room_code")
+
+    if not room_code:
+        return {"error": "room_code is required"}, 400
+
+    # Find the room by code
+    room_id = room_codes.resolve(room_code)
+
+    if not room_id:
+        return {"error": "Invalid room code. Room does not exist."}, 400
+
+    return {"room_id": room_id, "message": "Joined room successfully!"}, 200
+
+
+def update_game_state(user_id, data):
+    room_id = data.get("room_id")
+    game_data = data.get("game_data")
+    next_turn = data.get("next_turn")
+
+    if not room_id or not game_data or not next_turn:
+        return {"error": "room_id, game_data, and next_turn are required"}, 400
+
+    # 🔹 Validate room_id as UUID
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    # 🔹 Check if the room exists in game_rooms
+    if not room_registry.exists(room_id):
+        return {"error": "Room does not exist. Please create a game room first."}, 400
+
+    fields = {
+        "current_turn": next_turn,
+        "game_data": game_data,
+        "updated_at": datetime.utcnow().isoformat()
+    }
+    version = data.get("version")
+
+    if version is None:
+        # 🔹 No version sent: overwrite the latest state, still as a compare-and-swap so the version moves on
+        #    and clients holding the old one get a 409 instead of silently undoing this write
+        try:
+            written, new_version = modify_game_state(room_id, lambda state: (fields, state["version"] + 1) if state else (None, None))
+        except GameStateConflict as e:
+            return {"error": str(e)}, 409
+
+        if not written:
+            # First write of the room creates its game state
+            repository.upsert_game_state({"room_id": room_id, **fields})
+            new_version = 0
+
+        return {"message": "Game state updated successfully!", "version": new_version}, 200
+
+    try:
+        version = int(version)
+    except (TypeError, ValueError):
+        return {"error": "version must be an integer"}, 400
+
+    # 🔹 The client sends the version it edited; refuse the write if someone else wrote since
+    row = repository.update_game_state_if(room_id, version, fields)
+    if row is None:
+        return {"error": "Game state has changed, fetch it again before updating."}, 409
+
+    return {"message": "Game state updated successfully!", "version": row["version"]}, 200
+
+
+def game_state(room_id):
+    # Validate room_id as UUID
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    state = repository.get_game_state(room_id)
+
+    if not state:
+        return {"error": "No game state found for this room."}, 404
+
+    return state, 200
+
+
+def take_turn(user_id, data):
+    room_id = data.get("room_id")
+    guess = data.get("guess")
+    next_turn = data.get("next_turn")
+
+    if not room_id or not guess or not next_turn:
+        return {"error": "room_id, guess, and next_turn are required"}, 400
+
+    # Validate room_id as UUID
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    # 🔹 Turn check, points and the next turn in one database call: concurrent turns queue on the row lock
+    #    instead of re-reading and retrying
+    result = repository.take_game_turn(room_id, user_id, next_turn, 10 if guess == "correct" else 0)
+
+    if result["status"] == "missing":
+        return {"error": "Game state not found."}, 404
+
+    if result["status"] == "ended":
+        return {"error": "Game has already ended."}, 400
+
+    if result["status"] == "not_your_turn":
+        return {"error": "Not your turn!", "expected_turn": result["current_turn"], "your_id": user_id}, 403
+
+    # 🔹 The turn was taken in time, its timer has nothing left to do
+    turn_scheduler.cancel(room_id)
+
+    return {
+        "message": "Turn taken successfully!",
+        "next_turn": next_turn,
+        "scores": result["scores"],
+        "game_over": not result["is_active"]
+    }, 200
+
+
+def turn_info(room_id):
+    # Validate room_id as UUID
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format. Must be a valid UUID."}, 400
+
+    state = repository.get_game_state(room_id)
+
+    if not state:
+        return {"error": "Game state not found."}, 404
+
+    return {key: state[key] for key in ("current_turn", "current_round", "total_rounds", "is_active")}, 200
+
+
+def emoji_puzzle(room_id, genre):
+    # Validate room_id
+    room_id = valid_room_id(room_id)
+    if not room_id:
+        return {"error": "Invalid room_id format"}, 400
+
+    if not puzzle_catalog.levels(genre):
+        return {"error": "No emoji puzzles found for this genre"}, 404
+
+    # Next card of the room's deck for this genre, no repeats until the deck runs out
+    random_puzzle = puzzle_deck.draw(room_id, genre)
+
+    if not random_puzzle:
+        return {"error": "Room not found"}, 404
+
+    # Set a 30-second timer for the turn
+    turn_end_time = datetime.utcnow() + timedelta(seconds=TURN_SECONDS)
+
+    # Update game_state with turn_end_time
+    repository.update_game_state(room_id, {
+        "turn_end_time": turn_end_time.isoformat()
+    })
+
+    # 🔹 If nobody takes the turn by then, the scheduler passes it on
+    turn_scheduler.schedule(room_id, turn_end_time)
+
+    return {
+        "puzzle_id": random_puzzle["id"],
+        "emoji_clue": random_puzzle["emoji_clue"],
+        "turn_end_time": turn_end_time.isoformat()
+    }, 200
@@ -0,0 +1,53 @@
+import os
+import random
+import time
+import metrics
+from repository import repository
+
+# 🔹 Reads and compare-and-swap writes tried before a request gives up with a conflict
+GAME_STATE_CAS_ATTEMPTS = int(os.getenv("GAME_STATE_CAS_ATTEMPTS", "10"))
+
+# 🔹 The random pause before retry n is up to this times 2^(n-1), so colliding writers spread out
+GAME_STATE_CAS_BACKOFF_SECONDS = float(os.getenv("GAME_STATE_CAS_BACKOFF_SECONDS", "0.005"))
+
+game_state_attempts = metrics.registry.register(metrics.Histogram(
+    "game_state_update_attempts", "Compare-and-swap attempts per game_state update.", buckets=(1, 2, 3, 4, 5, 6, 8, 10)))
+game_state_conflicts = metrics.registry.register(metrics.Counter(
+    "game_state_update_conflicts_total", "game_state updates that ran out of attempts."))
+
+
+class GameStateConflict(Exception):
+    pass
+
+
+def backoff(attempt):
+    return random.uniform(0, GAME_STATE_CAS_BACKOFF_SECONDS * 2 ** (attempt - 1))
+
+
+def modify_game_state(room_id, change, state=None, attempts=GAME_STATE_CAS_ATTEMPTS):
+    """Read-modify-write of a room's game_state that never loses a concurrent update.
+
+    change(state) gets the current row (or None) and returns (fields, result): the
+    fields to write, or None to stop without writing, and what to hand back to the
+    caller. When another request wrote first, the row is read again and change() runs
+    on the fresh copy. Returns (written, result); `state` saves the first read when
+    the caller already has it.
+    """
+    for attempt in range(1, attempts + 1):
+        if state is None:
+            state = repository.get_game_state(room_id)
+        fields, result = change(state)
+        if fields is None:
+            game_state_attempts.observe(attempt)
+            return False, result
+        if repository.update_game_state_if(room_id, state["version"], fields) is not None:
+            game_state_attempts.observe(attempt)
+            return True, result
+        state = None
+        if attempt < attempts:
+            time.sleep(backoff(attempt))
+
+    game_state_attempts.observe(attempts)
+    game_state_conflicts.inc()
+    raise GameStateConflict("The game state changed too often, try again")
+
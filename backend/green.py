@@ -0,0 +1,34 @@
+# 🔹 True in a process whose sockets gevent has monkey patched (gunicorn -k gevent does it before loading the app)
+def gevent_active():
+    try:
+        from gevent import monkey
+    except ImportError:
+        return False
+    return monkey.is_module_patched("socket")
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """Waits for psycopg2 on the gevent hub instead of blocking the whole worker, as psycogreen does."""
+    import psycopg2
+    import psycopg2.extensions
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = conn.poll()
+        if state == psycopg2.extensions.POLL_OK:
+            return
+        if state == psycopg2.extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == psycopg2.extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+
+# 🔹 Under gevent a plain psycopg2 query holds up every greenlet of the worker; call before connecting
+def make_psycopg2_green():
+    if not gevent_active():
+        return False
+    import psycopg2.extensions
+    psycopg2.extensions.set_wait_callback(gevent_wait_callback)
+    return True
@@ -0,0 +1,68 @@
+import hashlib
+import os
+from functools import wraps
+
+# 🔹 How long clients and proxies may reuse data that only changes with a catalog reload
+HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+
+# 🔹 Strong ETag of a response: the request path plus the version of the data it was built from
+def make_etag(*parts):
+    digest = hashlib.sha256("\x1f".join(str(part) for part in parts).encode()).hexdigest()[:32]
+    return f'"{digest}"'
+
+
+def etag_matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match uses the weak comparison, so W/"x" matches "x"
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(etag, max_age=0, private=False):
+    # max_age 0: the client keeps the body but asks every time, and mostly gets a 304
+    scope = "private" if private else "public"
+    return {
+        "ETag": etag,
+        "Cache-Control": f"{scope}, max-age={max_age}" if max_age else f"{scope}, no-cache"
+    }
+
+
+# 🔹 Flask: 304 when the client already has this version, otherwise build() with the cache headers added
+def respond(etag, build, max_age=0, private=False):
+    from flask import Response, make_response, request
+
+    headers = cache_headers(etag, max_age, private)
+    if etag_matches(request.headers.get("If-None-Match"), etag):
+        return Response(status=304, headers=headers)
+
+    response = make_response(build())
+    # Errors and empty results are not cached
+    if response.status_code == 200:
+        response.headers.update(headers)
+    return response
+
+
+def conditional_get(version, max_age=0, private=False):
+    """Serves the route with an ETag derived from version(*route args); unchanged data costs a 304 and no handler call."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            from flask import request
+
+            try:
+                etag = make_etag(request.full_path, version(*args, **kwargs))
+            except Exception:
+                # No version to compare against, let the handler answer (and report) as usual
+                return f(*args, **kwargs)
+            return respond(etag, lambda: f(*args, **kwargs), max_age, private)
+        return decorated
+    return decorator
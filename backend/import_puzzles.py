@@ -0,0 +1,270 @@
+"""Import a puzzle pack (CSV or JSON Lines, optionally gzipped) into emoji_puzzles.
+
+Run from backend/ with the usual .env:
+
+    python import_puzzles.py packs/movies.csv --genre Movies
+
+Records need an emoji_clue (or clue) and a correct_answer (or answer), and a genre unless
+--genre gives one. The pack is streamed in batches of --batch records: each batch is checked
+against the content hashes already in the table, gets the next level numbers of its genres
+and is written in one upsert. After every batch the position is saved to a checkpoint file,
+so a failed import run again with the same arguments continues where it stopped.
+
+Puzzles without a content hash (added by hand, or from before hashes existed) get one
+before every import, from the same normalization; --backfill does only that.
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import json
+import os
+import sys
+import unicodedata
+from repository import repository
+
+# 🔹 Records per existing-hash lookup and upsert; every hash of a batch goes in one query string
+PUZZLE_IMPORT_BATCH = int(os.getenv("PUZZLE_IMPORT_BATCH", "200"))
+
+MAX_GENRE_LENGTH = 50
+MAX_CLUE_LENGTH = 100
+MAX_ANSWER_LENGTH = 200
+
+# 🔹 Column names accepted for each field, first match wins
+FIELD_NAMES = {
+    "genre": ("genre",),
+    "emoji_clue": ("emoji_clue", "clue", "emojis"),
+    "correct_answer": ("correct_answer", "answer")
+}
+
+
+class InvalidPuzzle(ValueError):
+    pass
+
+
+# 🔹 NFC, whitespace runs collapsed to one space, trimmed
+def normalize_text(value):
+    return " ".join(unicodedata.normalize("NFC", str(value)).split())
+
+
+# 🔹 Hash of already normalized fields; every content_hash in the table comes from here
+def content_hash(genre, emoji_clue, correct_answer):
+    key = "\x1f".join(part.lower() for part in (genre, emoji_clue, correct_answer))
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+
+def normalize(record, default_genre=None):
+    if not isinstance(record, dict):
+        raise InvalidPuzzle("not a JSON object")
+
+    def field(name):
+        for column in FIELD_NAMES[name]:
+            if record.get(column) not in (None, ""):
+                return normalize_text(record[column])
+        return ""
+
+    genre = field("genre") or normalize_text(default_genre or "")
+    emoji_clue = field("emoji_clue")
+    correct_answer = field("correct_answer")
+
+    if not genre:
+        raise InvalidPuzzle("genre is missing")
+    if not emoji_clue:
+        raise InvalidPuzzle("emoji_clue is missing")
+    if not correct_answer:
+        raise InvalidPuzzle("correct_answer is missing")
+    if len(genre) > MAX_GENRE_LENGTH:
+        raise InvalidPuzzle(f"genre is longer than {MAX_GENRE_LENGTH} characters")
+    if len(emoji_clue) > MAX_CLUE_LENGTH:
+        raise InvalidPuzzle(f"emoji_clue is longer than {MAX_CLUE_LENGTH} characters")
+    if len(correct_answer) > MAX_ANSWER_LENGTH:
+        raise InvalidPuzzle(f"correct_answer is longer than {MAX_ANSWER_LENGTH} characters")
+    if not any(unicodedata.category(char) == "So" for char in emoji_clue):
+        raise InvalidPuzzle("emoji_clue has no emoji")
+
+    return {
+        "genre": genre,
+        "emoji_clue": emoji_clue,
+        "correct_answer": correct_answer,
+        "content_hash": content_hash(genre, emoji_clue, correct_answer)
+    }
+
+
+# 🔹 Yields (line number, record) without holding more than one record; unparseable lines give None
+def read_pack(path, pack_format=None):
+    name = path[:-3] if path.endswith(".gz") else path
+    pack_format = pack_format or ("csv" if name.endswith(".csv") else "jsonl")
+    opener = gzip.open if path.endswith(".gz") else open
+
+    with opener(path, "rt", encoding="utf-8-sig", newline="") as handle:
+        if pack_format == "csv":
+            reader = csv.DictReader(handle)
+            for record in reader:
+                yield reader.line_num, record
+            return
+
+        for line_number, line in enumerate(handle, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            yield line_number, record
+
+
+class PuzzleImporter:
+    """Writes normalized puzzles batch by batch, numbering levels on from each genre's last one."""
+
+    def __init__(self, batch_size=PUZZLE_IMPORT_BATCH, checkpoint_path=None, dry_run=False):
+        self.batch_size = batch_size
+        self.checkpoint_path = checkpoint_path
+        self.dry_run = dry_run
+        self.stats = {"imported": 0, "duplicates": 0, "invalid": 0}
+        self._next_levels = {}
+
+    def _next_level(self, genre):
+        if genre not in self._next_levels:
+            self._next_levels[genre] = repository.last_puzzle_level(genre) + 1
+        level = self._next_levels[genre]
+        self._next_levels[genre] = level + 1
+        return level
+
+    def _write(self, batch):
+        known = repository.existing_puzzle_hashes(sorted({row["content_hash"] for row in batch}))
+        fresh = []
+        for row in batch:
+            # Already in the table, or earlier in the same batch
+            if row["content_hash"] in known:
+                self.stats["duplicates"] += 1
+                continue
+            known.add(row["content_hash"])
+            fresh.append(row)
+        if not fresh:
+            return
+
+        for row in fresh:
+            row["level_number"] = self._next_level(row["genre"])
+        if self.dry_run:
+            self.stats["imported"] += len(fresh)
+            return
+
+        try:
+            inserted = repository.insert_puzzles(fresh)
+        except Exception:
+            # Nothing of the batch is in; the numbering is read again from the table
+            self._next_levels = {}
+            raise
+        self.stats["imported"] += len(inserted)
+        if len(inserted) < len(fresh):
+            # Another import wrote some of these puzzles in the meantime
+            self.stats["duplicates"] += len(fresh) - len(inserted)
+            self._next_levels = {}
+            print(f"{len(fresh) - len(inserted)} puzzles were imported concurrently, their levels are left as gaps", file=sys.stderr)
+
+    # 🔹 Hashes the puzzles that have none; of puzzles that are duplicates only the oldest gets the hash
+    def backfill(self):
+        after_id = 0
+        hashed = 0
+        while True:
+            page = repository.list_unhashed_puzzles(after_id, self.batch_size)
+            if not page:
+                return hashed
+            after_id = page[-1]["id"]
+            hashes = {row["id"]: content_hash(*(normalize_text(row[name]) for name in ("genre", "emoji_clue", "correct_answer")))
+                      for row in page}
+            known = repository.existing_puzzle_hashes(sorted(set(hashes.values())))
+            for puzzle_id, puzzle_hash in hashes.items():
+                if puzzle_hash in known:
+                    continue
+                known.add(puzzle_hash)
+                if not self.dry_run:
+                    repository.set_puzzle_hash(puzzle_id, puzzle_hash)
+                hashed += 1
+
+    def _load_checkpoint(self, pack):
+        if not self.checkpoint_path or not os.path.exists(self.checkpoint_path):
+            return 0
+        with open(self.checkpoint_path) as handle:
+            checkpoint = json.load(handle)
+        if checkpoint.get("pack") != pack:
+            print(f"Ignoring checkpoint {self.checkpoint_path}, it belongs to another pack", file=sys.stderr)
+            return 0
+        self.stats.update(checkpoint["stats"])
+        print(f"Resuming after line {checkpoint['line']}")
+        return checkpoint["line"]
+
+    def _save_checkpoint(self, pack, line):
+        if not self.checkpoint_path or self.dry_run:
+            return
+        # Written aside and renamed, so a crash never leaves half a checkpoint
+        temporary = self.checkpoint_path + ".tmp"
+        with open(temporary, "w") as handle:
+            json.dump({"pack": pack, "line": line, "stats": self.stats}, handle)
+        os.replace(temporary, self.checkpoint_path)
+
+    def _flush(self, batch, pack, line):
+        self._write(batch)
+        self._save_checkpoint(pack, line)
+
+    # 🔹 Imports the whole pack; returns the counts of imported, duplicate and invalid records
+    def run(self, path, pack_format=None, default_genre=None):
+        pack = {"path": os.path.abspath(path), "size": os.path.getsize(path)}
+        resume_line = self._load_checkpoint(pack)
+        # Puzzles added without the importer would not be recognized as duplicates
+        self.backfill()
+
+        batch = []
+        line = resume_line
+        for line, record in read_pack(path, pack_format):
+            if line <= resume_line:
+                continue
+            try:
+                batch.append(normalize(record, default_genre))
+            except InvalidPuzzle as e:
+                self.stats["invalid"] += 1
+                print(f"{path}:{line}: {e}", file=sys.stderr)
+                continue
+            if len(batch) >= self.batch_size:
+                self._flush(batch, pack, line)
+                batch = []
+
+        if batch:
+            self._flush(batch, pack, line)
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            os.remove(self.checkpoint_path)
+        return self.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pack", nargs="?", help="CSV or JSON Lines file, .gz allowed")
+    parser.add_argument("--backfill", action="store_true", help="only hash the puzzles that have no content_hash yet")
+    parser.add_argument("--format", choices=("csv", "jsonl"), help="default: from the file extension")
+    parser.add_argument("--genre", help="genre of records that have none")
+    parser.add_argument("--batch", type=int, default=PUZZLE_IMPORT_BATCH, help="records per upsert")
+    parser.add_argument("--checkpoint", help="default: <pack>.checkpoint.json")
+    parser.add_argument("--dry-run", action="store_true", help="validate and count, write nothing")
+    args = parser.parse_args()
+    if not args.pack and not args.backfill:
+        parser.error("a pack is required unless --backfill is given")
+
+    if args.backfill:
+        hashed = PuzzleImporter(args.batch, dry_run=args.dry_run).backfill()
+        print(f"{'Would hash' if args.dry_run else 'Hashed'} {hashed} puzzles")
+        return
+
+    importer = PuzzleImporter(args.batch, args.checkpoint or args.pack + ".checkpoint.json", args.dry_run)
+    try:
+        stats = importer.run(args.pack, args.format, args.genre)
+    except Exception as e:
+        print("Import stopped:", str(e), file=sys.stderr)
+        print("Run the same command again to continue from the last saved batch.", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{'Would import' if args.dry_run else 'Imported'} {stats['imported']} puzzles, "
+          f"{stats['duplicates']} already present, {stats['invalid']} invalid")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,439 @@
+import heapq
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left, insort
+from datetime import datetime, timezone
+import metrics
+from repository import repository
+from query_tracer import query_tracer
+
+# 🔹 How often the in-memory board is rebuilt from the table to pick up writes made by other workers
+LEADERBOARD_RELOAD_SECONDS = int(os.getenv("LEADERBOARD_RELOAD_SECONDS", "300"))
+
+# 🔹 After a failed reload the boards keep serving what they have, and the next try waits this long
+LEADERBOARD_RELOAD_RETRY_SECONDS = int(os.getenv("LEADERBOARD_RELOAD_RETRY_SECONDS", "30"))
+
+# 🔹 Players kept in memory on each genre board; ranks below them are read from the table
+LEADERBOARD_GENRE_TOP_K = int(os.getenv("LEADERBOARD_GENRE_TOP_K", "100"))
+
+LEADERBOARD_PAGE_SIZE = 1000
+
+reconciled_entries = metrics.registry.register(metrics.Counter(
+    "leaderboard_reconciled_entries_total", "Scores a reload from the table found different from memory (writes of other workers, lost updates).", ("board",)))
+
+
+# 🔹 Stored timestamps are a mix of Unix seconds and ISO strings, normalise them to Unix seconds
+def to_unix(timestamp):
+    if timestamp is None:
+        return 0
+    if isinstance(timestamp, (int, float)):
+        return int(timestamp)
+    try:
+        return int(float(timestamp))
+    except ValueError:
+        parsed = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return int(parsed.timestamp())
+
+
+class RankedScores:
+    """Sorted array of (-score, user_id) keys with a user index, giving O(log N) rank lookups."""
+
+    def __init__(self):
+        self._keys = []
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def score(self, user_id):
+        return self._scores.get(user_id)
+
+    def set(self, user_id, score):
+        old_score = self._scores.get(user_id)
+        if old_score is not None:
+            del self._keys[bisect_left(self._keys, (-old_score, user_id))]
+        self._scores[user_id] = score
+        insort(self._keys, (-score, user_id))
+
+    def remove(self, user_id):
+        old_score = self._scores.pop(user_id, None)
+        if old_score is not None:
+            del self._keys[bisect_left(self._keys, (-old_score, user_id))]
+
+    # 🔹 Zero-based position of the user, None if the user has no score
+    def index(self, user_id):
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        return bisect_left(self._keys, (-score, user_id))
+
+    # 🔹 (user_id, score) pairs for positions start..end-1
+    def slice(self, start, end):
+        return [(user_id, -negative_score) for negative_score, user_id in self._keys[max(start, 0):end]]
+
+    # 🔹 Users whose score differs between the two (missing on one side counts too)
+    def differences(self, other):
+        changed = sum(1 for user_id, score in self._scores.items() if other.score(user_id) != score)
+        return changed + sum(1 for user_id in other._scores if user_id not in self._scores)
+
+
+class TopScores(RankedScores):
+    """The best `size` scores of a genre, with the same O(log K) lookups as RankedScores.
+
+    Players below the board are not kept. `floor` is the key of the best player left out (or
+    a bound on it); a player who falls to it is dropped too, so the board always holds the
+    true top len(board) of the genre. `complete` means every player of the genre is on it.
+    """
+
+    def __init__(self, size=LEADERBOARD_GENRE_TOP_K):
+        super().__init__()
+        self.size = size
+        self.complete = True
+        self.floor = None
+
+    # 🔹 Board of the given user → score mapping, the top `size` picked with a heap
+    @classmethod
+    def of(cls, scores, size=LEADERBOARD_GENRE_TOP_K):
+        board = cls(size)
+        best = heapq.nsmallest(size + 1, ((-score, user_id) for user_id, score in scores.items()))
+        for negative_score, user_id in best[:size]:
+            board.set(user_id, -negative_score)
+        if len(best) > size:
+            board._leave_out(best[size])
+        return board
+
+    def _ahead_of_floor(self, key):
+        return self.floor is None or key < self.floor
+
+    def _leave_out(self, key):
+        self.complete = False
+        self.floor = key if self.floor is None else min(self.floor, key)
+
+    def _prune(self):
+        while self._keys and not self._ahead_of_floor(self._keys[-1]):
+            self.remove(self._keys[-1][1])
+        while len(self._keys) > self.size:
+            key = self._keys[-1]
+            self.remove(key[1])
+            self._leave_out(key)
+
+    # 🔹 The player's current score in the genre, on the board or not
+    def offer(self, user_id, score):
+        if user_id not in self and not self._ahead_of_floor((-score, user_id)):
+            return
+        self.set(user_id, score)
+        self._prune()
+
+    # 🔹 A player who may be in the genre, off the board, now has this score
+    def bound(self, score):
+        if self.complete:
+            # Everybody in the genre is on the board, so the player is not in it
+            return
+        self._leave_out((-score, ""))
+        self._prune()
+
+
+class LeaderboardEngine:
+    """Per-user running totals of the leaderboard table, kept current as scores are written.
+
+    Each genre also has its own board of its best LEADERBOARD_GENRE_TOP_K players (see
+    TopScores): the score of the user's row for that genre (the first one, which is the row
+    every writer updates), so genre top lists and the ranks on the board are answered from
+    memory; ranks below it come from the table. Every reload rebuilds everything from the
+    table and counts what it had to repair. A failed reload is retried after
+    LEADERBOARD_RELOAD_RETRY_SECONDS.
+    """
+
+    def __init__(self, reload_seconds=LEADERBOARD_RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._failed_at = None
+        self._reloading = False
+        self._pending = None
+        self._ranked = RankedScores()
+        self._genres = {}
+        self._genre_sizes = {}
+        self._timestamps = {}
+        self._row_counts = {}
+        # Bumped on every change; the instance id keeps versions of different workers apart
+        self.version = 0
+        self._instance = uuid.uuid4().hex[:8]
+        # Called with (user_id, delta, timestamp) for every score change written through this worker
+        self.score_observers = []
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.reload_seconds:
+            return
+
+        if loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self._load()
+            return
+
+        failed_at = self._failed_at
+        if failed_at is not None and time.monotonic() - failed_at < LEADERBOARD_RELOAD_RETRY_SECONDS:
+            return
+
+        # One reload at a time, however many requests find the boards stale
+        with self._lock:
+            if self._reloading or self._pending is not None:
+                return
+            self._reloading = True
+        threading.Thread(target=self._reload_quietly, daemon=True).start()
+
+    def _reload_quietly(self):
+        try:
+            self._load()
+            self._failed_at = None
+        except Exception as e:
+            self._failed_at = time.monotonic()
+            print("Leaderboard reload failed:", str(e))
+        finally:
+            self._reloading = False
+
+    def _fetch_rows(self):
+        rows = []
+        start = 0
+        # One-off bulk load, not part of the request that happens to trigger it
+        with query_tracer.paused():
+            while True:
+                page = repository.list_leaderboard(start, LEADERBOARD_PAGE_SIZE)
+                rows.extend(page)
+                if len(page) < LEADERBOARD_PAGE_SIZE:
+                    return rows
+                start += LEADERBOARD_PAGE_SIZE
+
+    def _load(self):
+        # Writes that land while the table is being read are replayed on top of the snapshot
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+
+        try:
+            rows = self._fetch_rows()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        totals = {}
+        timestamps = {}
+        row_counts = {}
+        genre_scores = {}
+        for row in rows:
+            user_id = row["user_id"]
+            totals[user_id] = totals.get(user_id, 0) + (row["total_score"] or 0)
+            timestamps[user_id] = max(timestamps.get(user_id, 0), to_unix(row["timestamp"]))
+            row_counts[user_id] = row_counts.get(user_id, 0) + 1
+            # Rows come in id order, the first one of a genre is the one writers keep updating
+            if row.get("genre") is not None:
+                genre_scores.setdefault(row["genre"], {}).setdefault(user_id, row["total_score"] or 0)
+        genres = {genre: TopScores.of(scores) for genre, scores in genre_scores.items()}
+        genre_sizes = {genre: len(scores) for genre, scores in genre_scores.items()}
+
+        ranked = RankedScores()
+        for user_id, total in totals.items():
+            ranked.set(user_id, total)
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            previous = (self._ranked, self._genres) if self._loaded_at is not None else None
+            self._ranked, self._genres, self._timestamps, self._row_counts = ranked, genres, timestamps, row_counts
+            self._genre_sizes = genre_sizes
+            for apply, args in pending:
+                apply(*args)
+            self.version += 1
+            self._loaded_at = time.monotonic()
+
+        if previous is not None:
+            self._count_repairs(*previous)
+
+    def _count_repairs(self, ranked, genres):
+        repaired = self._ranked.differences(ranked)
+        if repaired:
+            reconciled_entries.inc("total", amount=repaired)
+        repaired = sum(board.differences(genres.get(genre, TopScores())) for genre, board in list(self._genres.items()))
+        repaired += sum(len(board) for genre, board in genres.items() if genre not in self._genres)
+        if repaired:
+            reconciled_entries.inc("genre", amount=repaired)
+
+    def _apply(self, apply, *args):
+        with self._lock:
+            if self._loaded_at is None and self._pending is None:
+                # Nothing loaded yet, the first read will pick the write up from the table
+                return
+            apply(*args)
+            self.version += 1
+            if self._pending is not None:
+                self._pending.append((apply, args))
+
+    def _touch(self, user_id, timestamp):
+        if timestamp is not None:
+            self._timestamps[user_id] = max(self._timestamps.get(user_id, 0), to_unix(timestamp))
+
+    def _add_row(self, user_id, score, timestamp, genre):
+        self._row_counts[user_id] = self._row_counts.get(user_id, 0) + 1
+        self._ranked.set(user_id, (self._ranked.score(user_id) or 0) + score)
+        self._touch(user_id, timestamp)
+        if genre is not None:
+            board = self._genres.setdefault(genre, TopScores())
+            # Writers insert a user's row of a genre only when there is none, later rows don't count
+            if user_id not in board:
+                board.offer(user_id, score)
+                self._genre_sizes[genre] = self._genre_sizes.get(genre, 0) + 1
+
+    def _add_score(self, user_id, delta, timestamp, genre, total):
+        if user_id not in self._ranked:
+            return
+        self._ranked.set(user_id, self._ranked.score(user_id) + delta)
+        self._touch(user_id, timestamp)
+        board = self._genres.get(genre)
+        if board is None:
+            return
+        if total is not None:
+            # The row's new score is known, so a player from below the board can move onto it
+            board.offer(user_id, total)
+        elif user_id in board:
+            board.offer(user_id, board.score(user_id) + delta)
+
+    def _set_rows(self, user_id, score, timestamp):
+        row_count = self._row_counts.get(user_id, 0)
+        if not row_count:
+            return
+        self._ranked.set(user_id, score * row_count)
+        self._touch(user_id, timestamp)
+        for board in self._genres.values():
+            if user_id in board:
+                board.offer(user_id, score)
+            else:
+                board.bound(score)
+
+    def _clear(self):
+        self._ranked = RankedScores()
+        self._genres = {}
+        self._genre_sizes = {}
+        self._timestamps = {}
+        self._row_counts = {}
+
+    def _notify(self, user_id, delta, timestamp):
+        for observer in self.score_observers:
+            try:
+                observer(user_id, delta, timestamp)
+            except Exception as e:
+                print("Error in score observer:", str(e))
+
+    # 🔹 A new leaderboard row was inserted for the user (in `genre`, if the row has one)
+    def add_row(self, user_id, score, timestamp=None, genre=None):
+        self._apply(self._add_row, user_id, score, timestamp, genre)
+        self._notify(user_id, score, timestamp)
+
+    # 🔹 One existing row of the user was incremented, the user's row of `genre`; `total` is the row's new score
+    def add_score(self, user_id, delta, timestamp=None, genre=None, total=None):
+        self._apply(self._add_score, user_id, delta, timestamp, genre, total)
+        self._notify(user_id, delta, timestamp)
+
+    # 🔹 Every row of the user was overwritten with the same score
+    def set_rows(self, user_id, score, timestamp=None):
+        with self._lock:
+            previous = self._ranked.score(user_id)
+            self._apply(self._set_rows, user_id, score, timestamp)
+            current = self._ranked.score(user_id)
+        # The change is only known when the user's old total was
+        if previous is not None:
+            self._notify(user_id, current - previous, timestamp)
+
+    def clear(self):
+        self._apply(self._clear)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def _entry(self, user_id, score, rank):
+        return {
+            "user_id": user_id,
+            "total_score": score,
+            "latest_timestamp": datetime.fromtimestamp(self._timestamps.get(user_id, 0), timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC'),
+            "rank": rank
+        }
+
+    def _entries(self, start, end):
+        ranked = self._ranked
+        return [self._entry(user_id, score, rank) for rank, (user_id, score) in enumerate(ranked.slice(start, end), start=start + 1)]
+
+    def data_version(self):
+        self._ensure_loaded()
+        return f"{self._instance}:{self.version}"
+
+    def total_entries(self):
+        self._ensure_loaded()
+        return len(self._ranked)
+
+    def page(self, page, per_page):
+        self._ensure_loaded()
+        start = (page - 1) * per_page
+        return self._entries(start, start + per_page)
+
+    def score(self, user_id):
+        self._ensure_loaded()
+        return self._ranked.score(user_id) or 0
+
+    def rank_of(self, user_id):
+        self._ensure_loaded()
+        index = self._ranked.index(user_id)
+        if index is None:
+            return None
+        return self._entry(user_id, self._ranked.score(user_id), index + 1)
+
+    # 🔹 Best `limit` scores of a genre, same rows as the table's ORDER BY total_score DESC, user_id LIMIT;
+    #    from the table when the board holds fewer
+    def genre_top(self, genre, limit):
+        self._ensure_loaded()
+        board = self._genres.get(genre)
+        if board is None:
+            return []
+        if len(board) < limit and not board.complete:
+            return repository.top_scores(genre, limit)
+        return [{"user_id": user_id, "total_score": score, "genre": genre} for user_id, score in board.slice(0, limit)]
+
+    def genre_entries(self, genre):
+        self._ensure_loaded()
+        return self._genre_sizes.get(genre, 0)
+
+    def genre_rank(self, user_id, genre):
+        self._ensure_loaded()
+        board = self._genres.get(genre)
+        if board is None:
+            return None
+        index = board.index(user_id)
+        if index is not None:
+            return {"user_id": user_id, "total_score": board.score(user_id), "genre": genre, "rank": index + 1}
+        if board.complete:
+            return None
+        # 🔹 Below the board: one counting query on the table
+        row = repository.genre_rank(genre, user_id)
+        if row is None:
+            return None
+        return {"user_id": user_id, "total_score": row["total_score"], "genre": genre, "rank": int(row["rank"])}
+
+    def around(self, user_id, radius):
+        self._ensure_loaded()
+        index = self._ranked.index(user_id)
+        if index is None:
+            return None
+        start = max(index - radius, 0)
+        return self._entries(start, index + radius + 1)
+
+
+leaderboard_engine = LeaderboardEngine()
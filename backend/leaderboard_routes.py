@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
-from config import supabase_client
 from middleware import token_required, admin_required
-from time import time  # For Unix timestamp
+from leaderboard_engine import leaderboard_engine
+from query_tracer import query_budget
+from http_cache import conditional_get
+import leaderboard_service
 
 leaderboard_blueprint = Blueprint("leaderboard", __name__)
 
@@ -9,91 +11,60 @@ leaderboard_blueprint = Blueprint("leaderboard", __name__)
 @token_required
 def submit_score(user_id):
     try:
-        data = request.json
-        new_score = data.get("score")
-
-        if new_score is None:
-            return jsonify({"error": "Score is required"}), 400
-
-        # 🔹 Check if user already has a score
-        response = supabase_client.table("leaderboard").select("total_score").eq("user_id", user_id).execute()
-
-        if response.data:
-            # 🔹 Update the existing score (add new score)
-            current_score = response.data[0]["total_score"]
-            updated_score = current_score + new_score  # Running total
-
-            update_response = supabase_client.table("leaderboard").update({
-                "total_score": updated_score,
-                "timestamp": int(time())  # Update timestamp
-            }).eq("user_id", user_id).execute()
-        else:
-            # 🔹 First time submitting → Insert new row
-            update_response = supabase_client.table("leaderboard").insert({
-                "user_id": user_id,
-                "total_score": new_score,
-                "timestamp": int(time())  # Store Unix timestamp
-            }).execute()
-
-        return jsonify({"message": "Score updated successfully!", "total_score": updated_score})
+        body, status = leaderboard_service.submit_score(user_id, request.json)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 
-from datetime import datetime
-
 @leaderboard_blueprint.route("/leaderboard", methods=["GET"])
+@query_budget(0)
+@conditional_get(leaderboard_engine.data_version)
 def get_leaderboard():
     try:
         page = request.args.get("page", 1, type=int)
         per_page = request.args.get("per_page", 10, type=int)
 
-        response = supabase_client.table("leaderboard").select("user_id, total_score, timestamp").execute()
-
-        if not response.data:
-            return jsonify({"message": "No scores found"}), 404
-
-        # 🔹 Sum scores per user
-        user_scores = {}
-        for entry in response.data:
-            user_id = entry["user_id"]
-            if user_id not in user_scores:
-                user_scores[user_id] = {
-                    "user_id": user_id,
-                    "total_score": 0,
-                    "latest_timestamp": entry["timestamp"]
-                }
-            user_scores[user_id]["total_score"] += entry["total_score"]
-            user_scores[user_id]["latest_timestamp"] = max(user_scores[user_id]["latest_timestamp"], entry["timestamp"])
-
-        # Convert Unix timestamps to human-readable format
-        for user in user_scores.values():
-            user["latest_timestamp"] = datetime.utcfromtimestamp(user["latest_timestamp"]).strftime('%Y-%m-%d %H:%M:%S UTC')
-
-        # Convert to sorted list
-        leaderboard = sorted(user_scores.values(), key=lambda x: x["total_score"], reverse=True)
-
-        # Assign rankings
-        for index, entry in enumerate(leaderboard, start=1):
-            entry["rank"] = index
-
-        # Paginate results
-        total_entries = len(leaderboard)
-        total_pages = (total_entries + per_page - 1) // per_page
-        start = (page - 1) * per_page
-        end = start + per_page
-
-        paginated_results = leaderboard[start:end]
-
-        return jsonify({
-            "leaderboard": paginated_results,
-            "page": page,
-            "per_page": per_page,
-            "total_pages": total_pages,
-            "total_entries": total_entries
-        })
+        body, status = leaderboard_service.leaderboard(page, per_page)
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@leaderboard_blueprint.route("/rank/<user_id>", methods=["GET"])
+@query_budget(0)
+def get_rank(user_id):
+    try:
+        body, status = leaderboard_service.rank(user_id)
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@leaderboard_blueprint.route("/around/<user_id>", methods=["GET"])
+@query_budget(0)
+def get_players_around(user_id):
+    try:
+        body, status = leaderboard_service.around(user_id, request.args.get("radius", 5, type=int))
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@leaderboard_blueprint.route("/window/<window>", methods=["GET"])
+@query_budget(0)
+@conditional_get(leaderboard_service.window_version)
+def get_window_leaderboard(window):
+    try:
+        page = request.args.get("page", 1, type=int)
+        per_page = request.args.get("per_page", 10, type=int)
+
+        body, status = leaderboard_service.window_leaderboard(window, page, per_page)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -102,13 +73,8 @@ def get_leaderboard():
 @token_required
 def reset_score(user_id):
     try:
-        # 🔹 Update score to 0
-        update_response = supabase_client.table("leaderboard").update({
-            "total_score": 0,
-            "timestamp": int(time())  # Update timestamp
-        }).eq("user_id", user_id).execute()
-
-        return jsonify({"message": "Score has been reset to 0!"})
+        body, status = leaderboard_service.reset_score(user_id)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -117,19 +83,8 @@ def reset_score(user_id):
 @token_required
 def update_score(user_id):
     try:
-        data = request.json
-        new_score = data.get("score")
-
-        if new_score is None:
-            return jsonify({"error": "Score is required"}), 400
-
-        # 🔹 Overwrite the score instead of adding
-        update_response = supabase_client.table("leaderboard").update({
-            "total_score": new_score,
-            "timestamp": int(time())  # Update timestamp
-        }).eq("user_id", user_id).execute()
-
-        return jsonify({"message": "Score updated successfully!", "new_score": new_score})
+        body, status = leaderboard_service.update_score(user_id, request.json)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -138,25 +93,31 @@ def update_score(user_id):
 @admin_required
 def reset_leaderboard(admin_user_id):
     try:
-        # Delete all leaderboard records safely
-        supabase_client.table("leaderboard").delete().gt("total_score", -1).execute()
-
-        return jsonify({"message": "Leaderboard has been reset!"})
+        body, status = leaderboard_service.reset_leaderboard()
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
 @leaderboard_blueprint.route("<genre>", methods=["GET"])
+@query_budget(1)
+@conditional_get(lambda genre: leaderboard_engine.data_version())
 def fetch_leaderboard(genre):
     try:
-        # Fetch top 10 players for the given genre, ordered by score
-        response = supabase_client.table("leaderboard").select("user_id, total_score, genre").eq("genre", genre).order("total_score", desc=True).limit(10).execute()
+        body, status = leaderboard_service.genre_leaderboard(genre)
+        return jsonify(body), status
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        if not response.data:
-            return jsonify({"message": "No scores found for this genre"}), 404
 
-        return jsonify({"leaderboard": response.data})
+@leaderboard_blueprint.route("/<genre>/rank/<user_id>", methods=["GET"])
+@query_budget(1)
+def get_genre_rank(genre, user_id):
+    try:
+        body, status = leaderboard_service.genre_rank(genre, user_id)
+        return jsonify(body), status
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
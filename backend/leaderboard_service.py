@@ -0,0 +1,158 @@
+from time import time  # For Unix timestamp
+from repository import repository
+from leaderboard_engine import leaderboard_engine
+from leaderboard_windows import leaderboard_windows, WINDOWS
+
+# 🔹 Handler logic shared by leaderboard_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+def submit_score(user_id, data):
+    new_score = data.get("score")
+
+    if new_score is None:
+        return {"error": "Score is required"}, 400
+
+    # 🔹 Check if user already has a score
+    scores = repository.get_scores(user_id)
+    timestamp = int(time())
+
+    if scores:
+        # 🔹 Update the existing score (add new score)
+        updated_score = scores[0]["total_score"] + new_score  # Running total
+        repository.update_scores(user_id, {
+            "total_score": updated_score,
+            "timestamp": timestamp  # Update timestamp
+        })
+        leaderboard_engine.set_rows(user_id, updated_score, timestamp)
+    else:
+        # 🔹 First time submitting → Insert new row
+        updated_score = new_score
+        repository.insert_scores([{
+            "user_id": user_id,
+            "total_score": new_score,
+            "timestamp": timestamp  # Store Unix timestamp
+        }])
+        leaderboard_engine.add_row(user_id, new_score, timestamp)
+
+    return {"message": "Score updated successfully!", "total_score": updated_score}, 200
+
+
+def leaderboard(page, per_page):
+    # 🔹 Totals per user are kept ranked in memory by the leaderboard engine
+    total_entries = leaderboard_engine.total_entries()
+
+    if not total_entries:
+        return {"message": "No scores found"}, 404
+
+    return {
+        "leaderboard": leaderboard_engine.page(page, per_page),
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total_entries + per_page - 1) // per_page,
+        "total_entries": total_entries
+    }, 200
+
+
+def window_version(window):
+    return (leaderboard_engine if window == "all" else leaderboard_windows).data_version()
+
+
+def window_leaderboard(window, page, per_page):
+    if window not in WINDOWS:
+        return {"error": "Window must be one of: " + ", ".join(WINDOWS)}, 400
+
+    # 🔹 Day and week boards are merged from hourly buckets, all-time is the engine's board
+    if window == "all":
+        total_entries = leaderboard_engine.total_entries()
+        entries = leaderboard_engine.page(page, per_page)
+    else:
+        total_entries = leaderboard_windows.total_entries(window)
+        entries = leaderboard_windows.page(window, page, per_page)
+
+    if not total_entries:
+        return {"message": "No scores found for this window"}, 404
+
+    return {
+        "leaderboard": entries,
+        "window": window,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total_entries + per_page - 1) // per_page,
+        "total_entries": total_entries
+    }, 200
+
+
+def rank(user_id):
+    entry = leaderboard_engine.rank_of(user_id)
+
+    if not entry:
+        return {"message": "No score found for this user"}, 404
+
+    return {"entry": entry, "total_entries": leaderboard_engine.total_entries()}, 200
+
+
+def around(user_id, radius):
+    # 🔹 Players ranked just above and below the user
+    entries = leaderboard_engine.around(user_id, max(radius, 0))
+
+    if entries is None:
+        return {"message": "No score found for this user"}, 404
+
+    return {"leaderboard": entries}, 200
+
+
+def reset_score(user_id):
+    # 🔹 Update score to 0
+    timestamp = int(time())
+    repository.update_scores(user_id, {
+        "total_score": 0,
+        "timestamp": timestamp  # Update timestamp
+    })
+    leaderboard_engine.set_rows(user_id, 0, timestamp)
+
+    return {"message": "Score has been reset to 0!"}, 200
+
+
+def update_score(user_id, data):
+    new_score = data.get("score")
+
+    if new_score is None:
+        return {"error": "Score is required"}, 400
+
+    # 🔹 Overwrite the score instead of adding
+    timestamp = int(time())
+    repository.update_scores(user_id, {
+        "total_score": new_score,
+        "timestamp": timestamp  # Update timestamp
+    })
+    leaderboard_engine.set_rows(user_id, new_score, timestamp)
+
+    return {"message": "Score updated successfully!", "new_score": new_score}, 200
+
+
+def reset_leaderboard():
+    # Delete all leaderboard records safely
+    repository.delete_all_scores()
+    leaderboard_engine.clear()
+    leaderboard_windows.clear()
+
+    return {"message": "Leaderboard has been reset!"}, 200
+
+
+def genre_leaderboard(genre):
+    # 🔹 Top 10 players for the given genre, from the engine's genre board
+    entries = leaderboard_engine.genre_top(genre, 10)
+
+    if not entries:
+        return {"message": "No scores found for this genre"}, 404
+
+    return {"leaderboard": entries}, 200
+
+
+def genre_rank(genre, user_id):
+    entry = leaderboard_engine.genre_rank(user_id, genre)
+
+    if not entry:
+        return {"message": "No score found for this user in this genre"}, 404
+
+    return {"entry": entry, "total_entries": leaderboard_engine.genre_entries(genre)}, 200
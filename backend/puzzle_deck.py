@@ -0,0 +1,91 @@
+import random
+import threading
+import uuid
+from collections import OrderedDict
+from repository import repository
+from puzzle_catalog import puzzle_catalog
+
+# 🔹 Shuffled decks kept in memory; a cache miss just reshuffles from the seed
+DECK_CACHE_SIZE = 1024
+
+# 🔹 Deck name used when no genre is given: every genre the room was created with
+ALL_GENRES = "*"
+
+
+def new_deck_seed():
+    # Fits a signed bigint column
+    return random.getrandbits(63)
+
+
+# 🔹 Checks the "genres" a room is created with: none (every genre) or a list of catalog genres;
+#    returns (genres to store, error message)
+def check_deck_genres(genres):
+    if genres is None:
+        return None, None
+    if not isinstance(genres, list) or not all(isinstance(genre, str) for genre in genres):
+        return None, "genres must be a list of genre names"
+    unknown = sorted(set(genres) - set(puzzle_catalog.genres()))
+    if unknown:
+        return None, "Unknown genres: " + ", ".join(unknown)
+    # Each genre once, so none is dealt twice as often
+    return list(dict.fromkeys(genres)) or None, None
+
+
+class PuzzleDeck:
+    """Seeded per-room shuffles of the puzzle catalog.
+
+    The room row only stores a seed and how many cards each of its decks has handed out,
+    so a draw is one atomic position claim plus an index into the cached shuffle.
+    Puzzles never repeat within a pass; an exhausted deck is reshuffled for the next pass.
+    """
+
+    def __init__(self, cache_size=DECK_CACHE_SIZE):
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._orders = OrderedDict()
+
+    @staticmethod
+    def _puzzle_ids(genres):
+        return [str(puzzle["id"]) for genre in genres for puzzle in puzzle_catalog.levels(genre)]
+
+    def _order(self, seed, genres, round_number):
+        key = (seed, genres, round_number, puzzle_catalog.version)
+        with self._lock:
+            order = self._orders.get(key)
+            if order is not None:
+                self._orders.move_to_end(key)
+                return order
+
+        order = self._puzzle_ids(genres)
+        random.Random(f"{seed}:{round_number}").shuffle(order)
+
+        with self._lock:
+            self._orders[key] = order
+            while len(self._orders) > self.cache_size:
+                self._orders.popitem(last=False)
+        return order
+
+    # 🔹 Next puzzle of the room's deck for one genre, or of the whole room deck; None if the room or deck is empty
+    def draw(self, room_id, genre=None):
+        drawn = repository.draw_deck_position(room_id, genre or ALL_GENRES)
+        if not drawn:
+            return None
+
+        # Rooms created before decks existed shuffle from their id
+        seed = drawn["deck_seed"] if drawn["deck_seed"] is not None else uuid.UUID(str(room_id)).int >> 65
+        if genre:
+            genres = (genre,)
+        else:
+            genres = tuple(sorted(drawn["deck_genres"] or puzzle_catalog.genres()))
+
+        order = self._order(seed, genres, 0)
+        if not order:
+            return None
+        round_number, index = divmod(drawn["deck_position"], len(order))
+        if round_number:
+            order = self._order(seed, genres, round_number)
+        # A catalog refresh can change the deck size between the two lookups
+        return puzzle_catalog.puzzle(order[index % len(order)])
+
+
+puzzle_deck = PuzzleDeck()
@@ -0,0 +1,212 @@
+import os
+import sys
+import threading
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import metrics
+
+# 🔹 off: nothing recorded; log: report problems on stdout; strict: a request that breaks its budget or repeats a query fails
+QUERY_TRACE = os.getenv("QUERY_TRACE", "off")
+
+# 🔹 The same query shape this many times in one request is reported as a likely N+1 loop
+QUERY_TRACE_REPEAT_LIMIT = int(os.getenv("QUERY_TRACE_REPEAT_LIMIT", "3"))
+
+# 🔹 Round-trip budget of routes that do not declare their own with @query_budget; empty means none
+QUERY_TRACE_BUDGET = os.getenv("QUERY_TRACE_BUDGET", "")
+
+QUERY_TRACE_KEEP = 200
+
+# Frames in these files are the data layer, the call site reported is the first frame outside them
+_INTERNAL_FILES = {os.path.abspath(__file__), os.path.abspath(metrics.__file__),
+                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "repository.py")}
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+def query_budget(round_trips):
+    """Declares how many database round trips the decorated route may make per request."""
+    def decorator(f):
+        f.query_budget = round_trips
+        return f
+    return decorator
+
+
+def _call_site():
+    frame = sys._getframe(3)
+    while frame is not None:
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename not in _INTERNAL_FILES and "site-packages" not in filename and "/lib/python" not in filename:
+            return f"{os.path.basename(filename)}:{frame.f_lineno} {frame.f_code.co_name}"
+        frame = frame.f_back
+    return "unknown"
+
+
+class RequestTrace:
+    """Every database round trip of one request: table, operation, filters, time and rows."""
+
+    def __init__(self, route, budget=None):
+        self.route = route
+        self.budget = budget
+        self.queries = []
+        self._lock = threading.Lock()
+
+    def record(self, table, operation, seconds, rows, error, filters):
+        query = {
+            "table": table,
+            "operation": operation,
+            "filters": [list(f) for f in filters],
+            "ms": round(seconds * 1000, 3),
+            "rows": rows,
+            "error": str(error) if error else None,
+            "site": _call_site()
+        }
+        # Handlers fan out with gather/to_thread, all of them append here
+        with self._lock:
+            self.queries.append(query)
+
+    @staticmethod
+    def shape(query):
+        # Same table, operation and filtered columns, whatever the values
+        return (query["table"], query["operation"], tuple((method, str(column)) for method, column, _ in query["filters"]))
+
+    def repeated(self, limit):
+        counts = Counter(self.shape(query) for query in self.queries)
+        return [(shape, count) for shape, count in counts.items() if count >= limit]
+
+    def problems(self, repeat_limit):
+        problems = []
+        if self.budget is not None and len(self.queries) > self.budget:
+            problems.append(f"{len(self.queries)} round trips, budget is {self.budget}")
+        for (table, operation, filters), count in self.repeated(repeat_limit):
+            sites = sorted({query["site"] for query in self.queries if self.shape(query) == (table, operation, filters)})
+            columns = ", ".join(f"{method} {column}" for method, column in filters) or "no filters"
+            problems.append(f"{operation} on {table} ({columns}) ran {count} times, from {'; '.join(sites)}")
+        return problems
+
+    def summary(self, repeat_limit):
+        return {
+            "route": self.route,
+            "round_trips": len(self.queries),
+            "budget": self.budget,
+            "ms": round(sum(query["ms"] for query in self.queries), 3),
+            "problems": self.problems(repeat_limit),
+            "queries": self.queries
+        }
+
+
+_current_trace = ContextVar("query_trace", default=None)
+
+
+class QueryTracer:
+    """Records the round trips of each request, flags N+1 loops and enforces round-trip budgets."""
+
+    def __init__(self, mode=QUERY_TRACE, repeat_limit=QUERY_TRACE_REPEAT_LIMIT, default_budget=QUERY_TRACE_BUDGET):
+        self.mode = mode
+        self.repeat_limit = repeat_limit
+        self.default_budget = int(default_budget) if default_budget != "" else None
+        self.violations = deque(maxlen=QUERY_TRACE_KEEP)
+        self.recent = deque(maxlen=QUERY_TRACE_KEEP)
+        metrics.query_observers.append(self._observe)
+
+    @property
+    def enabled(self):
+        return self.mode in ("log", "strict")
+
+    def _observe(self, table, operation, seconds, rows, error, filters):
+        trace = _current_trace.get()
+        if trace is not None:
+            trace.record(table, operation, seconds, rows, error, filters)
+
+    def start(self, route, budget=None):
+        trace = RequestTrace(route, budget if budget is not None else self.default_budget)
+        return trace, _current_trace.set(trace)
+
+    # 🔹 Closes the trace, returns the problems found (and logs them); strict mode raises instead
+    def finish(self, trace, token=None):
+        if token is not None:
+            try:
+                _current_trace.reset(token)
+            except ValueError:
+                pass
+        summary = trace.summary(self.repeat_limit)
+        self.recent.append(summary)
+        if not summary["problems"]:
+            return []
+        self.violations.append(summary)
+        message = f"{trace.route}: " + " | ".join(summary["problems"])
+        print("🔹 QUERY TRACE:", message)
+        if self.mode == "strict":
+            raise QueryBudgetExceeded(message)
+        return summary["problems"]
+
+    # 🔹 Traces a block outside an HTTP request, e.g. in a test or a benchmark step
+    @contextmanager
+    def trace(self, route="block", budget=None):
+        trace, token = self.start(route, budget)
+        try:
+            yield trace
+        finally:
+            self.finish(trace, token)
+
+    # 🔹 Bulk cache loads page through a table on purpose; they are not the request's own queries
+    @contextmanager
+    def paused(self):
+        token = _current_trace.set(None)
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+
+    def report(self):
+        return {"mode": self.mode, "violations": list(self.violations), "recent": list(self.recent)}
+
+    def init_app(self, app):
+        from flask import g, jsonify, request
+        from middleware import admin_required
+
+        # The hooks are always there, so the mode can be switched at runtime (e.g. by a benchmark)
+        @app.before_request
+        def start_query_trace():
+            if not self.enabled:
+                return
+            view = app.view_functions.get(request.endpoint)
+            g.query_trace = self.start(f"{request.method} {request.url_rule.rule if request.url_rule else request.path}",
+                                       getattr(view, "query_budget", None))
+
+        @app.after_request
+        def finish_query_trace(response):
+            started = g.pop("query_trace", None)
+            if started is None:
+                return response
+            trace, token = started
+            response.headers["X-Query-Count"] = str(len(trace.queries))
+            try:
+                self.finish(trace, token)
+            except QueryBudgetExceeded as e:
+                response = jsonify({"error": str(e)})
+                response.status_code = 500
+            return response
+
+        @app.teardown_request
+        def drop_query_trace(exc):
+            # after_request does not run when a handler raises past Flask
+            started = g.pop("query_trace", None)
+            if started is not None:
+                try:
+                    self.finish(*started)
+                except QueryBudgetExceeded:
+                    pass
+
+        # Recent queries can carry user ids and filter values, admins only
+        @app.route("/debug/queries")
+        @admin_required
+        def query_trace_report(admin_user_id):
+            if not self.enabled:
+                return jsonify({"error": "Query tracing is off"}), 404
+            return jsonify(self.report())
+
+
+query_tracer = QueryTracer()
@@ -0,0 +1,600 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from datetime import date, datetime
+from decimal import Decimal
+from metrics import observe_query, table_of
+from config import DATA_BACKEND, DATABASE_URL, DATABASE_POOL_SIZE, supabase_client
+
+
+class DuplicateKeyError(Exception):
+    """An insert hit a unique constraint."""
+
+
+class PostgrestRepository:
+    """Table access through the Supabase REST API (PostgREST), one HTTPS request per call."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def _table(self, name):
+        return self.client.table(name)
+
+    @staticmethod
+    def _first(response):
+        return response.data[0] if response.data else None
+
+    # 🔹 Rooms
+    def get_room(self, room_id):
+        return self._first(self._table("game_rooms").select("id, host_id, room_code, total_rounds").eq("id", room_id).execute())
+
+    def get_room_by_code(self, room_code):
+        return self._first(self._table("game_rooms").select("id, host_id, room_code, total_rounds").eq("room_code", room_code).execute())
+
+    def insert_room(self, row):
+        try:
+            self._table("game_rooms").insert(row).execute()
+        except Exception as e:
+            # PostgREST reports the Postgres error code in the message
+            if "23505" in str(e):
+                raise DuplicateKeyError(str(e)) from e
+            raise
+
+    def update_room(self, room_id, fields):
+        self._table("game_rooms").update(fields).eq("id", room_id).execute()
+
+    # 🔹 Deletes up to `limit` idle rooms with their rows in the other room tables, see schema.sql
+    def reap_idle_rooms(self, idle_seconds, limit):
+        return self.client.rpc("reap_idle_rooms", {"p_idle_seconds": idle_seconds, "p_limit": limit}).execute().data
+
+    def list_room_codes(self, offset, limit):
+        return self._table("game_rooms").select("id, room_code").not_.is_("room_code", "null").order("id").range(offset, offset + limit - 1).execute().data
+
+    # 🔹 Next position of the room's deck, None if the room does not exist
+    def draw_deck_position(self, room_id, deck):
+        rows = self.client.rpc("draw_deck_position", {"p_room_id": room_id, "p_deck": deck}).execute().data
+        return rows[0] if rows else None
+
+    # 🔹 Players
+    def list_players(self, room_id):
+        return self._table("players_in_room").select("user_id, username, score").eq("room_id", room_id).order("joined_at").execute().data
+
+    def list_room_scores(self, room_id):
+        return self._table("players_in_room").select("username, score").eq("room_id", room_id).order("score", desc=True).execute().data
+
+    def get_player(self, room_id, user_id):
+        return self._first(self._table("players_in_room").select("id, score").eq("room_id", room_id).eq("user_id", user_id).execute())
+
+    def insert_player(self, row):
+        self._table("players_in_room").insert(row).execute()
+
+    def update_player(self, room_id, user_id, fields):
+        self._table("players_in_room").update(fields).eq("room_id", room_id).eq("user_id", user_id).execute()
+
+    def delete_players(self, room_id):
+        self._table("players_in_room").delete().eq("room_id", room_id).execute()
+
+    # 🔹 Game state
+    def get_game_state(self, room_id):
+        return self._first(self._table("game_state").select("*").eq("room_id", room_id).execute())
+
+    def insert_game_state(self, row):
+        self._table("game_state").insert(row).execute()
+
+    # 🔹 Keyed on room_id like the Postgres backend; the primary key id is never sent
+    def upsert_game_state(self, row):
+        self._table("game_state").upsert(row, on_conflict="room_id").execute()
+
+    def update_game_state(self, room_id, fields):
+        self._table("game_state").update(fields).eq("room_id", room_id).execute()
+
+    # 🔹 Compare-and-swap: writes only if the row is still at `version`; the updated row, or None if it moved on
+    def update_game_state_if(self, room_id, version, fields):
+        return self._first(self._table("game_state").update(dict(fields, version=version + 1)).eq("room_id", room_id).eq("version", version).execute())
+
+    # 🔹 Turn check, points and next turn of one take_turn, applied under the row lock, see schema.sql
+    def take_game_turn(self, room_id, user_id, next_turn, points):
+        return self.client.rpc("take_game_turn", {"p_room_id": room_id, "p_user_id": user_id, "p_next_turn": next_turn, "p_points": points}).execute().data
+
+    # 🔹 Answer check and next turn of one multiplayer answer, applied under the row lock, see schema.sql
+    def answer_room_puzzle(self, room_id, user_id, answer):
+        return self.client.rpc("answer_room_puzzle", {"p_room_id": room_id, "p_user_id": user_id, "p_answer": answer}).execute().data
+
+    def list_turn_deadlines(self, offset, limit):
+        return self._table("game_state").select("room_id, turn_end_time").eq("is_active", True).not_.is_("turn_end_time", "null") \
+            .order("room_id").range(offset, offset + limit - 1).execute().data
+
+    # 🔹 Passes the turn on in every listed room whose turn_end_time has expired, see schema.sql
+    def advance_expired_turns(self, room_ids):
+        return self.client.rpc("advance_expired_turns", {"p_room_ids": room_ids}).execute().data
+
+    def delete_game_state(self, room_id):
+        self._table("game_state").delete().eq("room_id", room_id).execute()
+
+    # 🔹 Puzzles
+    def list_puzzles(self, offset, limit):
+        return self._table("emoji_puzzles").select("*").order("id").range(offset, offset + limit - 1).execute().data
+
+    # 🔹 Highest level_number of the genre, 0 when it has no puzzles yet
+    def last_puzzle_level(self, genre):
+        rows = self._table("emoji_puzzles").select("level_number").eq("genre", genre).order("level_number", desc=True).limit(1).execute().data
+        return int(rows[0]["level_number"]) if rows else 0
+
+    def existing_puzzle_hashes(self, hashes):
+        rows = self._table("emoji_puzzles").select("content_hash").in_("content_hash", hashes).execute().data
+        return {row["content_hash"] for row in rows}
+
+    # 🔹 Rows whose content_hash is already in the table are left alone; returns the rows inserted
+    def insert_puzzles(self, rows):
+        return self._table("emoji_puzzles").upsert(rows, on_conflict="content_hash", ignore_duplicates=True).execute().data
+
+    def list_unhashed_puzzles(self, after_id, limit):
+        return self._table("emoji_puzzles").select("id, genre, emoji_clue, correct_answer").is_("content_hash", "null") \
+            .gt("id", after_id).order("id").limit(limit).execute().data
+
+    def set_puzzle_hash(self, puzzle_id, content_hash):
+        self._table("emoji_puzzles").update({"content_hash": content_hash}).eq("id", puzzle_id).execute()
+
+    # 🔹 Leaderboard
+    def list_leaderboard(self, offset, limit):
+        return self._table("leaderboard").select("user_id, genre, total_score, timestamp").order("id").range(offset, offset + limit - 1).execute().data
+
+    def get_scores(self, user_id, genre=None):
+        query = self._table("leaderboard").select("total_score").eq("user_id", user_id)
+        if genre is not None:
+            query = query.eq("genre", genre)
+        return query.execute().data
+
+    def top_scores(self, genre, limit):
+        return self._table("leaderboard").select("user_id, total_score, genre").eq("genre", genre).order("total_score", desc=True).order("user_id").limit(limit).execute().data
+
+    def genre_rank(self, genre, user_id):
+        return self._first(self.client.rpc("genre_rank", {"p_genre": genre, "p_user_id": user_id}).execute())
+
+    def insert_scores(self, rows):
+        self._table("leaderboard").insert(rows).execute()
+
+    def update_scores(self, user_id, fields, genre=None):
+        query = self._table("leaderboard").update(fields).eq("user_id", user_id)
+        if genre is not None:
+            query = query.eq("genre", genre)
+        query.execute()
+
+    def delete_all_scores(self):
+        self._table("leaderboard").delete().gt("total_score", -1).execute()
+        self._table("leaderboard_buckets").delete().gte("bucket_start", 0).execute()
+
+    def delete_user_scores(self, user_id):
+        self._table("leaderboard").delete().eq("user_id", user_id).execute()
+
+    # 🔹 Adds each {user_id, genre, delta, timestamp} to the player's row server-side, see schema.sql
+    def increment_scores(self, rows):
+        return self.client.rpc("increment_leaderboard_scores", {"p_rows": rows}).execute().data
+
+    # 🔹 Hourly score buckets (filled by a trigger on leaderboard), starting from `since` (Unix seconds)
+    def list_score_buckets(self, since, offset, limit):
+        return self._table("leaderboard_buckets").select("user_id, bucket_start, score").gte("bucket_start", since) \
+            .order("user_id").order("bucket_start").range(offset, offset + limit - 1).execute().data
+
+    def prune_score_buckets(self, before):
+        self._table("leaderboard_buckets").delete().lt("bucket_start", before).execute()
+
+    # 🔹 Exports: keyset pages, each one starting after the last key of the previous page
+    def export_scores(self, after_id, limit):
+        return self._table("leaderboard").select("id, user_id, genre, total_score, timestamp").gt("id", after_id) \
+            .order("id").limit(limit).execute().data
+
+    def export_progress(self, after_user_id, limit):
+        return self._table("player_progress").select("user_id, genre, completed_levels").gt("user_id", after_user_id) \
+            .order("user_id").order("genre").limit(limit).execute().data
+
+    def export_finished_games(self, after_room_id, limit):
+        return self._table("game_state").select("room_id, total_rounds, current_round, updated_at, game_data").eq("is_active", False) \
+            .gt("room_id", after_room_id).order("room_id").limit(limit).execute().data
+
+    def export_room_players(self, room_ids):
+        return self._table("players_in_room").select("room_id, user_id, username").in_("room_id", room_ids).execute().data
+
+    # 🔹 Chat
+    def insert_message(self, row):
+        return self._first(self._table("chat_messages").insert(row).execute())
+
+    # 🔹 Newest messages of the room, returned oldest first
+    def list_recent_messages(self, room_id, limit):
+        rows = self._table("chat_messages").select("id, sender_id, message, timestamp").eq("room_id", room_id).order("id", desc=True).limit(limit).execute().data
+        return rows[::-1]
+
+    def list_messages_after(self, room_id, after_id, limit):
+        return self._table("chat_messages").select("id, sender_id, message, timestamp").eq("room_id", room_id).gt("id", after_id).order("id").limit(limit).execute().data
+
+    # 🔹 Player progress
+    def get_progress(self, user_id, genre):
+        return self._first(self._table("player_progress").select("completed_levels").eq("user_id", user_id).eq("genre", genre).execute())
+
+    def insert_progress(self, row):
+        self._table("player_progress").insert(row).execute()
+
+    def update_progress(self, user_id, genre, fields):
+        self._table("player_progress").update(fields).eq("user_id", user_id).eq("genre", genre).execute()
+
+    def delete_progress(self, user_id):
+        self._table("player_progress").delete().eq("user_id", user_id).execute()
+
+    # 🔹 Check, progress and score update of one singleplayer answer, see schema.sql
+    def submit_singleplayer_answer(self, user_id, level_number, answer):
+        return self.client.rpc("submit_singleplayer_answer", {"p_user_id": user_id, "p_level_number": level_number, "p_answer": answer}).execute().data
+
+
+class PostgresRepository:
+    """Direct SQL over a pool of Postgres connections; hot reads run as prepared statements."""
+
+    STATEMENTS = {
+        "room_by_id": "SELECT id, host_id, room_code, total_rounds FROM game_rooms WHERE id = $1",
+        "room_by_code": "SELECT id, host_id, room_code, total_rounds FROM game_rooms WHERE room_code = $1 LIMIT 1",
+        "room_codes_page": "SELECT id, room_code FROM game_rooms WHERE room_code IS NOT NULL ORDER BY id OFFSET $1 LIMIT $2",
+        "players_by_room": "SELECT user_id, username, score FROM players_in_room WHERE room_id = $1 ORDER BY joined_at",
+        "scores_by_room": "SELECT username, score FROM players_in_room WHERE room_id = $1 ORDER BY score DESC",
+        "player_in_room": "SELECT id, score FROM players_in_room WHERE room_id = $1 AND user_id = $2 LIMIT 1",
+        "game_state_by_room": "SELECT * FROM game_state WHERE room_id = $1",
+        "turn_deadlines_page": "SELECT room_id, turn_end_time FROM game_state WHERE is_active AND turn_end_time IS NOT NULL ORDER BY room_id OFFSET $1 LIMIT $2",
+        "puzzles_page": "SELECT * FROM emoji_puzzles ORDER BY id OFFSET $1 LIMIT $2",
+        "last_puzzle_level": "SELECT coalesce(max(level_number), 0) AS level_number FROM emoji_puzzles WHERE genre = $1",
+        "puzzle_hashes": "SELECT content_hash FROM emoji_puzzles WHERE content_hash = ANY($1::text[])",
+        "unhashed_puzzles": "SELECT id, genre, emoji_clue, correct_answer FROM emoji_puzzles WHERE content_hash IS NULL AND id > $1 ORDER BY id LIMIT $2",
+        "leaderboard_page": "SELECT user_id, genre, total_score, timestamp FROM leaderboard ORDER BY id OFFSET $1 LIMIT $2",
+        "scores_by_user": "SELECT total_score FROM leaderboard WHERE user_id = $1",
+        "scores_by_user_genre": "SELECT total_score FROM leaderboard WHERE user_id = $1 AND genre = $2",
+        "top_scores": "SELECT user_id, total_score, genre FROM leaderboard WHERE genre = $1 ORDER BY total_score DESC, user_id LIMIT $2",
+        "genre_rank": "SELECT * FROM genre_rank($1, $2)",
+        "recent_messages": "SELECT id, sender_id, message, timestamp FROM chat_messages WHERE room_id = $1 ORDER BY id DESC LIMIT $2",
+        "messages_after": "SELECT id, sender_id, message, timestamp FROM chat_messages WHERE room_id = $1 AND id > $2 ORDER BY id LIMIT $3",
+        "progress": "SELECT completed_levels FROM player_progress WHERE user_id = $1 AND genre = $2",
+        "submit_singleplayer_answer": "SELECT submit_singleplayer_answer($1, $2, $3) AS result",
+        "increment_leaderboard_scores": "SELECT * FROM increment_leaderboard_scores($1)",
+        "score_buckets_page": "SELECT user_id, bucket_start, score FROM leaderboard_buckets WHERE bucket_start >= $1 ORDER BY user_id, bucket_start OFFSET $2 LIMIT $3",
+        "scores_export": "SELECT id, user_id, genre, total_score, timestamp FROM leaderboard WHERE id > $1 ORDER BY id LIMIT $2",
+        "progress_export": "SELECT user_id, genre, completed_levels FROM player_progress WHERE user_id > $1 ORDER BY user_id, genre LIMIT $2",
+        "finished_games_export": "SELECT room_id, total_rounds, current_round, updated_at, game_data FROM game_state WHERE NOT is_active AND room_id > $1 ORDER BY room_id LIMIT $2",
+        "room_players_export": "SELECT room_id, user_id, username FROM players_in_room WHERE room_id = ANY($1::uuid[])",
+        "draw_deck_position": "SELECT * FROM draw_deck_position($1, $2)",
+        "advance_expired_turns": "SELECT * FROM advance_expired_turns($1)",
+        "take_game_turn": "SELECT take_game_turn($1, $2, $3, $4) AS result",
+        "answer_room_puzzle": "SELECT answer_room_puzzle($1, $2, $3) AS result",
+        "reap_idle_rooms": "SELECT * FROM reap_idle_rooms($1, $2)"
+    }
+
+    def __init__(self, dsn, pool_size):
+        # psycopg2 is only needed when the direct backend is selected
+        import psycopg2
+        import psycopg2.errors
+        import psycopg2.extensions
+        import psycopg2.extras
+        from psycopg2 import pool, sql
+        from green import make_psycopg2_green
+
+        # Under gevent, queries wait on the hub so the other greenlets keep running
+        make_psycopg2_green()
+
+        class PreparedConnection(psycopg2.extensions.connection):
+            # Autocommit from the moment the connection opens; `prepared` holds the statements PREPAREd on it
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.autocommit = True
+                self.prepared = set()
+
+        self._psycopg2 = psycopg2
+        self._sql = sql
+        self._json = psycopg2.extras.Json
+        self._missing_statement = psycopg2.errors.InvalidSqlStatementName
+        # minconn = maxconn: the pool closes returned connections beyond minconn, so a smaller
+        # minimum would reconnect (and re-prepare) on almost every request under load
+        self._pool = pool.ThreadedConnectionPool(pool_size, pool_size, dsn, connection_factory=PreparedConnection)
+        # ThreadedConnectionPool raises when it runs dry, the semaphore makes callers wait instead
+        self._slots = threading.BoundedSemaphore(pool_size)
+
+    @contextmanager
+    def connection(self):
+        self._slots.acquire()
+        conn = None
+        broken = False
+        try:
+            conn = self._pool.getconn()
+            yield conn
+        except (self._psycopg2.OperationalError, self._psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            if conn is not None:
+                self._pool.putconn(conn, close=broken or conn.closed)
+            self._slots.release()
+
+    @staticmethod
+    def _value(value):
+        # Match what PostgREST returns: ids as strings, timestamps as ISO strings
+        if isinstance(value, uuid.UUID):
+            return str(value)
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return float(value)
+        return value
+
+    def _rows(self, cursor):
+        if cursor.description is None:
+            return []
+        columns = [column.name for column in cursor.description]
+        return [{column: self._value(value) for column, value in zip(columns, row)} for row in cursor.fetchall()]
+
+    def _adapt(self, value):
+        return self._json(value) if isinstance(value, (dict, list)) else value
+
+    def _query(self, name, *params):
+        filters = tuple(("param", f"${index}", value) for index, value in enumerate(params, 1))
+        with observe_query(table_of(self.STATEMENTS[name]), name, filters) as observed, self.connection() as conn, conn.cursor() as cursor:
+            if name not in conn.prepared:
+                cursor.execute(f"PREPARE {name} AS {self.STATEMENTS[name]}")
+                conn.prepared.add(name)
+            placeholders = f" ({', '.join(['%s'] * len(params))})" if params else ""
+            try:
+                cursor.execute(f"EXECUTE {name}{placeholders}", params)
+            except self._missing_statement:
+                # The server dropped it (DISCARD ALL from a pooler, a reset session): prepare again, once
+                cursor.execute(f"PREPARE {name} AS {self.STATEMENTS[name]}")
+                cursor.execute(f"EXECUTE {name}{placeholders}", params)
+            rows = self._rows(cursor)
+            observed["rows"] = len(rows)
+            return rows
+
+    def _first(self, name, *params):
+        rows = self._query(name, *params)
+        return rows[0] if rows else None
+
+    def _execute(self, statement, params=(), table="sql", operation="execute", filters=()):
+        with observe_query(table, operation, filters) as observed, self.connection() as conn, conn.cursor() as cursor:
+            cursor.execute(statement, params)
+            rows = self._rows(cursor)
+            observed["rows"] = cursor.rowcount if cursor.description is None else len(rows)
+            return rows
+
+    @staticmethod
+    def _traced(filters):
+        return tuple(("eq", column, value) for column, value in filters.items())
+
+    def _where(self, filters):
+        sql = self._sql
+        return sql.SQL(" AND ").join(sql.SQL("{} = %s").format(sql.Identifier(column)) for column in filters)
+
+    def _insert(self, table, rows, on_conflict=None, ignore_duplicates=False):
+        sql = self._sql
+        columns = list(rows[0])
+        row_sql = sql.SQL("({})").format(sql.SQL(", ").join(sql.Placeholder() * len(columns)))
+        statement = sql.SQL("INSERT INTO {} ({}) VALUES {}").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(map(sql.Identifier, columns)),
+            sql.SQL(", ").join([row_sql] * len(rows))
+        )
+        if on_conflict and ignore_duplicates:
+            statement += sql.SQL(" ON CONFLICT ({}) DO NOTHING").format(sql.Identifier(on_conflict))
+        elif on_conflict:
+            statement += sql.SQL(" ON CONFLICT ({}) DO UPDATE SET {}").format(
+                sql.Identifier(on_conflict),
+                sql.SQL(", ").join(sql.SQL("{0} = EXCLUDED.{0}").format(sql.Identifier(column)) for column in columns if column != on_conflict)
+            )
+        statement += sql.SQL(" RETURNING *")
+        return self._execute(statement, [self._adapt(row[column]) for row in rows for column in columns], table, "upsert" if on_conflict else "insert")
+
+    def _update(self, table, fields, filters, returning=False):
+        sql = self._sql
+        statement = sql.SQL("UPDATE {} SET {} WHERE {}").format(
+            sql.Identifier(table),
+            sql.SQL(", ").join(sql.SQL("{} = %s").format(sql.Identifier(column)) for column in fields),
+            self._where(filters)
+        )
+        if returning:
+            statement += sql.SQL(" RETURNING *")
+        return self._execute(statement, [self._adapt(value) for value in fields.values()] + list(filters.values()), table, "update", self._traced(filters))
+
+    def _delete(self, table, filters):
+        sql = self._sql
+        statement = sql.SQL("DELETE FROM {} WHERE {}").format(sql.Identifier(table), self._where(filters))
+        self._execute(statement, list(filters.values()), table, "delete", self._traced(filters))
+
+    # 🔹 Rooms
+    def get_room(self, room_id):
+        return self._first("room_by_id", room_id)
+
+    def get_room_by_code(self, room_code):
+        return self._first("room_by_code", room_code)
+
+    def insert_room(self, row):
+        try:
+            self._insert("game_rooms", [row])
+        except self._psycopg2.errors.UniqueViolation as e:
+            raise DuplicateKeyError(str(e)) from e
+
+    def update_room(self, room_id, fields):
+        self._update("game_rooms", fields, {"id": room_id})
+
+    def reap_idle_rooms(self, idle_seconds, limit):
+        return self._query("reap_idle_rooms", idle_seconds, limit)
+
+    def list_room_codes(self, offset, limit):
+        return self._query("room_codes_page", offset, limit)
+
+    def draw_deck_position(self, room_id, deck):
+        return self._first("draw_deck_position", room_id, deck)
+
+    # 🔹 Players
+    def list_players(self, room_id):
+        return self._query("players_by_room", room_id)
+
+    def list_room_scores(self, room_id):
+        return self._query("scores_by_room", room_id)
+
+    def get_player(self, room_id, user_id):
+        return self._first("player_in_room", room_id, user_id)
+
+    def insert_player(self, row):
+        self._insert("players_in_room", [row])
+
+    def update_player(self, room_id, user_id, fields):
+        self._update("players_in_room", fields, {"room_id": room_id, "user_id": user_id})
+
+    def delete_players(self, room_id):
+        self._delete("players_in_room", {"room_id": room_id})
+
+    # 🔹 Game state
+    def get_game_state(self, room_id):
+        return self._first("game_state_by_room", room_id)
+
+    def insert_game_state(self, row):
+        self._insert("game_state", [row])
+
+    def upsert_game_state(self, row):
+        self._insert("game_state", [row], on_conflict="room_id")
+
+    def update_game_state(self, room_id, fields):
+        self._update("game_state", fields, {"room_id": room_id})
+
+    def update_game_state_if(self, room_id, version, fields):
+        rows = self._update("game_state", dict(fields, version=version + 1), {"room_id": room_id, "version": version}, returning=True)
+        return rows[0] if rows else None
+
+    def take_game_turn(self, room_id, user_id, next_turn, points):
+        return self._first("take_game_turn", room_id, user_id, next_turn, points)["result"]
+
+    def answer_room_puzzle(self, room_id, user_id, answer):
+        return self._first("answer_room_puzzle", room_id, user_id, answer)["result"]
+
+    def list_turn_deadlines(self, offset, limit):
+        return self._query("turn_deadlines_page", offset, limit)
+
+    def advance_expired_turns(self, room_ids):
+        return self._query("advance_expired_turns", self._json(room_ids))
+
+    def delete_game_state(self, room_id):
+        self._delete("game_state", {"room_id": room_id})
+
+    # 🔹 Puzzles
+    def list_puzzles(self, offset, limit):
+        return self._query("puzzles_page", offset, limit)
+
+    def last_puzzle_level(self, genre):
+        return int(self._first("last_puzzle_level", genre)["level_number"])
+
+    def existing_puzzle_hashes(self, hashes):
+        return {row["content_hash"] for row in self._query("puzzle_hashes", list(hashes))}
+
+    def insert_puzzles(self, rows):
+        return self._insert("emoji_puzzles", rows, on_conflict="content_hash", ignore_duplicates=True)
+
+    def list_unhashed_puzzles(self, after_id, limit):
+        return self._query("unhashed_puzzles", after_id, limit)
+
+    def set_puzzle_hash(self, puzzle_id, content_hash):
+        self._update("emoji_puzzles", {"content_hash": content_hash}, {"id": puzzle_id})
+
+    # 🔹 Leaderboard
+    def list_leaderboard(self, offset, limit):
+        return self._query("leaderboard_page", offset, limit)
+
+    def get_scores(self, user_id, genre=None):
+        if genre is None:
+            return self._query("scores_by_user", user_id)
+        return self._query("scores_by_user_genre", user_id, genre)
+
+    def top_scores(self, genre, limit):
+        return self._query("top_scores", genre, limit)
+
+    def genre_rank(self, genre, user_id):
+        return self._first("genre_rank", genre, user_id)
+
+    def insert_scores(self, rows):
+        self._insert("leaderboard", rows)
+
+    def update_scores(self, user_id, fields, genre=None):
+        filters = {"user_id": user_id}
+        if genre is not None:
+            filters["genre"] = genre
+        self._update("leaderboard", fields, filters)
+
+    def delete_all_scores(self):
+        self._execute("DELETE FROM leaderboard", table="leaderboard", operation="delete")
+        self._execute("DELETE FROM leaderboard_buckets", table="leaderboard_buckets", operation="delete")
+
+    def delete_user_scores(self, user_id):
+        self._delete("leaderboard", {"user_id": user_id})
+
+    def increment_scores(self, rows):
+        return self._query("increment_leaderboard_scores", self._json(rows))
+
+    def list_score_buckets(self, since, offset, limit):
+        return self._query("score_buckets_page", since, offset, limit)
+
+    def export_scores(self, after_id, limit):
+        return self._query("scores_export", after_id, limit)
+
+    def export_progress(self, after_user_id, limit):
+        return self._query("progress_export", after_user_id, limit)
+
+    def export_finished_games(self, after_room_id, limit):
+        return self._query("finished_games_export", after_room_id, limit)
+
+    def export_room_players(self, room_ids):
+        return self._query("room_players_export", list(room_ids))
+
+    def prune_score_buckets(self, before):
+        self._execute("DELETE FROM leaderboard_buckets WHERE bucket_start < %s", [before], "leaderboard_buckets", "delete", (("lt", "bucket_start", before),))
+
+    # 🔹 Chat
+    def insert_message(self, row):
+        rows = self._insert("chat_messages", [row])
+        return rows[0] if rows else None
+
+    def list_recent_messages(self, room_id, limit):
+        return self._query("recent_messages", room_id, limit)[::-1]
+
+    def list_messages_after(self, room_id, after_id, limit):
+        return self._query("messages_after", room_id, after_id, limit)
+
+    # 🔹 Player progress
+    def get_progress(self, user_id, genre):
+        return self._first("progress", user_id, genre)
+
+    def insert_progress(self, row):
+        self._insert("player_progress", [row])
+
+    def update_progress(self, user_id, genre, fields):
+        self._update("player_progress", fields, {"user_id": user_id, "genre": genre})
+
+    def delete_progress(self, user_id):
+        self._delete("player_progress", {"user_id": user_id})
+
+    def submit_singleplayer_answer(self, user_id, level_number, answer):
+        row = self._first("submit_singleplayer_answer", user_id, level_number, answer)
+        return row["result"] if row else None
+
+
+def create_repository(backend=DATA_BACKEND):
+    if backend == "postgres":
+        if not DATABASE_URL:
+            raise RuntimeError("DATABASE_URL is required when DATA_BACKEND=postgres")
+        return PostgresRepository(DATABASE_URL, DATABASE_POOL_SIZE)
+    return PostgrestRepository(supabase_client)
+
+
+class _LazyRepository:
+    # The backend (and its connection pool) is only created on first use
+    def __init__(self):
+        self._backend = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._backend is None:
+            with self._lock:
+                if self._backend is None:
+                    self._backend = create_repository()
+        return getattr(self._backend, name)
+
+
+repository = _LazyRepository()
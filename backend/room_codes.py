@@ -0,0 +1,159 @@
+import os
+import random
+import string
+import threading
+import time
+from collections import deque
+from repository import repository, DuplicateKeyError
+from room_registry import room_registry
+from query_tracer import query_tracer
+
+ROOM_CODE_ALPHABET = string.ascii_uppercase
+ROOM_CODE_LENGTH = 6
+ROOM_CODE_KEYSPACE = len(ROOM_CODE_ALPHABET) ** ROOM_CODE_LENGTH
+
+# 🔹 How long a code→room entry is trusted; other workers may end the room in the meantime
+ROOM_CODE_CACHE_TTL = int(os.getenv("ROOM_CODE_CACHE_TTL", "300"))
+
+# 🔹 Released codes rest this long before reuse, so no worker still maps them to the old room
+ROOM_CODE_REUSE_SECONDS = ROOM_CODE_CACHE_TTL
+
+ROOM_CODE_PAGE_SIZE = 1000
+ROOM_CODE_ATTEMPTS = 5
+
+
+def normalize_room_code(room_code):
+    return room_code.strip().upper() if isinstance(room_code, str) else None
+
+
+class RoomCodeAllocator:
+    """Hands out unique room codes and resolves codes to room ids from memory.
+
+    Fresh codes come from an affine walk over the whole keyspace (a bijection, so every
+    step yields a code this worker has never issued), released codes are reused from a
+    free list. Codes issued by other workers are caught by the unique index on insert.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._in_use = set()
+        self._index = {}
+        self._room_codes = {}
+        self._free = deque()
+        # Any step coprime with 26^6 visits every code once; each worker starts somewhere else
+        self._step = random.randrange(1, ROOM_CODE_KEYSPACE, 2)
+        while self._step % 13 == 0:
+            self._step = random.randrange(1, ROOM_CODE_KEYSPACE, 2)
+        self._offset = random.randrange(ROOM_CODE_KEYSPACE)
+        self._issued = 0
+
+    @staticmethod
+    def _encode(number):
+        letters = []
+        for _ in range(ROOM_CODE_LENGTH):
+            number, digit = divmod(number, len(ROOM_CODE_ALPHABET))
+            letters.append(ROOM_CODE_ALPHABET[digit])
+        return "".join(letters)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            start = 0
+            with query_tracer.paused():
+                while True:
+                    page = repository.list_room_codes(start, ROOM_CODE_PAGE_SIZE)
+                    for row in page:
+                        self._in_use.add(row["room_code"])
+                    if len(page) < ROOM_CODE_PAGE_SIZE:
+                        break
+                    start += ROOM_CODE_PAGE_SIZE
+            self._loaded = True
+
+    def _remember(self, room_code, room_id):
+        self._index[room_code] = (room_id, time.monotonic() + ROOM_CODE_CACHE_TTL)
+        self._room_codes[room_id] = room_code
+
+    def _next_code(self):
+        while self._free and time.monotonic() >= self._free[0][0]:
+            code = self._free.popleft()[1]
+            if code not in self._in_use:
+                return code
+        while self._issued < ROOM_CODE_KEYSPACE:
+            code = self._encode((self._offset + self._step * self._issued) % ROOM_CODE_KEYSPACE)
+            self._issued += 1
+            if code not in self._in_use:
+                return code
+        raise RuntimeError("No free room codes left")
+
+    # 🔹 Reserve a code for the room; insert(code) writes the room row and may hit a code taken by another worker
+    def assign(self, room_id, insert):
+        self._ensure_loaded()
+        for _ in range(ROOM_CODE_ATTEMPTS):
+            with self._lock:
+                code = self._next_code()
+                self._in_use.add(code)
+            try:
+                insert(code)
+            except DuplicateKeyError:
+                # Another worker holds it; it stays in _in_use so this worker never offers it again
+                continue
+            except Exception:
+                with self._lock:
+                    self._in_use.discard(code)
+                    self._free.appendleft((0, code))
+                raise
+            with self._lock:
+                self._remember(code, room_id)
+            return code
+        raise RuntimeError("Could not allocate a unique room code")
+
+    # 🔹 Room id for a code, from memory when possible; None if no live room has it
+    def resolve(self, room_code):
+        room_code = normalize_room_code(room_code)
+        if not room_code:
+            return None
+
+        entry = self._index.get(room_code)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+
+        room = repository.get_room_by_code(room_code)
+        with self._lock:
+            if room is None:
+                self._index.pop(room_code, None)
+                return None
+            # The joining player's next requests check the same room
+            room_registry.remember(room)
+            self._in_use.add(room_code)
+            self._remember(room_code, room["id"])
+        return room["id"]
+
+    # 🔹 The room ended: clear its code in the table and put it back in the pool
+    def release(self, room_id):
+        room_code = self._room_codes.get(room_id)
+        if room_code is None:
+            room = room_registry.get(room_id)
+            room_code = room.get("room_code") if room else None
+        if not room_code:
+            return
+
+        repository.update_room(room_id, {"room_code": None})
+        self.forget(room_id, room_code)
+
+    # 🔹 The room row is gone already (see room_reaper), only drop what this worker remembers
+    def forget(self, room_id, room_code=None):
+        with self._lock:
+            room_code = self._room_codes.pop(room_id, None) or room_code
+            if not room_code:
+                return
+            self._index.pop(room_code, None)
+            if room_code in self._in_use:
+                self._in_use.discard(room_code)
+                self._free.append((time.monotonic() + ROOM_CODE_REUSE_SECONDS, room_code))
+
+
+room_codes = RoomCodeAllocator()
@@ -0,0 +1,175 @@
+import json
+import os
+import threading
+import time
+from room_fanout import create_fanout
+
+# 🔹 Seconds between keep-alive comments on an idle stream
+STREAM_HEARTBEAT_SECONDS = 15
+
+# 🔹 A room nobody watches or publishes to for this long is dropped; its next stream rebuilds the snapshot
+ROOM_EVENTS_IDLE_SECONDS = int(os.getenv("ROOM_EVENTS_IDLE_SECONDS", "600"))
+
+
+class RoomEventBroker:
+    """Latest scores / players snapshot of every room, with wake-ups for the streams watching it.
+
+    Every event carries the full state of its type, so resuming from a Last-Event-ID only
+    needs the latest snapshot newer than that id; no per-room history is kept.
+
+    With DATABASE_URL set, events are also forwarded to the other worker processes through
+    Postgres LISTEN/NOTIFY (see room_fanout.py), so the streams of a room and the writes that
+    publish to it can be served by any worker. Without it the broker only reaches the streams of
+    its own process, and a room must be served by one process (see README).
+    """
+
+    def __init__(self, idle_seconds=ROOM_EVENTS_IDLE_SECONDS, fanout=None):
+        self.idle_seconds = idle_seconds
+        self.fanout = fanout
+        # 🔹 event type → function(room_id) building its snapshot, for forwarded events too big to carry it
+        self.loaders = {}
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._rooms = {}
+        self._swept_at = time.monotonic()
+
+    def _room(self, room_id):
+        self._sweep()
+        room = self._rooms.get(room_id)
+        if room is None:
+            room = {"latest": {}, "closed": False, "condition": threading.Condition(self._lock), "listeners": set(),
+                    "waiters": 0, "touched": time.monotonic()}
+            self._rooms[room_id] = room
+        room["touched"] = time.monotonic()
+        return room
+
+    # 🔹 Drops rooms without streams that saw no publish for idle_seconds (rooms that ended without close(),
+    #    or ids that were only ever asked for); runs under the lock at most once per idle period
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at < self.idle_seconds:
+            return
+        self._swept_at = now
+        for room_id in [room_id for room_id, room in self._rooms.items()
+                        if not room["waiters"] and not room["listeners"] and now - room["touched"] >= self.idle_seconds]:
+            del self._rooms[room_id]
+
+    def __len__(self):
+        return len(self._rooms)
+
+    # 🔹 Millisecond based ids stay increasing across restarts and roughly comparable across workers
+    def _next_id(self):
+        self._last_id = max(self._last_id + 1, int(time.time() * 1000))
+        return self._last_id
+
+    def publish(self, room_id, event_type, data, forward=True):
+        with self._lock:
+            room = self._room(room_id)
+            latest = room["latest"].get(event_type)
+            if latest is not None and latest["data"] == data:
+                # Nothing changed, don't wake anybody up
+                return latest
+
+            event = {"id": self._next_id(), "type": event_type, "data": data}
+            room["latest"][event_type] = event
+            room["condition"].notify_all()
+            listeners = list(room["listeners"])
+
+        for listener in listeners:
+            listener(event)
+
+        if forward and self.fanout is not None:
+            # The other workers miss this one event, their streams catch up with the next
+            try:
+                self.fanout.send(room_id, event_type, data)
+            except Exception as e:
+                print("Error forwarding room event:", str(e))
+        return event
+
+    # 🔹 An event forwarded by another worker, kept only for rooms streamed from this one
+    def apply(self, room_id, event_type, data):
+        if room_id in self._rooms:
+            self.publish(room_id, event_type, data, forward=False)
+
+    def reload(self, room_id, event_type):
+        if room_id in self._rooms and event_type in self.loaders:
+            self.publish(room_id, event_type, self.loaders[event_type](room_id), forward=False)
+
+    # 🔹 Streams need the events of the other workers from the start
+    def _listen(self):
+        if self.fanout is not None:
+            self.fanout.start()
+
+    def has_snapshot(self, room_id, event_type):
+        room = self._rooms.get(room_id)
+        return room is not None and event_type in room["latest"]
+
+    # 🔹 Block until the room has a newer event of this type, or the timeout passes
+    def wait(self, room_id, event_type, last_event_id, timeout=STREAM_HEARTBEAT_SECONDS):
+        self._listen()
+        with self._lock:
+            room = self._room(room_id)
+            deadline = time.monotonic() + timeout
+            # A room with a waiting stream is never swept
+            room["waiters"] += 1
+            try:
+                while True:
+                    if room["closed"]:
+                        return None
+                    event = room["latest"].get(event_type)
+                    if event is not None and event["id"] > last_event_id:
+                        return event
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    room["condition"].wait(remaining)
+            finally:
+                room["waiters"] -= 1
+                room["touched"] = time.monotonic()
+
+    def event_since(self, room_id, event_type, last_event_id):
+        room = self._rooms.get(room_id)
+        if room is None:
+            return None
+        event = room["latest"].get(event_type)
+        return event if event is not None and event["id"] > last_event_id else None
+
+    # 🔹 Callbacks for streams that don't block a thread (e.g. asyncio based servers)
+    def subscribe(self, room_id, listener):
+        self._listen()
+        with self._lock:
+            self._room(room_id)["listeners"].add(listener)
+
+    def unsubscribe(self, room_id, listener):
+        with self._lock:
+            room = self._rooms.get(room_id)
+            if room is not None:
+                room["listeners"].discard(listener)
+                room["touched"] = time.monotonic()
+
+    # 🔹 The room is gone, end every stream still watching it
+    def close(self, room_id, forward=True):
+        if forward and self.fanout is not None:
+            try:
+                self.fanout.send(room_id, None)
+            except Exception as e:
+                print("Error forwarding room close:", str(e))
+
+        with self._lock:
+            room = self._rooms.pop(room_id, None)
+            if room is None:
+                return
+            room["closed"] = True
+            room["condition"].notify_all()
+            listeners = list(room["listeners"])
+
+        for listener in listeners:
+            listener(None)
+
+
+def format_event(event):
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+
+
+room_events = RoomEventBroker()
+room_events.fanout = create_fanout(room_events)
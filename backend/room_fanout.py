@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+import uuid
+from config import DATABASE_URL, ROOM_EVENTS_FANOUT
+
+# 🔹 Postgres channel the room events of every worker go through
+ROOM_EVENTS_CHANNEL = os.getenv("ROOM_EVENTS_CHANNEL", "room_events")
+
+# 🔹 NOTIFY payloads must stay under 8000 bytes; bigger snapshots are sent without data and reloaded by the receivers
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+# 🔹 Seconds between reconnects of the listening connection after it fails
+FANOUT_RECONNECT_SECONDS = 2
+
+
+class PostgresFanout:
+    """Forwards room events between worker processes with Postgres LISTEN/NOTIFY.
+
+    Every event a worker publishes is also sent as a NOTIFY on one channel; a listener thread in
+    every worker hands the events of other workers to its own broker, which only keeps those of
+    rooms somebody streams from that worker. Needs DATABASE_URL, whatever DATA_BACKEND is: the
+    fan-out holds two connections of its own (one listening, one sending).
+    """
+
+    def __init__(self, dsn, broker, channel=ROOM_EVENTS_CHANNEL):
+        self.dsn = dsn
+        self.broker = broker
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._pid = None
+        self._origin = None
+        self._sender = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def _connect(self):
+        import psycopg2
+        from green import make_psycopg2_green
+
+        # Under gevent the listener waits on the hub, like the repository's queries
+        make_psycopg2_green()
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        return conn
+
+    # 🔹 One listener per process; a forked worker starts its own, with its own origin
+    def start(self):
+        with self._lock:
+            if self._pid == os.getpid() and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = os.getpid()
+            self._origin = uuid.uuid4().hex
+            self._sender = None
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def send(self, room_id, event_type, data=None):
+        """Tells the other workers about an event; event_type None closes the room."""
+        self.start()
+        message = {"origin": self._origin, "room_id": room_id, "type": event_type, "data": data}
+        payload = json.dumps(message)
+        if len(payload.encode()) > NOTIFY_PAYLOAD_LIMIT:
+            message["data"] = None
+            message["reload"] = True
+            payload = json.dumps(message)
+
+        with self._lock:
+            try:
+                if self._sender is None or self._sender.closed:
+                    self._sender = self._connect()
+                with self._sender.cursor() as cursor:
+                    cursor.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+            except Exception:
+                # Reconnect on the next event; this one only reaches this worker's streams
+                self._sender = None
+                raise
+
+    def receive(self, payload):
+        message = json.loads(payload)
+        if message.get("origin") == self._origin:
+            return
+        if message["type"] is None:
+            self.broker.close(message["room_id"], forward=False)
+        elif message.get("reload"):
+            self.broker.reload(message["room_id"], message["type"])
+        else:
+            self.broker.apply(message["room_id"], message["type"], message["data"])
+
+    def _listen(self):
+        import select
+
+        conn = self._connect()
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute(f"LISTEN {self.channel}")
+            while not self._stopped.is_set():
+                if select.select([conn], [], [], 5) == ([], [], []):
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    notify = conn.notifies.pop(0)
+                    try:
+                        self.receive(notify.payload)
+                    except Exception as e:
+                        print("Error applying room event:", str(e))
+        finally:
+            conn.close()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self._listen()
+            except Exception as e:
+                print("Room event listener failed, reconnecting:", str(e))
+                time.sleep(FANOUT_RECONNECT_SECONDS)
+
+
+def create_fanout(broker):
+    if not ROOM_EVENTS_FANOUT or not DATABASE_URL:
+        return None
+    return PostgresFanout(DATABASE_URL, broker)
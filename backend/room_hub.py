@@ -0,0 +1,342 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from repository import repository
+from middleware import check_user_token
+from room_registry import room_registry
+from score_writer import score_writer
+
+
+def _answer_matches(answer, correct_answer):
+    return answer.strip().lower() == correct_answer.strip().lower()
+
+
+class RoomState:
+    """Authoritative state of one active room; turns are validated and scored in memory."""
+
+    def __init__(self, room_id, host_id, total_rounds):
+        self.room_id = room_id
+        self.host_id = host_id
+        self.total_rounds = total_rounds
+        self.current_round = 1
+        self.current_turn = None
+        self.is_active = True
+        self.scores = {}
+        self.emoji_clue = None
+        self.correct_answer = None
+        self.players = []
+        self.usernames = {}
+        self.connections = set()
+        self.has_game_state_row = False
+        self.version = 0
+        self._dirty = False
+        self._persist_task = None
+
+    @classmethod
+    def load(cls, room_id):
+        room = room_registry.get(room_id)
+        if not room:
+            return None
+
+        state = cls(room_id, room["host_id"], room.get("total_rounds") or 5)
+        state.load_players()
+
+        state.reload()
+        return state
+
+    def reload(self):
+        game_state = repository.get_game_state(self.room_id)
+        if not game_state:
+            return
+        game_data = game_state.get("game_data") or {}
+        self.has_game_state_row = True
+        self.version = game_state.get("version") or 0
+        self.current_turn = game_state.get("current_turn")
+        self.current_round = game_state.get("current_round") or 1
+        self.total_rounds = game_state.get("total_rounds") or self.total_rounds
+        self.is_active = game_state.get("is_active", True)
+        self.scores = dict(game_data.get("scores", {}))
+        self.emoji_clue = game_data.get("emoji_clue")
+        self.correct_answer = game_data.get("correct_answer")
+
+    def load_players(self):
+        players = repository.list_players(self.room_id)
+        self.players = [p["user_id"] for p in players]
+        self.usernames = {p["user_id"]: p.get("username") for p in players}
+
+    # 🔹 Players who guess: everybody except the host, in join order
+    def guessers(self):
+        return [player for player in self.players if player != self.host_id]
+
+    def next_turn(self, user_id):
+        guessers = self.guessers()
+        if user_id not in guessers:
+            return guessers[0] if guessers else None
+        return guessers[(guessers.index(user_id) + 1) % len(guessers)]
+
+    def public_state(self):
+        return {
+            "type": "state",
+            "room_id": self.room_id,
+            "host_id": self.host_id,
+            "players": [{"user_id": p, "username": self.usernames.get(p)} for p in self.players],
+            "current_turn": self.current_turn,
+            "current_round": self.current_round,
+            "total_rounds": self.total_rounds,
+            "is_active": self.is_active,
+            "scores": self.scores,
+            "emoji_clue": self.emoji_clue
+        }
+
+    def snapshot(self):
+        return {
+            "current_turn": self.current_turn,
+            "current_round": self.current_round,
+            "total_rounds": self.total_rounds,
+            "is_active": self.is_active,
+            "game_data": {
+                "scores": dict(self.scores),
+                "emoji_clue": self.emoji_clue,
+                "correct_answer": self.correct_answer
+            },
+            "updated_at": datetime.utcnow().isoformat()
+        }
+
+    def set_emoji(self, user_id, emoji_clue, correct_answer):
+        if user_id != self.host_id:
+            return {"error": "Only the host can set the emoji puzzle."}
+        if not self.is_active:
+            return {"error": "The game has already ended!"}
+        if not emoji_clue or not correct_answer:
+            return {"error": "emoji_clue and correct_answer are required"}
+
+        self.emoji_clue = emoji_clue
+        self.correct_answer = correct_answer
+        if self.current_turn is None:
+            self.current_turn = self.next_turn(None)
+        return None
+
+    def submit_answer(self, user_id, answer):
+        if not self.is_active:
+            return {"error": "The game has already ended!"}
+        if user_id == self.host_id:
+            return {"error": "The host cannot guess. Only other players can answer."}
+        if not self.correct_answer:
+            return {"error": "No active puzzle found in this room"}
+        if len(self.players) < 2:
+            return {"error": "No other players in the game"}
+        if self.current_turn is not None and self.current_turn != user_id:
+            return {"error": "Not your turn!", "expected_turn": self.current_turn}
+        if not answer:
+            return {"error": "answer is required"}
+
+        if not _answer_matches(answer, self.correct_answer):
+            return {"type": "answer", "correct": False, "message": "Wrong answer!"}
+
+        self.scores[user_id] = self.scores.get(user_id, 0) + 10
+        if self.current_round >= self.total_rounds:
+            self.is_active = False
+            return {"type": "answer", "correct": True, "message": "Game over! Final scores are updated.", "game_over": True}
+
+        self.current_round += 1
+        self.current_turn = self.next_turn(user_id)
+        self.emoji_clue = None
+        self.correct_answer = None
+        return {"type": "answer", "correct": True, "message": "Answer submitted successfully!", "next_turn": self.current_turn}
+
+    # 🔹 Returns False if game_state was written by someone else (the turn scheduler, the HTTP routes) since
+    #    the room was loaded or last written; those writers compare-and-swap on version, and so does this
+    def write_snapshot(self, snapshot):
+        if not self.has_game_state_row:
+            repository.insert_game_state({"id": str(uuid.uuid4()), "room_id": self.room_id, "version": self.version, **snapshot})
+            self.has_game_state_row = True
+            return True
+        row = repository.update_game_state_if(self.room_id, self.version, snapshot)
+        if row is None:
+            return False
+        self.version = row["version"]
+        return True
+
+    # 🔹 One write in flight per room; bursts of actions collapse into the latest snapshot
+    def schedule_persist(self):
+        self._dirty = True
+        if self._persist_task is None or self._persist_task.done():
+            self._persist_task = asyncio.create_task(self._persist())
+
+    async def _persist(self):
+        # Returns whether the latest snapshot was stored; when it was not, the players are told
+        stored = True
+        while self._dirty:
+            self._dirty = False
+            try:
+                if await asyncio.to_thread(self.write_snapshot, self.snapshot()):
+                    stored = True
+                    continue
+                # The other write stands: tell the players their last move was dropped and show them the stored state
+                self._dirty = False
+                stored = False
+                await asyncio.to_thread(self.reload)
+                await self.send_all({"type": "error", "error": "The game was changed elsewhere, the last move was not saved."},
+                                    self.public_state())
+            except Exception as e:
+                print("Error persisting room state:", str(e))
+                stored = False
+                await self.send_all({"type": "error", "error": "The game could not be saved: " + str(e)})
+        return stored
+
+    async def send_all(self, *messages):
+        for message in messages:
+            text = json.dumps(message)
+            await asyncio.gather(*(connection.send(text) for connection in list(self.connections)), return_exceptions=True)
+
+    async def flush(self):
+        if self._persist_task is not None:
+            return await self._persist_task
+        return True
+
+
+class RoomHub:
+    """Routes WebSocket messages to the in-memory state of each active room.
+
+    Connections only need an async send(text) method, so the hub works with any
+    WebSocket server. All rooms live on one event loop, so a room has to be served
+    by a single game server process.
+    """
+
+    def __init__(self):
+        self.rooms = {}
+        self._loading = {}
+        self._members = {}
+
+    async def _room(self, room_id):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            return room
+
+        # Concurrent joins of a cold room share one load
+        loading = self._loading.get(room_id)
+        if loading is None:
+            loading = asyncio.ensure_future(asyncio.to_thread(RoomState.load, room_id))
+            self._loading[room_id] = loading
+        try:
+            room = await loading
+        finally:
+            self._loading.pop(room_id, None)
+
+        if room is not None:
+            room = self.rooms.setdefault(room_id, room)
+        return room
+
+    async def _send(self, connection, message):
+        try:
+            await connection.send(json.dumps(message))
+        except Exception as e:
+            print("Error sending to connection:", str(e))
+
+    async def broadcast(self, room, message):
+        await room.send_all(message)
+
+    async def handle(self, connection, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return await self._send(connection, {"type": "error", "error": "Messages must be JSON"})
+
+        message_type = message.get("type")
+        if message_type == "join":
+            return await self._join(connection, message)
+
+        member = self._members.get(connection)
+        if member is None:
+            return await self._send(connection, {"type": "error", "error": "Join a room first"})
+
+        room_id, user_id = member
+        room = self.rooms.get(room_id)
+        if room is None:
+            return await self._send(connection, {"type": "error", "error": "Room is no longer active"})
+
+        if message_type == "set_emoji":
+            error = room.set_emoji(user_id, message.get("emoji_clue"), message.get("correct_answer"))
+            if error:
+                return await self._send(connection, {"type": "error", **error})
+            room.schedule_persist()
+            await self.broadcast(room, room.public_state())
+        elif message_type == "answer":
+            result = room.submit_answer(user_id, message.get("answer"))
+            if "error" in result:
+                return await self._send(connection, {"type": "error", **result})
+            await self._send(connection, result)
+            if result["correct"]:
+                room.schedule_persist()
+                await self.broadcast(room, room.public_state())
+                if result.get("game_over"):
+                    await self._finish(room)
+        elif message_type == "state":
+            await self._send(connection, room.public_state())
+        else:
+            await self._send(connection, {"type": "error", "error": f"Unknown message type: {message_type}"})
+
+    async def _join(self, connection, message):
+        room_id = message.get("room_id")
+        if not room_id:
+            return await self._send(connection, {"type": "error", "error": "room_id is required"})
+
+        # 🔹 The player is whoever the token says, a user_id sent along has to match it
+        user_id, error, _ = check_user_token(message.get("token"))
+        if error:
+            return await self._send(connection, {"type": "error", "error": error})
+        if message.get("user_id") not in (None, user_id):
+            return await self._send(connection, {"type": "error", "error": "user_id does not match the token"})
+
+        if self._members.get(connection) == (room_id, user_id) and room_id in self.rooms:
+            # Joining the same room again only resends the state
+            return await self._send(connection, self.rooms[room_id].public_state())
+
+        # Leaving the previous room can drop this one if it was its only connection, so look it up after
+        await self.disconnect(connection)
+        room = await self._room(room_id)
+        if room is None:
+            return await self._send(connection, {"type": "error", "error": "Invalid room ID"})
+
+        if user_id not in room.players:
+            # The player may have joined over HTTP after the room was loaded
+            await asyncio.to_thread(room.load_players)
+            if user_id not in room.players:
+                return await self._send(connection, {"type": "error", "error": "Join the room before connecting"})
+
+        self._members[connection] = (room_id, user_id)
+        room.connections.add(connection)
+        await self.broadcast(room, room.public_state())
+
+    async def _finish(self, room):
+        # 🔹 The game is over once its last snapshot is stored; if another write won, the players already got an error
+        if not await room.flush():
+            return
+        await self.broadcast(room, {"type": "game_over", "final_scores": room.scores})
+        if not room.scores:
+            return
+        try:
+            await asyncio.to_thread(score_writer.write_final, dict(room.scores))
+        except Exception as e:
+            # The score writer keeps them queued and retries
+            print("Error storing final scores:", str(e))
+            await self.broadcast(room, {"type": "error", "error": "Final scores are not saved yet, they will be retried."})
+
+    async def disconnect(self, connection):
+        member = self._members.pop(connection, None)
+        if member is None:
+            return
+
+        room = self.rooms.get(member[0])
+        if room is None:
+            return
+        room.connections.discard(connection)
+        if not room.connections:
+            # Last player left: make sure the final snapshot is written, then drop the room
+            await room.flush()
+            if not room.connections:
+                self.rooms.pop(room.room_id, None)
+
+
+room_hub = RoomHub()
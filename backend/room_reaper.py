@@ -0,0 +1,117 @@
+import os
+import threading
+import time
+import metrics
+from repository import repository
+from query_tracer import query_tracer
+from room_codes import room_codes
+from room_registry import room_registry
+from chat_buffer import chat_buffer
+from room_events import room_events
+from turn_scheduler import turn_scheduler
+
+# 🔹 A room with no new game state write, join or chat message for this long is abandoned
+ROOM_IDLE_TTL_SECONDS = int(os.getenv("ROOM_IDLE_TTL_SECONDS", str(6 * 3600)))
+
+# 🔹 Time between sweeps, and the most rooms one sweep deletes
+ROOM_REAPER_INTERVAL_SECONDS = float(os.getenv("ROOM_REAPER_INTERVAL_SECONDS", "300"))
+ROOM_REAPER_MAX_ROOMS = int(os.getenv("ROOM_REAPER_MAX_ROOMS", "5000"))
+
+# 🔹 Rooms deleted per reap_idle_rooms call; every row of those rooms goes in the same statement
+ROOM_REAPER_BATCH = int(os.getenv("ROOM_REAPER_BATCH", "100"))
+
+# 🔹 Share of the sweep spent in the database; after a batch that took t seconds the reaper
+#    rests t * (1 / duty - 1), so it backs off by itself when the database is slow
+ROOM_REAPER_DUTY_CYCLE = float(os.getenv("ROOM_REAPER_DUTY_CYCLE", "0.1"))
+
+REAPED_TABLES = ("game_rooms", "players_in_room", "game_state", "chat_messages")
+
+rows_reaped = metrics.registry.register(metrics.Counter(
+    "room_reaper_rows_deleted_total", "Rows of idle rooms deleted by the room reaper.", ("table",)))
+reaper_sweeps = metrics.registry.register(metrics.Histogram(
+    "room_reaper_sweep_seconds", "Duration of room reaper sweeps, pauses included.", buckets=(0.1, 0.5, 1, 5, 10, 30, 60, 300)))
+
+
+class RoomReaper:
+    """Deletes abandoned rooms in small, paced batches, and drops them from the in-memory caches."""
+
+    def __init__(self, idle_ttl=ROOM_IDLE_TTL_SECONDS, batch_size=ROOM_REAPER_BATCH, duty_cycle=ROOM_REAPER_DUTY_CYCLE):
+        self.idle_ttl = idle_ttl
+        self.batch_size = batch_size
+        self.duty_cycle = duty_cycle
+        self.last_sweep = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, interval=ROOM_REAPER_INTERVAL_SECONDS):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, args=(interval,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    @staticmethod
+    def _forget(row):
+        room_id = str(row["room_id"])
+        room_codes.forget(room_id, row.get("room_code"))
+        room_registry.forget(room_id)
+        chat_buffer.drop(room_id)
+        room_events.close(room_id)
+        turn_scheduler.cancel(room_id)
+
+    # 🔹 One sweep: batches until no idle room is left or max_rooms are gone; returns the rows deleted per table
+    def sweep(self, max_rooms=ROOM_REAPER_MAX_ROOMS):
+        started = time.perf_counter()
+        deleted = dict.fromkeys(REAPED_TABLES, 0)
+        # The batches are the paging, the tracer does not count them as an N+1 loop
+        with query_tracer.paused():
+            while deleted["game_rooms"] < max_rooms and not self._stopped.is_set():
+                batch_started = time.perf_counter()
+                rows = repository.reap_idle_rooms(self.idle_ttl, min(self.batch_size, max_rooms - deleted["game_rooms"]))
+                batch_seconds = time.perf_counter() - batch_started
+
+                counts = {
+                    "game_rooms": len(rows),
+                    "players_in_room": sum(row["players"] for row in rows),
+                    "game_state": sum(row["game_states"] for row in rows),
+                    "chat_messages": sum(row["messages"] for row in rows)
+                }
+                for table, count in counts.items():
+                    deleted[table] += count
+                    if count:
+                        rows_reaped.inc(table, amount=count)
+                for row in rows:
+                    self._forget(row)
+
+                if len(rows) < self.batch_size:
+                    break
+                # Pace the batches so live requests keep most of the database
+                self._stopped.wait(batch_seconds * (1 / self.duty_cycle - 1))
+
+        seconds = time.perf_counter() - started
+        reaper_sweeps.observe(seconds)
+        self.last_sweep = dict(deleted, seconds=seconds, finished_at=time.time())
+        if deleted["game_rooms"]:
+            print("Room reaper deleted", ", ".join(f"{count} {table}" for table, count in deleted.items()), f"in {seconds:.1f}s")
+        return deleted
+
+    def _run(self, interval):
+        # The first sweep waits a full interval, so it never adds to a worker's startup
+        while not self._stopped.wait(interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                print("Error reaping idle rooms:", str(e))
+
+
+room_reaper = RoomReaper()
+
+
+if __name__ == "__main__":
+    # One sweep by hand: python room_reaper.py
+    print(room_reaper.sweep())
@@ -0,0 +1,77 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from repository import repository
+
+# 🔹 How long a known room is trusted, and how long a missing one is remembered as missing
+ROOM_CACHE_TTL = int(os.getenv("ROOM_CACHE_TTL", "300"))
+ROOM_MISS_TTL = float(os.getenv("ROOM_MISS_TTL", "5"))
+
+ROOM_CACHE_SIZE = int(os.getenv("ROOM_CACHE_SIZE", "10000"))
+
+ROOM_FIELDS = ("id", "host_id", "room_code", "total_rounds")
+
+
+# 🔹 Canonical form of a room id sent by a client, None when it is not a UUID
+def valid_room_id(room_id):
+    try:
+        return str(uuid.UUID(room_id))
+    except (TypeError, ValueError):
+        return None
+
+
+class RoomRegistry:
+    """game_rooms rows by room id, so existence and host checks don't need a query each time.
+
+    Unknown ids are cached as missing for ROOM_MISS_TTL, so a flood of bad ids
+    costs one query per id and window instead of one per request.
+    """
+
+    def __init__(self, ttl=ROOM_CACHE_TTL, miss_ttl=ROOM_MISS_TTL, max_size=ROOM_CACHE_SIZE):
+        self.ttl = ttl
+        self.miss_ttl = miss_ttl
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._rooms = OrderedDict()
+
+    def _store(self, room_id, room, ttl):
+        with self._lock:
+            self._rooms[room_id] = (room, time.monotonic() + ttl)
+            self._rooms.move_to_end(room_id)
+            while len(self._rooms) > self.max_size:
+                self._rooms.popitem(last=False)
+
+    # 🔹 The room row (id, host_id, room_code, total_rounds), or None if there is no such room
+    def get(self, room_id):
+        room_id = str(room_id)
+        entry = self._rooms.get(room_id)
+        if entry is not None and time.monotonic() < entry[1]:
+            return entry[0]
+
+        room = repository.get_room(room_id)
+        if room is None:
+            self._store(room_id, None, self.miss_ttl)
+            return None
+        return self.remember(room)
+
+    def exists(self, room_id):
+        return self.get(room_id) is not None
+
+    def host_of(self, room_id):
+        room = self.get(room_id)
+        return room["host_id"] if room else None
+
+    # 🔹 A room row the caller just wrote or read
+    def remember(self, room):
+        room = {field: room.get(field) for field in ROOM_FIELDS}
+        self._store(str(room["id"]), room, self.ttl)
+        return room
+
+    def forget(self, room_id):
+        with self._lock:
+            self._rooms.pop(str(room_id), None)
+
+
+room_registry = RoomRegistry()
@@ -0,0 +1,473 @@
+-- 🔹 Tables used by the backend. Supabase already has them; run this against a
+--    local Postgres (psql "$DATABASE_URL" -f schema.sql) to develop or test offline.
+
+create table if not exists emoji_puzzles (
+    id bigint generated by default as identity primary key,
+    genre text not null,
+    level_number integer not null,
+    emoji_clue text not null,
+    correct_answer text not null
+);
+
+create index if not exists emoji_puzzles_genre_level_idx on emoji_puzzles (genre, level_number);
+
+create table if not exists game_questions (
+    id bigint generated by default as identity primary key,
+    question text not null
+);
+
+create table if not exists game_rooms (
+    id uuid primary key default gen_random_uuid(),
+    room_code text,
+    host_id uuid not null,
+    total_rounds integer not null default 5,
+    deck_seed bigint,
+    deck_genres jsonb,
+    deck_positions jsonb not null default '{}'::jsonb,
+    created_at timestamptz not null default now()
+);
+
+-- 🔹 Live codes are unique; ended rooms give their code back by setting it to null
+create unique index if not exists game_rooms_room_code_key on game_rooms (room_code);
+
+create table if not exists players_in_room (
+    id uuid primary key default gen_random_uuid(),
+    room_id uuid not null,
+    user_id uuid not null,
+    username text,
+    score integer not null default 0,
+    joined_at timestamptz not null default now()
+);
+
+create index if not exists players_in_room_room_idx on players_in_room (room_id, joined_at);
+
+create table if not exists game_state (
+    id uuid primary key default gen_random_uuid(),
+    room_id uuid not null unique,
+    current_turn uuid,
+    question_id bigint,
+    game_data jsonb not null default '{}'::jsonb,
+    answered_users jsonb not null default '[]'::jsonb,
+    is_active boolean not null default true,
+    total_rounds integer not null default 5,
+    current_round integer not null default 1,
+    turn_end_time timestamptz,
+    version integer not null default 0,
+    updated_at timestamptz not null default now()
+);
+
+create table if not exists chat_messages (
+    id bigint generated by default as identity primary key,
+    room_id uuid not null,
+    sender_id uuid not null,
+    message text not null,
+    timestamp timestamptz not null default now()
+);
+
+create index if not exists chat_messages_room_id_idx on chat_messages (room_id, id);
+
+create table if not exists leaderboard (
+    id bigint generated by default as identity primary key,
+    user_id uuid not null,
+    genre text,
+    total_score integer not null default 0,
+    timestamp bigint
+);
+
+create index if not exists leaderboard_user_genre_idx on leaderboard (user_id, genre);
+create index if not exists leaderboard_genre_score_idx on leaderboard (genre, total_score desc);
+
+create table if not exists player_progress (
+    user_id uuid not null,
+    genre text not null,
+    completed_levels integer not null default 0,
+    primary key (user_id, genre)
+);
+
+-- 🔹 Singleplayer answer in one round trip: check the answer, advance the player's
+--    progress and add the points in a single transaction. Returns null for an unknown level.
+create or replace function submit_singleplayer_answer(p_user_id uuid, p_level_number integer, p_answer text)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_genre text;
+    v_correct_answer text;
+    v_correct boolean;
+    v_completed integer;
+    v_score integer;
+    v_advanced boolean := false;
+    v_new_score_row boolean := false;
+begin
+    select genre, correct_answer into v_genre, v_correct_answer
+    from emoji_puzzles where level_number = p_level_number order by id limit 1;
+    if not found then
+        return null;
+    end if;
+
+    v_correct := lower(trim(both E' \t\r\n' from p_answer)) = lower(trim(both E' \t\r\n' from v_correct_answer));
+
+    -- Double submits of the same player and genre queue up here instead of both advancing
+    perform pg_advisory_xact_lock(hashtext(p_user_id::text || ':' || v_genre));
+
+    select completed_levels into v_completed from player_progress where user_id = p_user_id and genre = v_genre;
+    v_completed := coalesce(v_completed, 0);
+    select total_score into v_score from leaderboard where user_id = p_user_id and genre = v_genre order by id limit 1;
+    v_new_score_row := v_score is null;
+    v_score := coalesce(v_score, 0);
+
+    if v_correct and v_completed < p_level_number then
+        v_advanced := true;
+        v_score := v_score + 10;
+
+        insert into player_progress (user_id, genre, completed_levels) values (p_user_id, v_genre, 1)
+        on conflict (user_id, genre) do update set completed_levels = player_progress.completed_levels + 1
+        returning completed_levels into v_completed;
+
+        if v_new_score_row then
+            insert into leaderboard (user_id, genre, total_score) values (p_user_id, v_genre, v_score);
+        else
+            update leaderboard set total_score = v_score where user_id = p_user_id and genre = v_genre;
+        end if;
+    end if;
+
+    return jsonb_build_object(
+        'genre', v_genre,
+        'correct', v_correct,
+        'advanced', v_advanced,
+        'completed_levels', v_completed,
+        'new_score', v_score,
+        'new_score_row', v_advanced and v_new_score_row
+    );
+end;
+$$;
+
+-- 🔹 Batched score increments: p_rows is a JSON array of {user_id, genre, delta, timestamp}.
+--    Each player's (user_id, genre) row is incremented in place, or created when missing.
+--    Returns the resulting totals and whether a row was created.
+-- 🔹 A player's score and rank in a genre, for players below the in-memory top-K of the genre
+--    (see leaderboard_engine.py); ties are ordered by user_id, as in memory
+create or replace function genre_rank(p_genre text, p_user_id uuid)
+returns table (total_score integer, rank bigint)
+language sql
+stable
+as $$
+    with mine as (
+        select l.total_score from leaderboard l
+        where l.user_id = p_user_id and l.genre = p_genre
+        order by l.id limit 1
+    )
+    select mine.total_score, 1 + (
+        select count(distinct o.user_id) from leaderboard o
+        where o.genre = p_genre
+          and (o.total_score > mine.total_score or (o.total_score = mine.total_score and o.user_id < p_user_id))
+    )
+    from mine;
+$$;
+
+create or replace function increment_leaderboard_scores(p_rows jsonb)
+returns table (user_id uuid, genre text, total_score integer, inserted boolean)
+language plpgsql
+as $$
+declare
+    v_row record;
+    v_id bigint;
+begin
+    for v_row in
+        select r.user_id, r.genre, sum(r.delta)::integer as delta, max(r.timestamp) as timestamp
+        from jsonb_to_recordset(p_rows) as r(user_id uuid, genre text, delta integer, timestamp bigint)
+        group by r.user_id, r.genre
+        order by r.user_id, r.genre
+    loop
+        -- Same key as submit_singleplayer_answer, so the two never race on creating a row
+        perform pg_advisory_xact_lock(hashtext(v_row.user_id::text || ':' || v_row.genre));
+
+        select l.id into v_id from leaderboard l
+        where l.user_id = v_row.user_id and l.genre = v_row.genre
+        order by l.id limit 1;
+
+        if v_id is null then
+            insert into leaderboard as l (user_id, genre, total_score, timestamp)
+            values (v_row.user_id, v_row.genre, v_row.delta, v_row.timestamp)
+            returning l.total_score into total_score;
+            inserted := true;
+        else
+            update leaderboard as l
+            set total_score = l.total_score + v_row.delta, timestamp = coalesce(v_row.timestamp, l.timestamp)
+            where l.id = v_id
+            returning l.total_score into total_score;
+            inserted := false;
+        end if;
+
+        user_id := v_row.user_id;
+        genre := v_row.genre;
+        return next;
+    end loop;
+end;
+$$;
+
+-- 🔹 Per-room puzzle deck: the room keeps a shuffle seed and how far each deck
+--    ("*" for all of the room's genres, or a single genre) has been drawn.
+alter table game_rooms add column if not exists deck_seed bigint;
+alter table game_rooms add column if not exists deck_genres jsonb;
+alter table game_rooms add column if not exists deck_positions jsonb not null default '{}'::jsonb;
+
+-- 🔹 Optimistic concurrency: read-modify-write updates of game_state only apply
+--    when the row still has the version they read, and bump it (see game_state_cas.py)
+alter table game_state add column if not exists version integer not null default 0;
+
+-- 🔹 Turn timers: active rooms with a running turn, loaded once when a worker starts
+create index if not exists game_state_turn_end_idx on game_state (turn_end_time) where is_active and turn_end_time is not null;
+
+-- 🔹 Passes the turn on in every room of p_room_ids (a JSON array of room ids) whose
+--    turn_end_time has expired: next player by join order, next round, timer cleared.
+--    Rooms whose turn was taken or re-armed since are skipped; returns the rooms advanced,
+--    with their scores for the games that just ended.
+drop function if exists advance_expired_turns(jsonb);
+create or replace function advance_expired_turns(p_room_ids jsonb)
+returns table (room_id uuid, current_turn uuid, current_round integer, is_active boolean, scores jsonb)
+language sql
+as $$
+    with expired as (
+        select s.room_id, s.current_turn
+        from game_state s
+        where s.room_id in (select value::uuid from jsonb_array_elements_text(p_room_ids))
+          and s.is_active and s.turn_end_time <= now()
+        for update skip locked
+    ), seats as (
+        select p.room_id, p.user_id,
+               lead(p.user_id) over w as next_user,
+               first_value(p.user_id) over w as first_user
+        from players_in_room p
+        where p.room_id in (select e.room_id from expired e)
+        window w as (partition by p.room_id order by p.joined_at, p.id rows between unbounded preceding and unbounded following)
+    ), turns as (
+        select e.room_id,
+               coalesce(
+                   (select coalesce(t.next_user, t.first_user) from seats t where t.room_id = e.room_id and t.user_id = e.current_turn limit 1),
+                   (select t.first_user from seats t where t.room_id = e.room_id limit 1),
+                   e.current_turn
+               ) as next_turn
+        from expired e
+    )
+    update game_state as s
+    set current_turn = t.next_turn,
+        current_round = s.current_round + 1,
+        is_active = s.current_round + 1 <= s.total_rounds,
+        turn_end_time = null,
+        version = s.version + 1,
+        updated_at = now()
+    from turns t
+    where s.room_id = t.room_id
+    returning s.room_id, s.current_turn, s.current_round, s.is_active, s.game_data -> 'scores';
+$$;
+
+-- 🔹 /game/take_turn in one round trip: the turn check, the points and the next turn are
+--    applied under the row lock, so concurrent turns queue up instead of retrying.
+--    Returns {status: taken | missing | ended | not_your_turn, ...}.
+create or replace function take_game_turn(p_room_id uuid, p_user_id uuid, p_next_turn uuid, p_points integer)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_state game_state%rowtype;
+    v_scores jsonb;
+begin
+    select * into v_state from game_state where room_id = p_room_id for update;
+    if not found then
+        return jsonb_build_object('status', 'missing');
+    end if;
+    if not v_state.is_active then
+        return jsonb_build_object('status', 'ended');
+    end if;
+    if v_state.current_turn is distinct from p_user_id then
+        return jsonb_build_object('status', 'not_your_turn', 'current_turn', v_state.current_turn);
+    end if;
+
+    v_scores := coalesce(v_state.game_data -> 'scores', '{}'::jsonb);
+    if p_points <> 0 then
+        v_scores := v_scores || jsonb_build_object(p_user_id::text, coalesce((v_scores ->> p_user_id::text)::integer, 0) + p_points);
+    end if;
+
+    update game_state
+    set current_turn = p_next_turn,
+        game_data = jsonb_build_object('scores', v_scores),
+        current_round = current_round + 1,
+        is_active = current_round + 1 <= total_rounds,
+        turn_end_time = null,
+        version = version + 1
+    where room_id = p_room_id
+    returning * into v_state;
+
+    return jsonb_build_object('status', 'taken', 'scores', v_scores, 'is_active', v_state.is_active);
+end;
+$$;
+
+-- 🔹 /multiplayer/submit_emoji_answer in one round trip: checks the answer against the
+--    room's puzzle and, when it is right, passes the turn on by join order (or ends the
+--    game on the last round) under the row lock. Returns {status: advanced | game_over |
+--    wrong | missing | ended | no_puzzle | no_players | not_in_room, ...}.
+create or replace function answer_room_puzzle(p_room_id uuid, p_user_id uuid, p_answer text)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_state game_state%rowtype;
+    v_players uuid[];
+    v_index integer;
+    v_next uuid;
+begin
+    select * into v_state from game_state where room_id = p_room_id for update;
+    if not found then
+        return jsonb_build_object('status', 'missing');
+    end if;
+    if not v_state.is_active then
+        return jsonb_build_object('status', 'ended');
+    end if;
+    if not (v_state.game_data ? 'emoji_clue' and v_state.game_data ? 'correct_answer') then
+        return jsonb_build_object('status', 'no_puzzle');
+    end if;
+
+    select array_agg(p.user_id order by p.joined_at, p.id) into v_players from players_in_room p where p.room_id = p_room_id;
+    if coalesce(array_length(v_players, 1), 0) < 2 then
+        return jsonb_build_object('status', 'no_players');
+    end if;
+
+    if lower(trim(both E' \t\r\n' from p_answer)) <> lower(trim(both E' \t\r\n' from v_state.game_data ->> 'correct_answer')) then
+        return jsonb_build_object('status', 'wrong', 'current_turn', v_state.current_turn);
+    end if;
+
+    if v_state.current_round >= v_state.total_rounds then
+        update game_state set is_active = false, version = version + 1 where room_id = p_room_id;
+        return jsonb_build_object('status', 'game_over');
+    end if;
+
+    v_index := array_position(v_players, p_user_id);
+    if v_index is null then
+        return jsonb_build_object('status', 'not_in_room');
+    end if;
+    v_next := v_players[v_index % array_length(v_players, 1) + 1];
+
+    update game_state
+    set current_turn = v_next,
+        current_round = current_round + 1,
+        version = version + 1
+    where room_id = p_room_id;
+
+    return jsonb_build_object('status', 'advanced', 'next_turn', v_next);
+end;
+$$;
+
+-- 🔹 Idle room cleanup (see room_reaper.py). Every game_state write counts as activity,
+--    including the ones that don't set updated_at themselves.
+create or replace function touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists game_state_touch_updated_at on game_state;
+create trigger game_state_touch_updated_at before update on game_state
+for each row execute function touch_updated_at();
+
+create index if not exists game_rooms_created_at_idx on game_rooms (created_at);
+
+-- 🔹 Deletes up to p_limit rooms idle for p_idle_seconds (created, last game_state write,
+--    last join and last chat message all older than that) with their players, game
+--    state and chat messages. Rooms another sweep holds are skipped, so concurrent
+--    workers split the work. Returns one row per deleted room with its deleted row counts.
+create or replace function reap_idle_rooms(p_idle_seconds integer, p_limit integer)
+returns table (room_id uuid, room_code text, players integer, game_states integer, messages integer)
+language sql
+as $$
+    with idle as (
+        select r.id
+        from game_rooms r
+        where r.created_at < now() - make_interval(secs => p_idle_seconds)
+          and not exists (select 1 from game_state s where s.room_id = r.id and s.updated_at >= now() - make_interval(secs => p_idle_seconds))
+          and not exists (select 1 from players_in_room p where p.room_id = r.id and p.joined_at >= now() - make_interval(secs => p_idle_seconds))
+          and not exists (select 1 from chat_messages m where m.room_id = r.id and m.timestamp >= now() - make_interval(secs => p_idle_seconds))
+        order by r.created_at
+        limit p_limit
+        for update of r skip locked
+    ), deleted_players as (
+        delete from players_in_room p using idle i where p.room_id = i.id returning p.room_id
+    ), deleted_states as (
+        delete from game_state s using idle i where s.room_id = i.id returning s.room_id
+    ), deleted_messages as (
+        delete from chat_messages m using idle i where m.room_id = i.id returning m.room_id
+    ), deleted_rooms as (
+        delete from game_rooms r using idle i where r.id = i.id returning r.id, r.room_code
+    )
+    select r.id, r.room_code,
+           coalesce(p.count, 0)::integer, coalesce(s.count, 0)::integer, coalesce(m.count, 0)::integer
+    from deleted_rooms r
+    left join (select d.room_id, count(*) from deleted_players d group by d.room_id) p on p.room_id = r.id
+    left join (select d.room_id, count(*) from deleted_states d group by d.room_id) s on s.room_id = r.id
+    left join (select d.room_id, count(*) from deleted_messages d group by d.room_id) m on m.room_id = r.id;
+$$;
+
+-- 🔹 Claims the next position of a room's deck; concurrent draws each get their own card
+create or replace function draw_deck_position(p_room_id uuid, p_deck text)
+returns table (deck_seed bigint, deck_genres jsonb, deck_position integer)
+language sql
+as $$
+    update game_rooms as r
+    set deck_positions = jsonb_set(r.deck_positions, array[p_deck], to_jsonb(coalesce((r.deck_positions ->> p_deck)::integer, 0) + 1))
+    where r.id = p_room_id
+    returning r.deck_seed, r.deck_genres, (r.deck_positions ->> p_deck)::integer - 1;
+$$;
+
+-- 🔹 Windowed leaderboards (see leaderboard_windows.py): every rise of a leaderboard
+--    row's total_score is added to the player's bucket for the current hour.
+--    Buckets past LEADERBOARD_BUCKET_RETENTION_DAYS are deleted by the app.
+create table if not exists leaderboard_buckets (
+    user_id uuid not null,
+    bucket_start bigint not null,
+    score integer not null default 0,
+    primary key (user_id, bucket_start)
+);
+
+create index if not exists leaderboard_buckets_start_idx on leaderboard_buckets (bucket_start);
+
+create or replace function add_leaderboard_bucket_score()
+returns trigger
+language plpgsql
+as $$
+declare
+    v_delta integer;
+begin
+    if tg_op = 'UPDATE' then
+        v_delta := new.total_score - old.total_score;
+    else
+        v_delta := new.total_score;
+    end if;
+
+    if v_delta > 0 then
+        insert into leaderboard_buckets as b (user_id, bucket_start, score)
+        values (new.user_id, floor(extract(epoch from now()) / 3600)::bigint * 3600, v_delta)
+        on conflict (user_id, bucket_start) do update set score = b.score + excluded.score;
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists leaderboard_bucket_scores on leaderboard;
+create trigger leaderboard_bucket_scores after insert or update of total_score on leaderboard
+for each row execute function add_leaderboard_bucket_score();
+
+-- 🔹 Puzzle imports (see import_puzzles.py): a puzzle's content hash is the first 32 hex
+--    digits of sha256(genre, clue and answer, NFC normalized, whitespace collapsed and
+--    lowercased, joined by U+001F). The hash is only ever computed in Python, so rows added
+--    by hand get theirs from the importer's backfill (python import_puzzles.py --backfill),
+--    which also runs before every import; the importer skips known hashes.
+alter table emoji_puzzles add column if not exists content_hash text;
+
+create unique index if not exists emoji_puzzles_content_hash_idx on emoji_puzzles (content_hash);
+
+-- 🔹 Exports (see exporter.py) page through finished games by room_id
+create index if not exists game_state_finished_idx on game_state (room_id) where not is_active;
@@ -0,0 +1,102 @@
+import atexit
+import os
+import threading
+import time
+from repository import repository
+from leaderboard_engine import leaderboard_engine
+
+# 🔹 How long per-answer increments are collected before they go to the database in one call
+SCORE_FLUSH_SECONDS = float(os.getenv("SCORE_FLUSH_SECONDS", "0.5"))
+
+
+class ScoreWriter:
+    """Coalesces leaderboard increments and writes them with one increment_leaderboard_scores call."""
+
+    def __init__(self, window=SCORE_FLUSH_SECONDS):
+        self.window = window
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}
+        self._timer = None
+
+    @staticmethod
+    def _merge(pending, user_id, genre, delta, timestamp):
+        key = (user_id, genre)
+        entry = pending.get(key)
+        if entry is None:
+            pending[key] = {"user_id": user_id, "genre": genre, "delta": delta, "timestamp": timestamp}
+        else:
+            entry["delta"] += delta
+            entry["timestamp"] = max(entry["timestamp"], timestamp)
+
+    # 🔹 Queue an increment, it is written with everything else that arrives within the window
+    def record(self, user_id, delta, genre="multiplayer"):
+        with self._lock:
+            self._merge(self._pending, user_id, genre, delta, int(time.time()))
+            self._arm()
+
+    # Called with the lock held
+    def _arm(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.window, self._flush_quietly)
+            self._timer.daemon = True
+            self._timer.start()
+
+    # 🔹 Increment not written yet, so callers can report a total that includes it
+    def pending(self, user_id, genre="multiplayer"):
+        entry = self._pending.get((user_id, genre))
+        return entry["delta"] if entry else 0
+
+    # 🔹 Final scores of a game, written right away together with whatever is queued; on failure they stay queued
+    def write_final(self, scores, genre="multiplayer"):
+        timestamp = int(time.time())
+        final = {}
+        for user_id, score in scores.items():
+            self._merge(final, user_id, genre, score, timestamp)
+        self.flush(final)
+
+    def flush(self, extra=None):
+        with self._lock:
+            queued, self._pending = self._pending, {}
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+        batch = {}
+        for entry in list(queued.values()) + list((extra or {}).values()):
+            self._merge(batch, entry["user_id"], entry["genre"], entry["delta"], entry["timestamp"])
+        if not batch:
+            return []
+
+        try:
+            # One call in flight at a time keeps each player's increments in order
+            with self._flush_lock:
+                results = repository.increment_scores(list(batch.values()))
+        except Exception:
+            # The whole batch goes back, final scores included, and a timer retries it; the caller still sees the error
+            with self._lock:
+                for entry in batch.values():
+                    self._merge(self._pending, entry["user_id"], entry["genre"], entry["delta"], entry["timestamp"])
+                if self._pending:
+                    self._arm()
+            raise
+
+        for result in results:
+            entry = batch.get((result["user_id"], result["genre"]))
+            if entry is None:
+                continue
+            if result["inserted"]:
+                leaderboard_engine.add_row(entry["user_id"], entry["delta"], entry["timestamp"], entry["genre"])
+            else:
+                leaderboard_engine.add_score(entry["user_id"], entry["delta"], entry["timestamp"], entry["genre"], result["total_score"])
+        return results
+
+    def _flush_quietly(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print("Error writing queued scores:", str(e))
+
+
+score_writer = ScoreWriter()
+atexit.register(score_writer._flush_quietly)
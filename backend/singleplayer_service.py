@@ -0,0 +1,74 @@
+from repository import repository
+from puzzle_catalog import puzzle_catalog
+from leaderboard_engine import leaderboard_engine
+
+# 🔹 Handler logic shared by singleplayer_routes.py (Flask) and asgi_app.py (FastAPI); each returns (body, status)
+
+
+def genres():
+    # Unique genres come straight from the in-process puzzle catalog
+    names = puzzle_catalog.genres()
+
+    if not names:
+        return {"error": "No genres found"}, 404
+
+    return {"genres": names}, 200
+
+
+def score(user_id, genre):
+    # Read from the table, not the genre board: the player's own writes may have gone through another worker
+    scores = repository.get_scores(user_id, genre)
+    return {"score": scores[0]["total_score"] if scores else 0}, 200
+
+
+# 🔹 The levels body depends on the catalog version and this, so it also goes into the ETag
+def completed_levels(user_id, genre):
+    progress = repository.get_progress(user_id, genre)
+    return int(progress["completed_levels"]) if progress else 0
+
+
+def levels(genre, completed):
+    # Levels along with correct answers, already sorted by the catalog
+    entries = []
+    for entry in puzzle_catalog.levels(genre):
+        level_number = int(entry["level_number"])
+        entries.append({
+            "level_number": level_number,
+            "emoji_clue": entry["emoji_clue"],
+            "correct_answer": entry["correct_answer"],  # ✅ Include correct answer
+            "is_unlocked": level_number <= completed + 1
+        })
+
+    return {"levels": entries, "completed_levels": completed}, 200
+
+
+def submit_answer(data):
+    user_id = data.get("user_id")
+    level_number = data.get("level_number")
+    player_answer = data.get("answer")
+
+    if not user_id or level_number is None or not player_answer:
+        return {"error": "user_id, level_number, and answer are required"}, 400
+
+    try:
+        level_number = int(level_number)
+    except (TypeError, ValueError):
+        return {"error": "Invalid level number"}, 404
+
+    # Answer check, progress and score update run as one transaction in the database
+    result = repository.submit_singleplayer_answer(user_id, level_number, player_answer)
+    if not result:
+        return {"error": "Invalid level number"}, 404
+
+    if result["new_score_row"]:
+        leaderboard_engine.add_row(user_id, result["new_score"], genre=result["genre"])
+    elif result["advanced"]:
+        leaderboard_engine.add_score(user_id, 10, genre=result["genre"], total=result["new_score"])
+
+    is_correct = result["correct"]
+    return {
+        "correct": is_correct,
+        "message": "Answer submitted successfully!" if is_correct else "Wrong answer!",
+        "new_score": result["new_score"],
+        "completed_levels": result["completed_levels"]
+    }, 200
@@ -0,0 +1,103 @@
+"""Room events forwarded between workers through Postgres LISTEN/NOTIFY, and psycopg2 under gevent.
+
+Needs a local Postgres; skipped unless TEST_DATABASE_URL is set (see test_postgres_repository.py).
+"""
+import os
+import subprocess
+import sys
+import textwrap
+import threading
+import time
+import unittest
+import uuid
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL")
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL is not set")
+class RoomFanoutTest(unittest.TestCase):
+
+    def setUp(self):
+        from room_events import RoomEventBroker
+        from room_fanout import PostgresFanout
+
+        # Two brokers with their own fan-out stand for two worker processes
+        self.channel = "room_events_test_" + uuid.uuid4().hex[:8]
+        self.workers = []
+        for _ in range(2):
+            broker = RoomEventBroker()
+            broker.fanout = PostgresFanout(TEST_DATABASE_URL, broker, self.channel)
+            broker.fanout.start()
+            self.addCleanup(broker.fanout.stop)
+            self.workers.append(broker)
+        self.room_id = str(uuid.uuid4())
+        # Give both listeners time to LISTEN
+        time.sleep(0.3)
+
+    def test_event_reaches_the_streams_of_another_worker(self):
+        writer, streamer = self.workers
+        streamer.publish(self.room_id, "scores", {"players": []}, forward=False)
+        last_id = streamer.event_since(self.room_id, "scores", 0)["id"]
+
+        writer.publish(self.room_id, "scores", {"players": [{"username": "ana", "score": 10}]})
+
+        event = streamer.wait(self.room_id, "scores", last_id, timeout=5)
+        self.assertEqual(event["data"], {"players": [{"username": "ana", "score": 10}]})
+
+    def test_rooms_nobody_streams_are_not_kept(self):
+        writer, other = self.workers
+        writer.publish(self.room_id, "scores", {"players": []})
+        time.sleep(0.5)
+        self.assertFalse(other.has_snapshot(self.room_id, "scores"))
+
+    def test_close_ends_the_streams_of_another_worker(self):
+        writer, streamer = self.workers
+        streamer.publish(self.room_id, "players", {"players": ["ana"]}, forward=False)
+        last_id = streamer.event_since(self.room_id, "players", 0)["id"]
+
+        results = []
+        stream = threading.Thread(target=lambda: results.append(streamer.wait(self.room_id, "players", last_id, timeout=5)))
+        stream.start()
+        time.sleep(0.2)
+        writer.close(self.room_id)
+        stream.join()
+
+        self.assertEqual(results, [None])
+
+    def test_oversized_snapshot_is_reloaded_by_the_receiver(self):
+        writer, streamer = self.workers
+        players = {"players": [{"username": "player-%d" % index, "score": index} for index in range(500)]}
+        streamer.loaders["scores"] = lambda room_id: players
+        streamer.publish(self.room_id, "scores", {"players": []}, forward=False)
+        last_id = streamer.event_since(self.room_id, "scores", 0)["id"]
+
+        writer.publish(self.room_id, "scores", players)
+
+        self.assertEqual(streamer.wait(self.room_id, "scores", last_id, timeout=5)["data"], players)
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "TEST_DATABASE_URL is not set")
+class GeventPsycopg2Test(unittest.TestCase):
+
+    def test_queries_yield_to_other_greenlets(self):
+        # Monkey patching is for the whole process, so the check runs in a fresh one
+        script = textwrap.dedent("""
+            from gevent import monkey
+            monkey.patch_all()
+            import sys, time, gevent
+            from repository import PostgresRepository
+
+            repository = PostgresRepository(sys.argv[1], 4)
+            started = time.perf_counter()
+            gevent.joinall([gevent.spawn(repository._execute, "SELECT pg_sleep(0.5)") for _ in range(4)])
+            print(time.perf_counter() - started)
+        """)
+        result = subprocess.run([sys.executable, "-c", script, TEST_DATABASE_URL], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=30)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # Four half-second queries overlap instead of running one after another
+        self.assertLess(float(result.stdout.strip().splitlines()[-1]), 1.5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import threading
+import time
+
+
+class TimerWheel:
+    """Hierarchical timing wheel: O(1) schedule and cancel, expiry work proportional to the timers that fire.
+
+    Level 0 has one slot per tick; each higher level has slots `slots` times wider. A timer
+    sits in the lowest level whose range reaches its deadline, and moves down a level when
+    the wheel below wraps around to it. Timers further out than the top level are parked in
+    its last slot and placed again when they get there.
+    """
+
+    def __init__(self, tick=0.1, slots=256, levels=4, clock=time.monotonic):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._clock = clock
+        self._origin = clock()
+        self._current = 0
+        # Each slot maps key → (deadline tick, value); _timers maps key → the slot holding it
+        self._wheels = [[{} for _ in range(slots)] for _ in range(levels)]
+        self._timers = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def _ticks(self, now):
+        return int((now - self._origin) / self.tick)
+
+    def _place(self, key, deadline, value):
+        for level in range(self.levels):
+            width = self.slots ** level
+            if deadline // width - self._current // width < self.slots:
+                break
+        else:
+            # Further out than the wheel reaches: wait in the top level's last slot, then go round again
+            level = self.levels - 1
+            width = self.slots ** level
+            deadline_slot = self._current // width + self.slots - 1
+            slot = self._wheels[level][deadline_slot % self.slots]
+            slot[key] = (deadline, value)
+            self._timers[key] = slot
+            return
+        slot = self._wheels[level][(deadline // width) % self.slots]
+        slot[key] = (deadline, value)
+        self._timers[key] = slot
+
+    # 🔹 Fire `value` for `key` after `delay` seconds; rescheduling a key replaces its timer
+    def schedule(self, key, delay, value=None):
+        with self._lock:
+            self._cancel(key)
+            # Round up so a timer never fires before its delay is over
+            deadline = max(self._ticks(self._clock() + delay + self.tick * 0.999), self._current + 1)
+            self._place(key, deadline, value)
+
+    def _cancel(self, key):
+        slot = self._timers.pop(key, None)
+        if slot is None:
+            return False
+        del slot[key]
+        return True
+
+    def cancel(self, key):
+        with self._lock:
+            return self._cancel(key)
+
+    def _cascade(self, level):
+        # The slot of `level` the wheel just reached; its timers are now within reach of the levels below
+        width = self.slots ** level
+        slot = self._wheels[level][(self._current // width) % self.slots]
+        entries = list(slot.items())
+        slot.clear()
+        for key, (deadline, value) in entries:
+            self._place(key, deadline, value)
+
+    # 🔹 Moves the wheel up to now and returns [(key, value)] of every timer that came due
+    def advance(self, now=None):
+        target = self._ticks(self._clock() if now is None else now)
+        expired = []
+        with self._lock:
+            if not self._timers:
+                # Nothing to fire, jump straight there
+                self._current = max(self._current, target)
+                return expired
+
+            while self._current < target:
+                self._current += 1
+                for level in range(1, self.levels):
+                    if self._current % self.slots ** level:
+                        break
+                    self._cascade(level)
+
+                slot = self._wheels[0][self._current % self.slots]
+                if slot:
+                    for key, (deadline, value) in list(slot.items()):
+                        if deadline <= self._current:
+                            del slot[key]
+                            del self._timers[key]
+                            expired.append((key, value))
+        return expired
+
+    # 🔹 Seconds until the next tick boundary, for a loop that sleeps between advances
+    def until_next_tick(self):
+        elapsed = self._clock() - self._origin
+        return self.tick - elapsed % self.tick
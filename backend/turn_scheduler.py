@@ -0,0 +1,148 @@
+import os
+import threading
+from datetime import datetime, timezone
+import metrics
+from repository import repository
+from query_tracer import query_tracer
+from room_events import room_events
+from score_writer import score_writer
+from timer_wheel import TimerWheel
+
+# 🔹 How long a player has for a turn before the scheduler passes it on
+TURN_SECONDS = int(os.getenv("TURN_SECONDS", "30"))
+
+# 🔹 Resolution of the turn timers; deadlines fire at most one tick late
+TURN_TIMER_TICK_SECONDS = float(os.getenv("TURN_TIMER_TICK_SECONDS", "0.25"))
+
+# 🔹 Extra wait past a deadline, so the database clock has passed it too when the advance arrives
+TURN_GRACE_SECONDS = float(os.getenv("TURN_GRACE_SECONDS", "0.5"))
+
+# 🔹 Rooms advanced per advance_expired_turns call
+TURN_ADVANCE_BATCH = int(os.getenv("TURN_ADVANCE_BATCH", "500"))
+
+# 🔹 A batch that failed is tried again after this long
+TURN_RETRY_SECONDS = float(os.getenv("TURN_RETRY_SECONDS", "5"))
+
+TURN_DEADLINES_PAGE_SIZE = 1000
+
+turn_timers = metrics.registry.register(metrics.Gauge(
+    "turn_timers_pending", "Turn deadlines waiting in the scheduler."))
+turns_advanced = metrics.registry.register(metrics.Counter(
+    "turns_advanced_total", "Turns passed on because their deadline expired."))
+turn_batches = metrics.registry.register(metrics.Histogram(
+    "turn_advance_batch_rooms", "Rooms per advance_expired_turns call.", buckets=(1, 5, 10, 50, 100, 250, 500, 1000)))
+
+
+def parse_deadline(value):
+    if isinstance(value, datetime):
+        deadline = value
+    else:
+        deadline = datetime.fromisoformat(value)
+    # Deadlines are written as naive UTC
+    return deadline if deadline.tzinfo else deadline.replace(tzinfo=timezone.utc)
+
+
+# 🔹 What follows a turn passed on by the scheduler: the room's streams get the new state, and a
+#    game that ended on its last round gets its final scores written, as when the last answer ends it
+def announce_advanced(rows):
+    for row in rows:
+        room_id = str(row["room_id"])
+        try:
+            # Only rooms somebody streams need a fresh snapshot; with the fan-out they may stream from another worker
+            if room_events.has_snapshot(room_id, "scores") or room_events.fanout is not None:
+                room_events.publish(room_id, "scores", {"players": repository.list_room_scores(room_id)})
+            if not row["is_active"] and row.get("scores"):
+                score_writer.write_final(row["scores"])
+        except Exception as e:
+            print("Error announcing advanced turn:", str(e))
+
+
+class TurnScheduler:
+    """Passes the turn on when a room's turn_end_time expires, without polling game_state.
+
+    Every deadline written by this process sits in a timer wheel keyed by room id; a
+    background thread advances the wheel each tick and hands the rooms that came due to
+    advance_expired_turns in batches. The database only advances rooms whose deadline is
+    still set and past, so a turn taken (or re-armed) in the meantime is left alone. The
+    rooms a batch moved on are passed to on_advanced.
+    """
+
+    def __init__(self, tick=TURN_TIMER_TICK_SECONDS, batch_size=TURN_ADVANCE_BATCH, on_advanced=announce_advanced):
+        self.batch_size = batch_size
+        self.on_advanced = on_advanced
+        self.wheel = TimerWheel(tick=tick)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopped = threading.Event()
+
+    # 🔹 Start the background thread (create_app does), picking up the deadlines already in the database
+    def start(self, load=True):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, args=(load,), daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def schedule(self, room_id, turn_end_time):
+        delay = (parse_deadline(turn_end_time) - datetime.now(timezone.utc)).total_seconds()
+        self.wheel.schedule(str(room_id), max(delay, 0) + TURN_GRACE_SECONDS)
+        turn_timers.set(len(self.wheel))
+
+    # 🔹 The turn was taken before its deadline
+    def cancel(self, room_id):
+        if self.wheel.cancel(str(room_id)):
+            turn_timers.set(len(self.wheel))
+
+    def load(self):
+        start = 0
+        # Paging through active rooms once at startup, the tracer does not count it as an N+1 loop
+        with query_tracer.paused():
+            while True:
+                page = repository.list_turn_deadlines(start, TURN_DEADLINES_PAGE_SIZE)
+                for row in page:
+                    self.schedule(row["room_id"], row["turn_end_time"])
+                if len(page) < TURN_DEADLINES_PAGE_SIZE:
+                    return
+                start += TURN_DEADLINES_PAGE_SIZE
+
+    # 🔹 Advances the rooms whose timers came due; returns the game_state rows that moved on
+    def run_due(self, now=None):
+        due = [room_id for room_id, _ in self.wheel.advance(now)]
+        advanced = []
+        for start in range(0, len(due), self.batch_size):
+            batch = due[start:start + self.batch_size]
+            try:
+                rows = repository.advance_expired_turns(batch)
+            except Exception as e:
+                print("Error advancing expired turns:", str(e))
+                for room_id in batch:
+                    if room_id not in self.wheel:
+                        self.wheel.schedule(room_id, TURN_RETRY_SECONDS)
+                continue
+            turn_batches.observe(len(batch))
+            turns_advanced.inc(amount=len(rows))
+            if rows and self.on_advanced is not None:
+                self.on_advanced(rows)
+            advanced.extend(rows)
+        if due:
+            turn_timers.set(len(self.wheel))
+        return advanced
+
+    def _run(self, load):
+        if load:
+            try:
+                self.load()
+            except Exception as e:
+                print("Error loading turn deadlines:", str(e))
+        while not self._stopped.wait(self.wheel.until_next_tick()):
+            try:
+                self.run_due()
+            except Exception as e:
+                print("Error running turn timers:", str(e))
+
+
+turn_scheduler = TurnScheduler()
@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { useRouter } from "next/navigation";
-import api, { getUserIdFromToken } from "@/services/api";
+import api, { getUserIdFromToken, subscribeToStream } from "@/services/api";
 import BackButton from "@/components/BackButton";
 
 export default function CreateRoomPage() {
@@ -43,22 +43,13 @@ export default function CreateRoomPage() {
     }
   };
 
-  // Fetch players every 5 seconds
+  // Players are pushed by the server whenever someone joins
   useEffect(() => {
-    let interval: NodeJS.Timeout;
-
-    if (roomId) {
-      interval = setInterval(async () => {
-        try {
-          const response = await api.get(`/multiplayer/get_players/${roomId}`);
-          setPlayers(response.data.players || []);
-        } catch (error) {
-          console.error("Error fetching players", error);
-        }
-      }, 5000);
-    }
+    if (!roomId) return;
 
-    return () => clearInterval(interval);
+    return subscribeToStream(`/multiplayer/stream_players/${roomId}`, "players", (data) => {
+      setPlayers(data.players || []);
+    });
   }, [roomId]);
 
   const startGame = () => {
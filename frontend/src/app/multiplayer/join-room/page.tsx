@@ -2,7 +2,7 @@
 
 import { useState, useEffect } from "react";
 import { useRouter } from "next/navigation";
-import api, { getUserIdFromToken } from "@/services/api";
+import api, { getUserIdFromToken, subscribeToStream } from "@/services/api";
 import BackButton from "@/components/BackButton";
 
 export default function JoinRoomPage() {
@@ -43,20 +43,12 @@ export default function JoinRoomPage() {
   };
 
   useEffect(() => {
-    let interval: NodeJS.Timeout;
+    if (!roomId || !isMounted) return;
 
-    if (roomId && isMounted) {
-      interval = setInterval(async () => {
-        try {
-          const response = await api.get(`/multiplayer/get_players/${roomId}`);
-          setPlayers(response.data.players || []);
-        } catch (error) {
-          console.error("Error fetching players", error);
-        }
-      }, 5000); // Poll every 5 seconds
-    }
-
-    return () => clearInterval(interval);
+    // Players are pushed by the server whenever someone joins
+    return subscribeToStream(`/multiplayer/stream_players/${roomId}`, "players", (data) => {
+      setPlayers(data.players || []);
+    });
   }, [roomId, isMounted]);
 
   if (!isMounted) return null; // Skip rendering until the component is mounted
@@ -1,7 +1,7 @@
 "use client";
 
 import { useEffect, useState } from "react";
-import api from "@/services/api";
+import api, { subscribeToStream } from "@/services/api";
 import { useParams, useRouter } from "next/navigation";
 
 export default function GamePage() {
@@ -18,7 +18,7 @@ export default function GamePage() {
   useEffect(() => {
     const fetchQuestion = async () => {
         try {
-          const response = await api.post("/multiplayer/get_random_question");
+          const response = await api.post("/multiplayer/get_random_question", { room_id });
           setEmojiClue(response.data.emoji_clue);
         } catch (error: any) {
           console.error("Error fetching question:", error.response?.data || error.message);
@@ -64,18 +64,13 @@ export default function GamePage() {
     }
   };
 
-  // ✅ Real-Time Score Fetching
+  // ✅ Real-Time Scores (pushed by the server whenever they change)
   useEffect(() => {
-    const interval = setInterval(async () => {
-      try {
-        const response = await api.get(`/multiplayer/get_scores/${room_id}`);
-        setPlayers(response.data.players || []);
-      } catch (error: any) {
-        console.error("Error fetching scores:", error.response?.data || error.message);
-      }
-    }, 5000); // Poll every 5 seconds
+    if (!room_id) return;
 
-    return () => clearInterval(interval);
+    return subscribeToStream(`/multiplayer/stream_scores/${room_id}`, "scores", (data) => {
+      setPlayers(data.players || []);
+    });
   }, [room_id]);
 
   return (
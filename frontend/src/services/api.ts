@@ -32,4 +32,16 @@ export const getUserIdFromToken = () => {
   }
 };
 
+// ✅ Listen to a server-sent event stream; EventSource reconnects with Last-Event-ID on its own
+export const subscribeToStream = (path: string, eventName: string, onData: (data: any) => void) => {
+  const source = new EventSource(`${api.defaults.baseURL}${path}`);
+
+  source.addEventListener(eventName, (event) => {
+    onData(JSON.parse((event as MessageEvent).data));
+  });
+  source.addEventListener("closed", () => source.close());
+
+  return () => source.close();
+};
+
 export default api;